@@ -1,129 +1,34 @@
 # -*- coding: utf-8 -*-
 """
 稳定版（腾讯 gtimg 数据源；前低=结构位/波谷）
-- 名称映射：qt.gtimg.cn
-- 日K：web.ifzq.gtimg.cn fqkline（前复权/不复权可选）
-- 昨收(Close)：基准日收盘（支持 today / yesterday）
+- 名称映射：本地证券主表（symbol_master，按 TTL 才走 qt.gtimg.cn）
+- 日K：web.ifzq.gtimg.cn fqkline（前复权/不复权可选），本地缓存只补缺失的尾部（kline_store）；
+  LOCAL_ADJUST 时只存不复权K线，前复权由复权因子表在本地生成（adjust）
+- 抓取与计算分离：线程池并发抓日K（CONCURRENCY），导出顺序仍按 CODES
+- 昨收(Close)：基准日收盘（支持 today / yesterday；按交易日历 trade_calendar 定位，节假日/盘前不错位）
 - ATR10：SMA(TR,10)；可切换 ATR_METHOD='wilder'
 - VOL10(万)：10日均量（万手）；VOL(万)：基准日（万手）
 - 前高(P_res)：最近 lookback 天内【含基准日】最高价
 - 前低(P_sup)：“结构位”（上一个明确波谷），在基准日前寻找已确认波谷
+- 批量指标（batch_metrics）：BATCH_METRICS=True 时整池按 (股票 × 交易日) 二维数组一次算完
+- 增量指标（indicator_state）：均线/ATR/VOL10/前高状态持久化，每次只推入新增K线
+- 输出格式（table_io）：xlsx / parquet / arrow / csv；列式格式可直接作为 sy_strategy_calc 的输入
 """
-import re
 import pandas as pd
 import numpy as np
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import stock_core
+from bars import Bars
+from stock_core import load_codes, norm_code, to_symbol
+from table_io import format_of, with_ext, write_table
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 from pathlib import Path
 import os
 
 # ===== 可改参数 =====
-CODES = [
-    # AI算力（服务器/IDC/散热/光模块/PCB/连接器/封测/UPS）
-    "603019.SH",  # 中科曙光
-    "601138.SH",  # 工业富联
-    "603881.SH",  # 数据港
-    "002837.SZ",  # 英维克
-    "002156.SZ",  # 通富微电
-    "600183.SH",  # 生益科技
-    "002463.SZ",  # 沪电股份
-    "002916.SZ",  # 深南电路
-    "002475.SZ",  # 立讯精密
-    "002281.SZ",  # 光迅科技
-    "600487.SH",  # 亨通光电
-    "603986.SH",  # 兆易创新
-    "002518.SZ",  # 科士达 （UPS是不间断电源）
-    "002335.SZ",  # 科华数据
-
-    # 电网数字化/特高压
-    "603556.SH",  # 海兴电力
-    "601567.SH",  # 三星医疗
-    "600268.SH",  # 国电南自
-    "601877.SH",  # 正泰电器
-    "000400.SZ",  # 许继电气
-    "600312.SH",  # 平高电气
-    "600406.SH",  # 国电南瑞
-    "601126.SH",  # 四方股份
-    "601179.SH",  # 中国西电
-    "603530.SH",  # 神马电力
-    "002270.SZ",  # 华明装备
-    "002028.SZ",  # 思源电气
-    "600089.SH",  # 特变电工
-    "600885.SH",  # 宏发股份
-
-    # 航天军工/低空经济/通信
-    "601698.SH",  # 中国卫通
-    "600118.SH",  # 中国卫星
-    "002389.SZ",  # 航天彩虹
-    "002111.SZ",  # 威海广泰
-
-    # 消费电子/渠道/ODM/结构件
-    "600745.SH",  # 闻泰科技
-    "002241.SZ",  # 歌尔股份
-    "605133.SH",  # 华勤技术
-    "002600.SZ",  # 领益智造
-    "002624.SZ",  # 完美世界
-
-    # 机器人/工控
-    "000559.SZ",  # 万向钱潮
-    "002050.SZ",  # 三花智控
-    "601100.SH",  # 恒立液压
-    "002979.SZ",  # 雷赛智能
-    "603416.SH",  # 信捷电气
-    "603728.SH",  # 鸣志电器
-    "603283.SH",  # 赛腾股份
-    "600592.SH",  # 龙溪股份
-
-    # 有色/资源
-    "600111.SH",  # 北方稀土
-    "600366.SH",  # 宁波韵升
-    "600392.SH",  # 盛和资源
-    "601600.SH",  # 中国铝业
-    "000807.SZ",  # 云铝股份
-    "002532.SZ",  # 天山铝业
-    "000612.SZ",  # 焦作万方
-    "601899.SH",  # 紫金矿业
-    "603993.SH",  # 洛阳钼业
-    "603799.SH",  # 华友钴业
-    "600549.SH",  # 厦门钨业
-
-    # 锂电/材料
-    "002466.SZ",  # 天齐锂业
-    "002460.SZ",  # 赣锋锂业
-    "002074.SZ",  # 国轩高科
-    "002709.SZ",  # 天赐材料
-    "603026.SH",  # 石大胜华
-    "002759.SZ",  # 天际股份
-    "002407.SZ",  # 多氟多
-
-    # 智能电动车
-    "601689.SH",  # 拓普集团
-    "605255.SH",  # 天普股份
-
-    # 公用事业/风电/核电
-    "601985.SH",  # 中国核电
-    "003816.SZ",  # 中国广核
-    "600021.SH",  # 上海电力
-    "002202.SZ",  # 金风科技
-
-    # 金融/软件/环保
-    "601211.SH",  # 国泰海通
-    "601009.SH",  # 南京银行
-    "600797.SH",  # 浙大网新
-
-    # 半导体特气/化学品/医药
-    "002549.SZ",  # 凯美特气
-    "002409.SZ",  # 雅克科技
-    "600867.SH",  # 通化东宝
-
-    # 新增
-    "600057.SH",  # 厦门象屿
-    "600593.SH",  # 大连圣亚
-    "000555.SZ",  # 神州信息
-]
+CODES = load_codes()         # 自选股在外部文件（stock_core.WATCHLIST_FILE，默认同目录 watchlist.txt）
 
 # 你的股票列表
 LOOKBACK_N = 20
@@ -132,7 +37,15 @@ ATR_N = 10
 ATR_METHOD = "sma"           # 'sma' 或 'wilder'
 VOL_UNIT_DIVISOR = 1e4       # “万手” = 手 / 1e4
 TIMEOUT = 6
+CONCURRENCY = 12             # 并发抓K线线程数 / 连接池大小（每主机）
+USE_KLINE_CACHE = True       # 日K走本地缓存（只补缺失的尾部）
+LOCAL_ADJUST = True          # 前复权在本地由不复权K线 × 复权因子表生成（adjust），除权只刷新因子表
+USE_INDICATOR_STATE = True   # 均线/ATR/VOL10 用持久化的增量状态（每次只推入新增K线）
+BATCH_METRICS = False        # 整个股票池一次性二维数组批量计算（与逐只计算结果一致；股票多时更快）
+KLINE_CACHE_DIR = os.path.join("~", ".cache", "stock_kline")  # 与实时价格脚本共用
 BASE_DAY = "today"           # 新增：'today' 或 'yesterday'
+OUT_FORMAT = "xlsx"          # 'xlsx' / 'parquet' / 'arrow' / 'csv'（parquet/arrow 需 pyarrow）
+ALSO_EXCEL = False           # 列式格式之外再导出一份 xlsx 便于查看
 OUT_DIR = "E:\yxt\OneDrive\炒股数据\每日股票数据更新"  # Windows 输出目录（留空=当前目录），示例：r"D:\Stocks\Exports"
 
 # —— 结构位参数（前低/前高判断用）——
@@ -142,101 +55,50 @@ EXCLUDE_LATEST = True        # 前低只取“已确认”的上一波谷 -> 排
 
 # 网络与代理设置
 DISABLE_SYSTEM_PROXY = True  # True=忽略系统代理
+QUOTE_SERVER = None          # 本机行情分发服务（quote_server），如 "http://127.0.0.1:8765"；None=直连腾讯
 PROXIES = None               # {"http":"http://127.0.0.1:7890","https":"http://127.0.0.1:7890"}
 
 def make_session() -> requests.Session:
-    s = requests.Session()
-    retry = Retry(
-        total=4, connect=4, read=4,
-        backoff_factor=0.6,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "POST"],
-        raise_on_status=False,
-    )
-    s.mount("http://", HTTPAdapter(max_retries=retry))
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    s.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Accept": "application/json,text/plain,*/*",
-        "Accept-Language": "zh-CN,zh;q=0.9",
-        "Connection": "close",
-    })
-    if DISABLE_SYSTEM_PROXY:
-        s.trust_env = False
-    if PROXIES:
-        s.proxies.update(PROXIES)
-    return s
-
-# ===== 代码与市场前缀 =====
-def norm_code(code: str) -> str:
-    m = re.search(r"(\d{6})", code)
-    if not m:
-        raise ValueError(f"无效代码: {code}")
-    return m.group(1)
-
-def to_symbol(code: str) -> str:
-    up = code.upper()
-    six = norm_code(up)
-    if ".SH" in up or six.startswith(("5","6","9")):
-        return f"sh{six}"
-    return f"sz{six}"
-
-# ===== 名称映射（腾讯 qt）=====
+    """进程内共享的 keep-alive 连接池（大小=CONCURRENCY），名称与K线请求共用"""
+    return stock_core.make_session(pool_size=CONCURRENCY, retry_total=4, backoff_factor=0.6,
+                                   disable_system_proxy=DISABLE_SYSTEM_PROXY, proxies=PROXIES)
+
+# ===== 名称映射（证券主表）=====
 def get_name_map_tencent(codes_raw: list) -> dict:
-    sess = make_session()
-    symbols = [to_symbol(c) for c in codes_raw]
-    out = {}
-    for i in range(0, len(symbols), 60):
-        batch = ",".join(symbols[i:i+60])
-        url = f"https://qt.gtimg.cn/q={batch}"
-        r = sess.get(url, timeout=TIMEOUT)
-        r.encoding = "gbk"
-        for line in r.text.strip().splitlines():
-            if "~" in line:
-                try:
-                    body = line.split("=",1)[1].strip().strip('";')
-                    parts = body.split("~")
-                    name = parts[1]
-                    code6 = parts[2].zfill(6)
-                    out[code6] = name
-                except Exception:
-                    pass
-    return out
+    """{c6: 名称}：读本地证券主表（symbol_master），只对缺失或超过 TTL 的代码走 qt.gtimg"""
+    import symbol_master
+    return symbol_master.name_map(codes_raw, sess=make_session())
 
 # ===== 历史日K（腾讯 fqkline）=====
-def fetch_hist_tencent(code_raw: str, use_qfq: bool=True, limit: int=1200) -> pd.DataFrame:
+def fetch_rows_tencent(code_raw: str, use_qfq: bool=True, limit: int=1200) -> Bars:
     """
-    返回列：date, open, close, high, low, volume（volume单位：手）
+    返回 Bars（volume单位：手），由 JSON 字符串数组整块转换
+    close/high/low/volume 无法解析的行丢弃；open 无法解析记为 NaN
     """
-    sess = make_session()
-    symbol = to_symbol(code_raw)
-    adj = "qfq" if use_qfq else ""
-    params = {"param": f"{symbol},day,,,{limit},{adj}"}
-    bases = ["http://web.ifzq.gtimg.cn/appstock/app/fqkline/get",
-             "https://web.ifzq.gtimg.cn/appstock/app/fqkline/get"]
-    last_err = None
-    for base in bases:
-        try:
-            j = sess.get(base, params=params, timeout=TIMEOUT).json()
-            data = j.get("data", {})
-            node = data.get(symbol, {}) if data else {}
-            arr = node.get("qfqday" if use_qfq else "day") or node.get("day")
-            if not arr:
-                raise RuntimeError(f"无K线数据: {code_raw} @ {base}")
-            rows = []
-            for it in arr:
-                parts = it.split(",") if isinstance(it, str) else it
-                date, op, cl, hi, lo, vol = parts[0], parts[1], parts[2], parts[3], parts[4], parts[5]
-                rows.append([date, op, cl, hi, lo, vol])
-            df = pd.DataFrame(rows, columns=["date","open","close","high","low","volume"])
-            for c in ["open","close","high","low","volume"]:
-                df[c] = pd.to_numeric(df[c], errors="coerce")
-            df = df.dropna(subset=["close","high","low","volume"]).reset_index(drop=True)
-            return df
-        except Exception as e:
-            last_err = e
-            continue
-    raise last_err if last_err else RuntimeError(f"腾讯K线拉取失败: {code_raw}")
+    return stock_core.fetch_kline(code_raw, use_qfq, limit, sess=make_session(), timeout=TIMEOUT)
+
+_KLINE_STORE = None
+
+def fetch_hist_tencent(code_raw: str, use_qfq: bool=True, limit: int=1200) -> Bars:
+    """
+    返回 Bars：date(int32 天数), open, close, high, low, volume（volume单位：手）
+    USE_KLINE_CACHE 时读本地日K，只拉缺失的尾部；配置 QUOTE_SERVER 时由本机服务取
+    """
+    global _KLINE_STORE
+    if QUOTE_SERVER:
+        import quote_server
+        return Bars.from_rows(quote_server.client_kline(QUOTE_SERVER, code_raw, use_qfq=use_qfq, limit=limit))
+    if not USE_KLINE_CACHE:
+        return fetch_rows_tencent(code_raw, use_qfq=use_qfq, limit=limit)
+    from kline_store import KlineStore
+    if _KLINE_STORE is None:
+        fetcher = lambda c, q, n: fetch_rows_tencent(c, use_qfq=q, limit=n)
+        factors = None
+        if LOCAL_ADJUST:
+            from adjust import FactorStore
+            factors = FactorStore(KLINE_CACHE_DIR, fetcher, to_symbol)
+        _KLINE_STORE = KlineStore(KLINE_CACHE_DIR, fetcher, to_symbol, factors=factors)
+    return Bars.from_cols(_KLINE_STORE.get(code_raw, use_qfq=use_qfq, limit=limit))
 
 # ===== ATR =====
 def calc_tr(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
@@ -259,91 +121,124 @@ def atr_series(high: pd.Series, low: pd.Series, close: pd.Series, n: int = 10, m
     return tr.rolling(n, min_periods=n).mean()
 
 # ===== 选择基准索引 =====
-def choose_base_index(hist: pd.DataFrame, base_day: str) -> int:
+def choose_base_index(hist: Bars, base_day: str) -> int:
     """
-    返回用于计算的基准索引：
-    - 'today'：最后一根K线
-    - 'yesterday'：倒数第二根（若不足两根则回退到最后一根）
+    返回用于计算的基准索引（按交易日历，不按根数猜）：
+    - 'today'：当前行情所属交易日（非交易日取上一交易日）及以前的最后一根K线
+    - 'yesterday'：上述交易日的上一交易日及以前的最后一根（当日K线尚未出现时即最后一根）
     """
-    n = len(hist)
-    if n == 0:
+    from trade_calendar import base_index
+    if len(hist) == 0:
         raise RuntimeError("历史数据为空")
-    if base_day == "yesterday" and n >= 2:
-        return n - 2
-    return n - 1
+    idx = base_index(hist.date, base_day)
+    if idx < 0:
+        raise RuntimeError("基准日之前没有K线")
+    return idx
 
 # ===== 结构位：波谷（前低）=====
-def find_pivot_low(df: pd.DataFrame, k: int = 3, max_lookback: int = 120, exclude_last: bool = True):
+def pivot_low_index(lows: np.ndarray, k: int = 3, max_lookback: int = 120, exclude_last: bool = True) -> int:
+    """find_pivot_low 的数组版，只返回索引（滑动窗口向量化检测，见 pivots）"""
+    from pivots import last_pivot_index
+    return last_pivot_index(lows, k=k, max_lookback=max_lookback, exclude_last=exclude_last, kind="low")
+
+def find_pivot_low(bars: Bars, k: int = 3, max_lookback: int = 120, exclude_last: bool = True):
     """
     返回： (前低价, 前低日期, 索引)
     定义：low[i] 严格小于 左右各 k 根的 low（避免平台/持平）
     搜索区间：最近 max_lookback 根，默认排除最后一根（只取已确认波谷）
     若未找到，回退为该区间的最小值
     """
-    lows = df["low"].values
-    n = len(lows)
-    end = n - 1 if exclude_last else n   # 排除最后一根
-    start = max(0, end - max_lookback - k - 1)
-
-    pivot_idx = None
-    for i in range(end - k - 1, start + k - 1, -1):
-        left_min = np.min(lows[i - k:i])
-        right_min = np.min(lows[i + 1:i + 1 + k])
-        if np.isfinite(lows[i]) and lows[i] < left_min and lows[i] < right_min:
-            pivot_idx = i
-            break
-
-    if pivot_idx is None:
-        window = lows[start:end]
-        if len(window) == 0:
-            pivot_idx = n - 2 if n >= 2 else 0
-        else:
-            rel = int(np.nanargmin(window))
-            pivot_idx = start + rel
-
-    price = float(df.iloc[pivot_idx]["low"])
-    date_ = str(df.iloc[pivot_idx]["date"])
-    return price, date_, pivot_idx
+    pivot_idx = pivot_low_index(bars.low, k=k, max_lookback=max_lookback, exclude_last=exclude_last)
+    return float(bars.low[pivot_idx]), bars.date_str(pivot_idx), pivot_idx
+
+# ===== 并发抓取 =====
+def fetch_hists_concurrent(codes_raw: list, use_qfq: bool=True, limit: int=1200) -> dict:
+    """
+    线程池并发抓日K（有界并发=CONCURRENCY），返回 {code_raw: Bars 或 Exception}
+    单只失败/超时不影响其他股票
+    """
+    def worker(code):
+        try:
+            return fetch_hist_tencent(code, use_qfq=use_qfq, limit=limit)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as ex:
+        return dict(zip(codes_raw, ex.map(worker, codes_raw)))
 
 # ===== 聚合 =====
-def last_metrics(code_raw: str, name_map: dict, lookback: int=20, base_day: str="today") -> dict:
-    hist = fetch_hist_tencent(code_raw, use_qfq=USE_QFQ)
+def state_metrics(hist: Bars, base_idx: int, code_raw: str, lookback: int, state_store) -> dict:
+    """
+    增量指标：持久化状态只推进到“已定型”的K线（最后一根可能是盘中K线，不落盘），
+    再在副本上推到基准日；每次运行只推入新增的几根
+    """
+    from indicator_state import advance
+    cols = hist.cols()
+    symbol = to_symbol(code_raw)
+    settled = min(base_idx, len(hist) - 2)
+    st = None
+    if settled >= 0:
+        st = advance(state_store.get(symbol), cols, settled, ATR_N, ATR_METHOD, lookback)
+        state_store.put(symbol, st)
+        st = st.copy()
+    return advance(st, cols, base_idx, ATR_N, ATR_METHOD, lookback).metrics()
+
+def last_metrics(code_raw: str, name_map: dict, lookback: int=20, base_day: str="today", state_store=None,
+                 hist: Bars=None) -> dict:
+    if hist is None:
+        hist = fetch_hist_tencent(code_raw, use_qfq=USE_QFQ)
 
     # ——裁剪到“基准日”——
     base_idx = choose_base_index(hist, base_day)
-    hist_upto = hist.iloc[:base_idx+1].copy()
-    base_date = str(hist_upto.iloc[-1]["date"])
-
-    close = hist_upto["close"]; high = hist_upto["high"]; low = hist_upto["low"]; vol = hist_upto["volume"]
-
-    # 均线（基准日最新值）
-    ma5  = close.rolling(5).mean().iloc[-1]
-    ma10 = close.rolling(10).mean().iloc[-1]
-    ma20_s = close.rolling(20).mean()
-    ma20 = ma20_s.iloc[-1]
-    ma60 = close.rolling(60).mean().iloc[-1]
-
-    # ——新增：前一日 MA20（相对“基准日”的前一根）与“MA20 向上?”——
-    ma20_prev = ma20_s.shift(1).iloc[-1] if len(ma20_s) >= 2 else np.nan
-    ma20_up = (ma20 > ma20_prev) if (pd.notna(ma20) and pd.notna(ma20_prev)) else ""  # True/False/空白
-
-    # 前高（含基准日，取最近 LOOKBACK_N 的最高）
-    p_res = high.iloc[-lookback:].max()
+    hist_upto = hist[:base_idx+1]
+    base_date = hist_upto.date_str(-1)
+
+    if state_store is not None:
+        # 增量状态：均线/ATR/量能/前高 O(1) 更新
+        m = state_metrics(hist, base_idx, code_raw, lookback, state_store)
+        ma5, ma10, ma20, ma60, ma20_prev = m["ma5"], m["ma10"], m["ma20"], m["ma60"], m["ma20_prev"]
+        p_res, y_close, atr_n = m["p_res"], float(m["close"]), float(m["atr"])
+        vol10 = m["vol10"] / VOL_UNIT_DIVISOR
+        vol_last = float(m["vol"]) / VOL_UNIT_DIVISOR
+    else:
+        # 列数组包成 Series 只为用 rolling（不复制）
+        close, high, low, vol = (pd.Series(hist_upto[c], copy=False) for c in ("close", "high", "low", "volume"))
+        # 均线（基准日最新值）
+        ma5  = close.rolling(5).mean().iloc[-1]
+        ma10 = close.rolling(10).mean().iloc[-1]
+        ma20_s = close.rolling(20).mean()
+        ma20 = ma20_s.iloc[-1]
+        ma60 = close.rolling(60).mean().iloc[-1]
+
+        # ——新增：前一日 MA20（相对“基准日”的前一根）——
+        ma20_prev = ma20_s.shift(1).iloc[-1] if len(ma20_s) >= 2 else np.nan
+
+        # 前高（含基准日，取最近 LOOKBACK_N 的最高）
+        p_res = high.iloc[-lookback:].max()
+
+        # 昨收（基准日收盘）
+        y_close = float(close.iloc[-1])
+
+        # ATR10（基准日）
+        atr_n = float(atr_series(high, low, close, n=ATR_N, method=ATR_METHOD).iloc[-1])
+
+        # VOL10(万手) 与 基准日 VOL(万手)
+        vol10 = vol.rolling(10).mean().iloc[-1] / VOL_UNIT_DIVISOR
+        vol_last = float(vol.iloc[-1]) / VOL_UNIT_DIVISOR
 
     # 前低（结构位）
     p_sup_val, p_sup_date, _ = find_pivot_low(
         hist_upto, k=PIVOT_K, max_lookback=STRUCT_LOOKBACK, exclude_last=EXCLUDE_LATEST
     )
 
-    # 昨收（基准日收盘）
-    y_close = float(close.iloc[-1])
+    return metrics_row(code_raw, name_map, p_res, p_sup_val, ma5, ma10, ma20, ma60, ma20_prev,
+                       y_close, atr_n, vol10, vol_last, base_date)
 
-    # ATR10（基准日）
-    atr_n = float(atr_series(high, low, close, n=ATR_N, method=ATR_METHOD).iloc[-1])
-
-    # VOL10(万手) 与 基准日 VOL(万手)
-    vol10 = vol.rolling(10).mean().iloc[-1] / VOL_UNIT_DIVISOR
-    vol_last = float(vol.iloc[-1]) / VOL_UNIT_DIVISOR
+def metrics_row(code_raw: str, name_map: dict, p_res, p_sup_val, ma5, ma10, ma20, ma60, ma20_prev,
+                y_close, atr_n, vol10, vol_last, base_date: str = "") -> dict:
+    """导出行；“日期”“MA20_1” 不进导出表，供进程内流水线（stock_pipeline）使用"""
+    # “MA20 向上?”
+    ma20_up = (ma20 > ma20_prev) if (pd.notna(ma20) and pd.notna(ma20_prev)) else ""  # True/False/空白
 
     code6 = norm_code(code_raw)
     return {
@@ -360,8 +255,61 @@ def last_metrics(code_raw: str, name_map: dict, lookback: int=20, base_day: str=
         "VOL10(万)": round(vol10, 3),
         "VOL(万)": round(vol_last, 3),
         "MA20 向上?": ma20_up,   # <<< 新增字段
+        "日期": base_date,
+        "MA20_1": round(ma20_prev, 3),
     }
 
+def batch_metrics_rows(codes_raw: list, name_map: dict, lookback: int=20, base_day: str="today",
+                       hists: list=None) -> list:
+    """
+    批量版 last_metrics：整个股票池截到基准日后堆成 (股票 × 交易日) 二维数组一次算完，
+    结果与逐只 last_metrics 逐位一致；返回顺序与 codes_raw 一致
+    hists：可传入已抓好的日K（与 codes_raw 同序）
+    """
+    from batch_metrics import stack_right, batch_last_metrics
+    from pivots import last_pivot_index_2d
+    if hists is None:
+        hists = [fetch_hist_tencent(c, use_qfq=USE_QFQ) for c in codes_raw]
+    if not hists:
+        return []
+    uptos = [h[:choose_base_index(h, base_day)+1] for h in hists]
+    width = max(len(h) for h in uptos)
+    arr = {c: stack_right([h[c] for h in uptos], width) for c in ["close", "high", "low", "volume"]}
+    m = batch_last_metrics(arr["close"], arr["high"], arr["low"], arr["volume"],
+                           lookback=lookback, atr_n=ATR_N, atr_method=ATR_METHOD)
+
+    # 前低（结构位）：整池一次检测
+    sup_idx = last_pivot_index_2d(arr["low"], k=PIVOT_K, max_lookback=STRUCT_LOOKBACK, exclude_last=EXCLUDE_LATEST)
+    p_sup = arr["low"][np.arange(len(uptos)), sup_idx]
+
+    rows = []
+    for i, code_raw in enumerate(codes_raw):
+        p_sup_val = float(p_sup[i])
+        rows.append(metrics_row(
+            code_raw, name_map, m["p_res"][i], p_sup_val,
+            m["ma5"][i], m["ma10"][i], m["ma20"][i], m["ma60"][i], m["ma20_prev"][i],
+            float(m["close"][i]), float(m["atr"][i]),
+            m["vol10"][i] / VOL_UNIT_DIVISOR, float(m["vol"][i]) / VOL_UNIT_DIVISOR,
+            uptos[i].date_str(-1),
+        ))
+    return rows
+
+def compute_rows(codes_raw: list, name_map: dict, hists: dict, lookback: int=20, base_day: str="today",
+                 state_store=None) -> list:
+    """已抓好的日K（{code: Bars}）-> 指标行；按 BATCH_METRICS 选批量或逐只（可带增量状态）"""
+    if BATCH_METRICS:
+        return batch_metrics_rows(codes_raw, name_map, lookback, base_day=base_day,
+                                  hists=[hists[c] for c in codes_raw])
+    return [last_metrics(code, name_map, lookback, base_day=base_day, state_store=state_store, hist=hists[code])
+            for code in codes_raw]
+
+def open_state_store():
+    """USE_INDICATOR_STATE 且非批量模式时返回增量状态存储，否则 None"""
+    if not USE_INDICATOR_STATE or BATCH_METRICS:
+        return None
+    from indicator_state import StateStore
+    return StateStore(os.path.join(
+        KLINE_CACHE_DIR, "state", f"{'qfq' if USE_QFQ else 'raw'}_{ATR_METHOD}{ATR_N}_lb{LOOKBACK_N}.json"))
 
 def parse_args():
     p = argparse.ArgumentParser(description="生成股票指标Excel（支持基准天数：today/yesterday）")
@@ -371,6 +319,8 @@ def parse_args():
         default=OUT_DIR,
         help="输出目录（Windows 路径建议用引号包裹；留空=当前目录）"
     )
+    p.add_argument("--format", choices=["xlsx", "parquet", "arrow", "csv"], default=OUT_FORMAT,
+                   help="输出格式（默认：%(default)s）")
     return p.parse_args()
 
 def main():
@@ -383,9 +333,24 @@ def main():
     # ——保持与 CODES 完全一致的导出顺序——
     order_map = {norm_code(c): i for i, c in enumerate(codes_raw)}
 
-    rows = []
+    state_store = open_state_store()
+
+    # 1) 并发抓取（与计算分离）；失败的股票只保留代码/名称，指标留空
+    hist_map = fetch_hists_concurrent(codes_raw, use_qfq=USE_QFQ)
+    ok_codes, failed = [], []
     for code in codes_raw:
-        rows.append(last_metrics(code, name_map, LOOKBACK_N, base_day=base_day))
+        (failed if isinstance(hist_map[code], Exception) else ok_codes).append(code)
+    for code in failed:
+        print(f"[WARN] {code} 日K拉取失败: {hist_map[code]}")
+
+    # 2) 计算
+    rows = compute_rows(ok_codes, name_map, hist_map, LOOKBACK_N, base_day, state_store)
+    for code in failed:
+        code6 = norm_code(code)
+        rows.append({"代码": code6, "名称": name_map.get(code6, "")})
+
+    if state_store is not None:
+        state_store.save()
 
     out = pd.DataFrame(rows, columns=[
         "代码", "名称", "前高(P_res)", "前低(P_sup)",
@@ -403,13 +368,15 @@ def main():
     out["代码"] = out["代码"].astype(str).str.zfill(6)
 
     suffix = "" if base_day == "today" else f"-{base_day}"
-    fn = f"stock_metrics_{datetime.now().strftime('%Y%m%d')}{suffix}.xlsx"
+    fn = with_ext(f"stock_metrics_{datetime.now().strftime('%Y%m%d')}{suffix}", args.format)
     raw_out_dir = args.out_dir or ""
     out_dir = Path(os.path.expandvars(raw_out_dir)).expanduser() if raw_out_dir.strip() else Path.cwd()
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / fn
 
-    out.to_excel(out_path, index=False)
+    write_table(out, out_path, args.format)
+    if ALSO_EXCEL and format_of(out_path) != "excel":
+        write_table(out, out_path.with_suffix(".xlsx"))
 
     print(f"基准天数: {base_day} | 文件: {out_path.resolve()}")
 
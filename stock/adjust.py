@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+本地复权引擎：不复权日K只存一份 + 每股一张复权因子表，前/后复权在本地一次累乘得到
+- 因子表：除权事件 (date, ratio)，ratio = 除权日前一根与当日 qfq/raw 比值之比
+  前复权因子 = 日期在该K线之后的全部事件 ratio 之积（从右往左 cumprod + searchsorted，整列向量化）
+  后复权 = 前复权 ÷ 全部事件之积（最早一段为原价）
+- 建表：一次拉与本地不复权K线同长度的腾讯 qfq，逐日比值跳变超出报价精度（TICK）的记为事件
+- 刷新：每个交易日收盘后拉一次 qfq 尾部（锚点日起，通常 TOPUP_MIN 根）；比值跳变即新事件，只追加进因子表——
+  不复权K线不受除权影响，不再整段重拉。现金分红的跳空落在涨跌幅内、无法从不复权K线识别，只能这样当天核对
+  PROBE_DAILY=False（可选）：只在锚点日之后的不复权K线越过涨跌停（送转/拆并/配股的特征）或距上次核对
+  满 PROBE_EVERY_DAYS 天时才核对，qfq 请求少得多，但现金分红最多晚 PROBE_EVERY_DAYS 天生效
+- 成交量不复权（与腾讯 qfqday 口径一致）
+"""
+import os
+import time as _time
+from pathlib import Path
+import numpy as np
+
+from kline_store import TOPUP_MIN, last_session_close, now_cn, rows_to_cols
+
+TICK = 0.01              # 报价最小变动（元），用于估计比值的舍入误差
+EVENT_MIN = 1e-4         # 比值跳变的最小相对幅度（低于此视为舍入噪声）
+PRICE_COLS = ("open", "close", "high", "low")
+PROBE_DAILY = True       # True=每个交易日收盘后都拉 qfq 尾部核对；False=只在有除权迹象或到期时核对（现金分红会滞后）
+PROBE_EVERY_DAYS = 30    # PROBE_DAILY=False 时：无除权迹象最长多少天核对一次（兜底现金分红）
+PRICE_LIMIT = {"科创板": 0.20, "创业板": 0.20, "北交所": 0.30}   # 其余按 10%（symbol_master 板块）
+LIMIT_DEFAULT = 0.10
+LIMIT_SLACK = 0.005      # 涨跌停价按分位四舍五入的余量
+
+# ------------------ 因子计算 ------------------
+def find_events(days: np.ndarray, raw_close: np.ndarray, qfq_close: np.ndarray) -> tuple:
+    """
+    同日期对齐的不复权 / 前复权收盘价 -> (事件日 int32, ratio float64)
+    相邻两根 qfq/raw 比值之比超出两侧报价舍入误差即记为事件（逐日比值之比可累乘还原整条比值曲线）
+    """
+    days = np.asarray(days, dtype=np.int32)
+    raw = np.asarray(raw_close, dtype=np.float64)
+    qfq = np.asarray(qfq_close, dtype=np.float64)
+    if len(days) < 2:
+        return np.zeros(0, dtype=np.int32), np.zeros(0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = qfq / raw
+        err = 0.5 * TICK * (1.0 / np.abs(qfq) + 1.0 / np.abs(raw))
+        step = r[:-1] / r[1:]
+    ok = (raw[:-1] > 0) & (raw[1:] > 0) & (qfq[:-1] > 0) & (qfq[1:] > 0)
+    hit = ok & (np.abs(step - 1.0) > np.maximum(err[:-1] + err[1:], EVENT_MIN))
+    return days[1:][hit], step[hit]
+
+def factor_series(days: np.ndarray, ev_days: np.ndarray, ev_ratio: np.ndarray) -> np.ndarray:
+    """每根K线的前复权因子：事件日严格晚于K线日期的 ratio 之积"""
+    suffix = np.append(np.cumprod(np.asarray(ev_ratio, dtype=np.float64)[::-1])[::-1], 1.0)
+    return suffix[np.searchsorted(ev_days, days, side="right")]
+
+def price_limit(symbol: str) -> float:
+    from symbol_master import classify
+    return PRICE_LIMIT.get(classify(symbol)[1], LIMIT_DEFAULT)
+
+def suspect_event(raw: dict, since_day: int, limit: float = LIMIT_DEFAULT) -> bool:
+    """since_day 之后的不复权K线相对前收超出涨跌幅限制（除权后价格按前收直接比较会“越过”涨跌停）"""
+    i = int(np.searchsorted(raw["date"], since_day, side="left"))
+    prev = raw["close"][i:-1]
+    if len(prev) == 0:
+        return False
+    band = limit + LIMIT_SLACK
+    hi, lo = raw["high"][i + 1:], raw["low"][i + 1:]
+    with np.errstate(invalid="ignore"):
+        return bool(np.any(hi > prev * (1 + band)) or np.any(lo < prev * (1 - band)))
+
+def empty_table() -> dict:
+    return {"days": np.zeros(0, dtype=np.int32), "ratio": np.zeros(0)}
+
+def _scaled(cols: dict, f: np.ndarray) -> dict:
+    out = dict(cols)
+    for c in PRICE_COLS:
+        out[c] = cols[c] * f
+    return out
+
+def forward(cols: dict, table: dict) -> dict:
+    """不复权列字典 -> 前复权（最新价不变）"""
+    return _scaled(cols, factor_series(cols["date"], table["days"], table["ratio"]))
+
+def backward(cols: dict, table: dict) -> dict:
+    """不复权列字典 -> 后复权（最早一段不变）"""
+    f = factor_series(cols["date"], table["days"], table["ratio"])
+    return _scaled(cols, f / np.prod(table["ratio"]))
+
+# ------------------ 因子表存储 ------------------
+class FactorStore:
+    """
+    fetcher(code_raw, True, limit) -> 前复权 rows（与 KlineStore 的 fetcher 相同）
+    表结构：days / ratio（事件）、start（建表覆盖的最早日期）、anchor（最近一次核对到的日期）、fetched_at
+    """
+    def __init__(self, root, fetcher, symbol_fn, topup_min: int = TOPUP_MIN,
+                 probe_daily: bool = PROBE_DAILY, probe_every_days: float = PROBE_EVERY_DAYS):
+        self.root = Path(os.path.expandvars(str(root))).expanduser()
+        self.fetcher = fetcher
+        self.symbol_fn = symbol_fn
+        self.topup_min = topup_min
+        self.probe_daily = probe_daily
+        self.probe_every = probe_every_days * 86400
+
+    def path(self, symbol: str) -> Path:
+        return self.root / "factor" / f"{symbol}.npz"
+
+    def load(self, symbol: str):
+        p = self.path(symbol)
+        if not p.exists():
+            return None
+        try:
+            with np.load(p) as z:
+                return {"days": z["days"], "ratio": z["ratio"], "start": int(z["start"]),
+                        "anchor": int(z["anchor"]), "fetched_at": float(z["fetched_at"])}
+        except Exception:
+            return None
+
+    def save(self, symbol: str, table: dict):
+        p = self.path(symbol)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.name + f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, days=table["days"].astype(np.int32), ratio=table["ratio"].astype(np.float64),
+                     start=np.int32(table["start"]), anchor=np.int32(table["anchor"]),
+                     fetched_at=np.float64(_time.time()))
+        os.replace(tmp, p)
+
+    def _full_plan(self, raw: dict) -> dict:
+        return {"table": None, "n": len(raw["date"]) + self.topup_min, "full": True}
+
+    def _plan(self, symbol: str, raw: dict) -> dict:
+        """n=0 不需要请求；full=True 按本地K线长度整段建表；否则只拉尾部核对"""
+        table = self.load(symbol)
+        if table is None or int(raw["date"][0]) < table["start"]:
+            return self._full_plan(raw)
+        if table["fetched_at"] >= last_session_close(now_cn()).timestamp():
+            return {"table": table, "n": 0, "full": False}
+        if (not self.probe_daily and _time.time() - table["fetched_at"] < self.probe_every
+                and not suspect_event(raw, table["anchor"], price_limit(symbol))):
+            return {"table": table, "n": 0, "full": False}
+        # 尾部从锚点日那根起（锚点之后本地已有几根就多拉几根），长假后也不多拉
+        after = len(raw["date"]) - int(np.searchsorted(raw["date"], table["anchor"], side="right"))
+        n_tail = max(self.topup_min, after + 1)
+        if n_tail >= len(raw["date"]):
+            return self._full_plan(raw)
+        return {"table": table, "n": n_tail, "full": False}
+
+    def _apply(self, symbol: str, plan: dict, raw: dict, rows: list):
+        """qfq rows 与本地不复权对齐后建表 / 追加新事件并落盘；尾部未覆盖锚点日时返回 None（需整段建表）"""
+        q = rows_to_cols(rows)
+        common, ia, ib = np.intersect1d(raw["date"], q["date"], assume_unique=True, return_indices=True)
+        if not plan["full"] and (len(common) == 0 or int(common[0]) > plan["table"]["anchor"]):
+            return None
+        ev_days, ev_ratio = find_events(common, raw["close"][ia], q["close"][ib])
+        if plan["full"]:
+            # 返回根数不足请求根数说明已拿到上市以来全部历史，否则只覆盖到对齐的最早一根
+            full_history = len(rows) < plan["n"] or len(common) == 0
+            table = {"days": ev_days, "ratio": ev_ratio,
+                     "start": int(raw["date"][0]) if full_history else int(common[0]),
+                     "anchor": int(common[-1]) if len(common) else int(raw["date"][-1])}
+        else:
+            old = plan["table"]
+            new = ev_days > old["anchor"]
+            table = {"days": np.concatenate([old["days"], ev_days[new]]),
+                     "ratio": np.concatenate([old["ratio"], ev_ratio[new]]),
+                     "start": old["start"], "anchor": max(old["anchor"], int(common[-1]))}
+        self.save(symbol, table)
+        return table
+
+    def get(self, code_raw: str, raw: dict) -> dict:
+        """raw 为已补齐尾部的不复权列字典；返回覆盖其全部日期的因子表"""
+        if len(raw["date"]) == 0:
+            return empty_table()
+        symbol = self.symbol_fn(code_raw)
+        plan = self._plan(symbol, raw)
+        if plan["n"] == 0:
+            return plan["table"]
+        table = self._apply(symbol, plan, raw, self.fetcher(code_raw, True, plan["n"]))
+        if table is None:
+            plan = self._full_plan(raw)
+            table = self._apply(symbol, plan, raw, self.fetcher(code_raw, True, plan["n"]))
+        return table
+
+    def get_many(self, raw_map: dict, fetch_many=None) -> dict:
+        """
+        批量版 get：raw_map {code_raw: 不复权列字典}；fetch_many([(code_raw, n), ...]) 并发拉 qfq
+        返回 {code_raw: 因子表 或 Exception}
+        """
+        out, plans = {}, {}
+        for code, raw in raw_map.items():
+            if len(raw["date"]) == 0:
+                out[code] = empty_table()
+                continue
+            symbol = self.symbol_fn(code)
+            plan = self._plan(symbol, raw)
+            if plan["n"] == 0:
+                out[code] = plan["table"]
+            else:
+                plans[code] = (symbol, plan)
+
+        for _ in range(2):  # 第二轮只处理尾部未覆盖锚点日、需要整段建表的
+            if not plans:
+                break
+            todo = list(plans.items())
+            items = [(code, plan["n"]) for code, (_, plan) in todo]
+            if fetch_many is None:
+                results = []
+                for code, n in items:
+                    try:
+                        results.append(self.fetcher(code, True, n))
+                    except Exception as e:
+                        results.append(e)
+            else:
+                results = fetch_many(items)
+            plans = {}
+            for (code, (symbol, plan)), rows in zip(todo, results):
+                if isinstance(rows, Exception):
+                    out[code] = rows
+                    continue
+                raw = raw_map[code]
+                table = self._apply(symbol, plan, raw, rows)
+                if table is None:
+                    plans[code] = (symbol, self._full_plan(raw))
+                else:
+                    out[code] = table
+        return out
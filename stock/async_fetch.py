@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+异步抓取后端（asyncio + aiohttp）
+- 一个 ClientSession 复用 keep-alive 连接；总并发 limit、每主机 limit_per_host 双重上限
+- 一批请求同时发出，总耗时≈最慢的单个请求，而不是逐个往返之和
+- 对 429/5xx 与网络错误按 backoff 重试（与 urllib3 Retry 口径一致）
+- 每次发送前占 rate_limit 的按主机自适应并发槽位（AIMD 上限，与 requests 后端的 GuardedAdapter 共用计数）
+  并经令牌桶等待；熔断打开的 base 直接返回 CircuitOpenError，结果计入同一份统计
+- 新浪/腾讯的 hq.sinajs.cn、web.ifzq.gtimg.cn 只提供 HTTP/1.1，这里靠 keep-alive + 并发，不走 HTTP/2
+
+依赖：pip install aiohttp
+"""
+import asyncio
+import json
+import time
+
+import rate_limit
+
+ASYNC_LIMIT = 64             # 总连接数上限
+ASYNC_LIMIT_PER_HOST = 16    # 每个主机连接数上限
+RETRY_STATUS = (429, 500, 502, 503, 504)
+SLOT_POLL = 0.01             # 主机并发槽位已满时的轮询间隔（秒）
+
+def available() -> bool:
+    try:
+        import aiohttp  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+async def _acquire(lim):
+    """异步版 HostLimiter.acquire：占自适应并发槽位（不阻塞事件循环），再按令牌桶等待"""
+    while not lim.try_acquire():
+        await asyncio.sleep(SLOT_POLL)
+    await asyncio.sleep(lim.reserve())
+
+async def _get_one(session, sem, req: dict, timeout: float, retries: int, backoff: float, proxies):
+    import aiohttp
+    url = req["url"]
+    proxy = None
+    if proxies:
+        proxy = proxies.get("https" if url.startswith("https") else "http")
+    last_err = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(backoff * (2 ** (attempt - 1)))
+        try:
+            rate_limit.check(url)
+        except rate_limit.CircuitOpenError as e:
+            return e
+        lim = rate_limit.limiter(url)
+        t0 = time.monotonic()
+        try:
+            async with sem:
+                await _acquire(lim)
+                t0 = time.monotonic()
+                try:
+                    async with session.get(url, params=req.get("params"), headers=req.get("headers"),
+                                           proxy=proxy, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                        rate_limit.record(url, time.monotonic() - t0, status=r.status)
+                        if r.status in RETRY_STATUS:
+                            last_err = RuntimeError(f"HTTP {r.status}: {url}")
+                            continue
+                        body = await r.read()
+                finally:
+                    lim.release()
+            if req.get("raw"):
+                return body
+            text = body.decode(req.get("encoding") or "utf-8", errors="replace")
+            return json.loads(text) if req.get("json") else text
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            rate_limit.record(url, time.monotonic() - t0, error=e)
+            last_err = e
+    return last_err if last_err else RuntimeError(f"请求失败: {url}")
+
+async def _get_all(reqs: list, timeout: float, retries: int, backoff: float, headers, proxies,
+                   limit: int, limit_per_host: int) -> list:
+    import aiohttp
+    conn = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host, keepalive_timeout=30)
+    sem = asyncio.Semaphore(limit)
+    async with aiohttp.ClientSession(connector=conn, headers=headers, trust_env=False) as session:
+        tasks = [_get_one(session, sem, r, timeout, retries, backoff, proxies) for r in reqs]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+def fetch_all(reqs: list, timeout: float = 5, retries: int = 2, backoff: float = 0.4,
+              headers: dict = None, proxies: dict = None,
+              limit: int = ASYNC_LIMIT, limit_per_host: int = ASYNC_LIMIT_PER_HOST) -> list:
+    """
+    reqs: [{"url":..., "params":..., "headers":..., "encoding": "gbk", "json": False, "raw": False}, ...]
+    返回与 reqs 等长同序的结果列表：文本 / JSON 对象 / 原始字节（raw） / Exception（失败不抛出）
+    """
+    if not reqs:
+        return []
+    return asyncio.run(_get_all(reqs, timeout, retries, backoff, headers, proxies, limit, limit_per_host))
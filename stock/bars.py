@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑日K容器（替代 [[date, o, c, h, l, v], ...] 与每只股票一个 DataFrame）
+- 列式连续数组：date(int32, 距1970-01-01天数) / open / close / high / low（PRICE_DTYPE）/ volume(float64, 手)
+- 从腾讯 fqkline JSON 的字符串数组一次性整块转数值，不逐个装箱成 Python float
+- bars[:k] 为切片视图（与 hist.iloc[:k] 等价，不复制）；bars["close"] 取列数组
+- 与 kline_store 的列字典互转零拷贝；to_rows / to_frame 只在导出、JSON 等边界使用
+"""
+import numpy as np
+
+PRICE_DTYPE = np.float64     # 改 np.float32 价格列内存再减半（均线/ATR 末位会有舍入差异）
+COLS = ("open", "close", "high", "low", "volume")
+
+class Bars:
+    __slots__ = ("date",) + COLS
+
+    def __init__(self, date, open, close, high, low, volume):
+        self.date = np.asarray(date, dtype=np.int32)
+        self.open = np.asarray(open, dtype=PRICE_DTYPE)
+        self.close = np.asarray(close, dtype=PRICE_DTYPE)
+        self.high = np.asarray(high, dtype=PRICE_DTYPE)
+        self.low = np.asarray(low, dtype=PRICE_DTYPE)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    # —— 构造 —— #
+    @classmethod
+    def empty(cls) -> "Bars":
+        return cls(*([np.zeros(0)] * 6))
+
+    @classmethod
+    def from_cols(cls, cols: dict) -> "Bars":
+        """kline_store 列字典 -> Bars（dtype 一致时不复制）"""
+        return cls(cols["date"], *(cols[c] for c in COLS))
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "Bars":
+        """[[date, open, close, high, low, volume], ...] -> Bars"""
+        if isinstance(rows, Bars):
+            return rows
+        if not rows:
+            return cls.empty()
+        num = np.array([r[1:6] for r in rows], dtype=np.float64)
+        return cls(np.array([r[0] for r in rows], dtype="datetime64[D]").astype(np.int32), *num.T)
+
+    @classmethod
+    def from_kline(cls, arr: list) -> "Bars":
+        """
+        腾讯 fqkline 的 day / qfqday 数组（元素为字符串列表或逗号串）-> Bars
+        close/high/low/volume 无法解析的行丢弃；open 无法解析记为 NaN
+        """
+        if arr and isinstance(arr[0], str):
+            arr = [it.split(",") for it in arr]
+        parts = [p if len(p) == 6 else p[:6] for p in arr if len(p) >= 6]   # 除权日行末尾带分红信息字典，截掉
+        if not parts:
+            return cls.empty()
+        obj = np.array(parts, dtype=object)
+        try:
+            num = obj[:, 1:].astype(np.float64)           # 整块字符串 -> 数值，一次完成
+        except (TypeError, ValueError):
+            num = np.array([[_num(x) for x in p[1:6]] for p in parts], dtype=np.float64)
+        keep = ~np.isnan(num[:, 1:]).any(axis=1)
+        days = obj[:, 0].astype("datetime64[D]").astype(np.int32)
+        if not keep.all():
+            days, num = days[keep], num[keep]
+        return cls(days, *num.T)
+
+    # —— 访问 —— #
+    def __len__(self) -> int:
+        return len(self.date)
+
+    def __getitem__(self, key):
+        """bars["close"] -> 列数组；bars[a:b] -> 切片视图"""
+        if isinstance(key, str):
+            return getattr(self, key)
+        if isinstance(key, slice):
+            return Bars(self.date[key], *(getattr(self, c)[key] for c in COLS))
+        raise TypeError(f"Bars 只支持列名或切片: {key!r}")
+
+    def date_str(self, i: int) -> str:
+        """第 i 根的 'YYYY-MM-DD'"""
+        return str(np.datetime64(int(self.date[i]), "D"))
+
+    def dates(self) -> np.ndarray:
+        return np.datetime_as_string(self.date.astype("datetime64[D]"), unit="D")
+
+    def cols(self) -> dict:
+        """-> kline_store 列字典（不复制）"""
+        return {"date": self.date, **{c: getattr(self, c) for c in COLS}}
+
+    @property
+    def nbytes(self) -> int:
+        return self.date.nbytes + sum(getattr(self, c).nbytes for c in COLS)
+
+    # —— 边界转换 —— #
+    def to_rows(self) -> list:
+        """-> [[date, open, close, high, low, volume], ...]（JSON 输出用）"""
+        return [list(r) for r in zip(self.dates().tolist(), *(getattr(self, c).tolist() for c in COLS))]
+
+    def to_frame(self):
+        import pandas as pd
+        df = pd.DataFrame({c: getattr(self, c) for c in COLS}, copy=False)
+        df.insert(0, "date", self.dates())
+        return df
+
+def _num(x) -> float:
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return float("nan")
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+多股票批量指标（股票 × 交易日 二维数组，一次算完整个股票池）
+- 每只股票截到各自基准日后右对齐堆叠，左侧不足部分填 NaN
+- 滑动均值按 pandas rolling().mean() 的逐根增删 + Kahan 补偿口径沿时间轴推进，
+  每一步对所有股票同时做向量运算，结果与逐只 pandas 计算逐位一致
+- ATR：TR 同 calc_tr；'sma' = 滑动均值，'wilder' = ewm(alpha=1/n, adjust=False)
+"""
+import numpy as np
+
+def stack_right(arrays: list, width: int = None) -> np.ndarray:
+    """一组一维数组 -> (股票数, width) 二维数组，右对齐，左侧填 NaN"""
+    width = width or max((len(a) for a in arrays), default=0)
+    out = np.full((len(arrays), width), np.nan)
+    for i, a in enumerate(arrays):
+        a = np.asarray(a, dtype=np.float64)[-width:]
+        if len(a):
+            out[i, width - len(a):] = a
+    return out
+
+def rolling_mean_last(x: np.ndarray, w: int, keep: int = 1) -> np.ndarray:
+    """
+    x: (S, D)；返回每行 rolling(w).mean() 的最后 keep 列，形状 (S, keep)
+    """
+    S, D = x.shape
+    out = np.full((S, keep), np.nan)
+    sum_x = np.zeros(S); comp_add = np.zeros(S); comp_rem = np.zeros(S)
+    nobs = np.zeros(S, dtype=np.int64); neg_ct = np.zeros(S, dtype=np.int64)
+    same_ct = np.zeros(S, dtype=np.int64)
+    prev_val = x[:, 0].copy() if D else np.zeros(S)
+    for i in range(D):
+        if i >= w:
+            val = x[:, i - w]
+            ok = val == val
+            y = -val - comp_rem
+            t = sum_x + y
+            comp_rem = np.where(ok, t - sum_x - y, comp_rem)
+            sum_x = np.where(ok, t, sum_x)
+            nobs -= ok
+            neg_ct -= ok & np.signbit(val)
+
+        val = x[:, i]
+        ok = val == val
+        y = val - comp_add
+        t = sum_x + y
+        comp_add = np.where(ok, t - sum_x - y, comp_add)
+        sum_x = np.where(ok, t, sum_x)
+        nobs += ok
+        neg_ct += ok & np.signbit(val)
+        same_ct = np.where(ok, np.where(val == prev_val, same_ct + 1, 1), same_ct)
+        prev_val = np.where(ok, val, prev_val)
+
+        j = i - (D - keep)
+        if j >= 0:
+            valid = (nobs >= w) & (nobs > 0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res = sum_x / nobs
+            res = np.where(same_ct >= nobs, prev_val, res)
+            res = np.where((neg_ct == 0) & (res < 0), 0.0, res)
+            res = np.where((neg_ct == nobs) & (res > 0), 0.0, res)
+            out[:, j] = np.where(valid, res, np.nan)
+    return out
+
+def ewm_mean_last(x: np.ndarray, alpha: float) -> np.ndarray:
+    """x: (S, D)；返回每行 ewm(alpha, adjust=False).mean() 的最后一列"""
+    S, D = x.shape
+    com = 1.0 / alpha - 1.0
+    a = 1.0 / (1.0 + com)
+    old_wt = 1.0 * (1.0 - a)
+    weighted = x[:, 0].copy() if D else np.full(S, np.nan)
+    for i in range(1, D):
+        cur = x[:, i]
+        obs = cur == cur
+        has = weighted == weighted
+        upd = (old_wt * weighted + a * cur) / (old_wt + a)
+        upd = np.where(weighted != cur, upd, weighted)
+        weighted = np.where(has, np.where(obs, upd, weighted), np.where(obs, cur, weighted))
+    return weighted
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev_close = np.full_like(close, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    with np.errstate(invalid="ignore"):
+        return np.fmax(np.fmax(np.abs(high - low), np.abs(high - prev_close)), np.abs(low - prev_close))
+
+def count_valid(x: np.ndarray) -> np.ndarray:
+    return (x == x).sum(axis=1)
+
+def batch_last_metrics(close: np.ndarray, high: np.ndarray, low: np.ndarray, vol: np.ndarray,
+                       lookback: int = 20, atr_n: int = 10, atr_method: str = "sma") -> dict:
+    """
+    输入均为 (S, D) 右对齐数组（最后一列=各自基准日）；返回各指标 (S,) 数组
+    """
+    ma20_2 = rolling_mean_last(close, 20, keep=2)
+    tr = true_range(high, low, close)
+    if atr_method == "wilder":
+        atr = np.where(count_valid(tr) >= atr_n, ewm_mean_last(tr, 1 / atr_n), np.nan)
+    else:
+        atr = rolling_mean_last(tr, atr_n)[:, 0]
+    with np.errstate(invalid="ignore"):
+        p_res = np.nanmax(high[:, -lookback:], axis=1) if high.shape[1] else np.full(len(high), np.nan)
+    return {
+        "ma5": rolling_mean_last(close, 5)[:, 0],
+        "ma10": rolling_mean_last(close, 10)[:, 0],
+        "ma20": ma20_2[:, 1],
+        "ma20_prev": ma20_2[:, 0],
+        "ma60": rolling_mean_last(close, 60)[:, 0],
+        "p_res": p_res,
+        "close": close[:, -1],
+        "atr": atr,
+        "vol10": rolling_mean_last(vol, 10)[:, 0],
+        "vol": vol[:, -1],
+    }
@@ -3,15 +3,26 @@
 实时价格 + 盘中量比（VOL10 来自腾讯 fqkline，与“稳定版”脚本一致）
 - 价格/当日量：新浪 (hq.sinajs.cn)；当日量单位=股 -> 换算为“手”（/100）
 - VOL10（手）：腾讯 fqkline（前复权可选），按“基准日”口径取到昨日为止的10日均量
+- 日K本地缓存（kline_store）：每次只补拉缺失的尾部；前复权由不复权K线 + 复权因子表在本地生成（adjust）
 - 盘中进度 ft：A股时段(9:30-11:30, 13:00-15:00)，可设最小夹值避免早盘极端放大
+- 交易日历（trade_calendar）：识别节假日；VOL10 的“昨日”按日历取上一交易日，不再按根数猜
+- 分时成交分布（intraday_profile，USE_INTRADAY_PROFILE）：按历史各分钟累计量占比折算应有量，
+  替代线性 ft；无分布的股票回退线性 ft
 - 输出：获取时间 + “股票名称\t价格\t盘中量比”
+- 连接：进程内共享 keep-alive 连接池（http_pool），不再每个请求重新握手
+- 常驻模式（--watch）：VOL10 每天只算一次，会话复用，按间隔轮询新浪全字段快照；
+  quote_delta 以上次输出为基准整列算 Δ价% / 增量 / Δ量比，只输出越过阈值的行（stdout / 文件 / UDP）
 """
+import os
 import re
 import math
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from datetime import datetime, time, timedelta
+import time as _time
+import argparse
+import rate_limit
+import stock_core
+from stock_core import (KLINE_BASES, kline_params, load_codes, norm6, parse_kline_json,
+                        to_sina_symbol, to_tencent_symbol)
+from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
@@ -20,283 +31,237 @@ except Exception:
     ZoneInfo = None
 
 # ========= 配置 =========
-CODES = [
-    # AI算力（服务器/IDC/散热/光模块/PCB/连接器/封测/UPS）
-    "603019.SH",  # 中科曙光
-    "601138.SH",  # 工业富联
-    "603881.SH",  # 数据港
-    "002837.SZ",  # 英维克
-    "002156.SZ",  # 通富微电
-    "600183.SH",  # 生益科技
-    "002463.SZ",  # 沪电股份
-    "002916.SZ",  # 深南电路
-    "002475.SZ",  # 立讯精密
-    "002281.SZ",  # 光迅科技
-    "600487.SH",  # 亨通光电
-    "603986.SH",  # 兆易创新
-    "002518.SZ",  # 科士达
-    "002335.SZ",  # 科华数据
-
-    # 电网数字化/特高压
-    "603556.SH",  # 海兴电力
-    "601567.SH",  # 三星医疗
-    "600268.SH",  # 国电南自
-    "601877.SH",  # 正泰电器
-    "000400.SZ",  # 许继电气
-    "600312.SH",  # 平高电气
-    "600406.SH",  # 国电南瑞
-    "601126.SH",  # 四方股份
-    "601179.SH",  # 中国西电
-    "603530.SH",  # 神马电力
-    "002270.SZ",  # 华明装备
-    "002028.SZ",  # 思源电气
-    "600089.SH",  # 特变电工
-    "600885.SH",  # 宏发股份
-
-    # 航天军工/低空经济/通信
-    "601698.SH",  # 中国卫通
-    "600118.SH",  # 中国卫星
-    "002389.SZ",  # 航天彩虹
-    "002111.SZ",  # 威海广泰
-
-    # 消费电子/渠道/ODM/结构件
-    "600745.SH",  # 闻泰科技
-    "002241.SZ",  # 歌尔股份
-    "605133.SH",  # 华勤技术
-    "002600.SZ",  # 领益智造
-    "002624.SZ",  # 完美世界
-
-    # 机器人/工控
-    "000559.SZ",  # 万向钱潮
-    "002050.SZ",  # 三花智控
-    "601100.SH",  # 恒立液压
-    "002979.SZ",  # 雷赛智能
-    "603416.SH",  # 信捷电气
-    "603728.SH",  # 鸣志电器
-    "603283.SH",  # 赛腾股份
-    "600592.SH",  # 龙溪股份
-
-    # 有色/资源
-    "600111.SH",  # 北方稀土
-    "600366.SH",  # 宁波韵升
-    "600392.SH",  # 盛和资源
-    "601600.SH",  # 中国铝业
-    "000807.SZ",  # 云铝股份
-    "002532.SZ",  # 天山铝业
-    "000612.SZ",  # 焦作万方
-    "601899.SH",  # 紫金矿业
-    "603993.SH",  # 洛阳钼业
-    "603799.SH",  # 华友钴业
-    "600549.SH",  # 厦门钨业
-
-    # 锂电/材料
-    "002466.SZ",  # 天齐锂业
-    "002460.SZ",  # 赣锋锂业
-    "002074.SZ",  # 国轩高科
-    "002709.SZ",  # 天赐材料
-    "603026.SH",  # 石大胜华
-    "002759.SZ",  # 天际股份
-    "002407.SZ",  # 多氟多
-
-    # 智能电动车
-    "601689.SH",  # 拓普集团
-    "605255.SH",  # 天普股份
-
-    # 公用事业/风电/核电
-    "601985.SH",  # 中国核电
-    "003816.SZ",  # 中国广核
-    "600021.SH",  # 上海电力
-    "002202.SZ",  # 金风科技
-
-    # 金融/软件/环保
-    "601211.SH",  # 国泰海通
-    "601009.SH",  # 南京银行
-    "600797.SH",  # 浙大网新
-
-    # 半导体特气/化学品/医药
-    "002549.SZ",  # 凯美特气
-    "002409.SZ",  # 雅克科技
-    "600867.SH",  # 通化东宝
-
-    # 新增
-    "600057.SH",  # 厦门象屿
-    "600593.SH",  # 大连圣亚
-    "000555.SZ",  # 神州信息
-]
+CODES = load_codes()           # 自选股在外部文件（stock_core.WATCHLIST_FILE，默认同目录 watchlist.txt）
 USE_QFQ = True                  # 腾讯K线是否用前复权
 KLINE_LIMIT = 260               # fqkline 取多少根（足够算10日均量即可）
+USE_KLINE_CACHE = True          # 日K走本地缓存（只补缺失的尾部）
+LOCAL_ADJUST = True             # 前复权在本地由不复权K线 × 复权因子表生成（adjust），除权只刷新因子表
+KLINE_CACHE_DIR = os.path.join("~", ".cache", "stock_kline")  # 与分析脚本共用
 REQ_TIMEOUT = 5                 # 单请求超时（秒）
 RETRY_TOTAL = 2                 # 重试次数（腾讯/新浪）
 CONCURRENCY = 12                # 并发抓K线
+FETCH_BACKEND = "thread"        # 'thread'（requests+线程池）或 'async'（asyncio+aiohttp，未安装时回退）
 BASE_DAY_FOR_VOL10 = "yesterday"  # 'today' or 'yesterday'，盘中推荐 'yesterday'
 
-FT_MIN_CLAMP = 0.03             # 盘中进度最小夹值（早盘避免量比极端放大）
+FT_MIN_CLAMP = 0.03             # 盘中进度最小夹值（早盘避免量比极端放大）；仅线性 ft 时使用
+USE_INTRADAY_PROFILE = True     # 盘中量比按分时成交分布折算（分布本地缓存，每天只更新一次）
+WATCH_INTERVAL = 3.0            # 常驻模式轮询间隔（秒）
+DELTA_PRICE_PCT = 0.1           # 常驻模式：距上次输出价格变动 ≥ 该百分比才输出（0=有变化即输出，None=不看）
+DELTA_VOL_HAND = None           # 常驻模式：距上次输出新增成交 ≥ 该手数才输出
+DELTA_RATIO = 0.05              # 常驻模式：距上次输出量比变动 ≥ 该值才输出
+WATCH_SINK = "stdout"           # 常驻模式输出：'stdout' / 'file:路径' / 'udp:127.0.0.1:9999'
 PRINT_DEBUG  = False            # 打印调试日志
 DISABLE_SYSTEM_PROXY = True     # 忽略系统代理（如需走系统代理改为 False）
+QUOTE_SERVER = None             # 本机行情分发服务（quote_server），如 "http://127.0.0.1:8765"；None=直连上游
 PROXIES = None                  # 也可自定义: {"http":"http://127.0.0.1:7890","https":"http://127.0.0.1:7890"}
 
 # ========= 公共函数 =========
-def norm6(code: str) -> str:
-    m = re.search(r"(\d{6})", code)
-    if not m:
-        raise ValueError(f"无效代码: {code}")
-    return m.group(1)
-
-def to_sina_symbol(code: str) -> str:
-    c6 = norm6(code)
-    return ("sh" if code.upper().endswith(".SH") else "sz") + c6
-
-def to_tencent_symbol(code: str) -> str:
-    c6 = norm6(code)
-    if code.upper().endswith(".SH") or c6.startswith(("5","6","9")):
-        return f"sh{c6}"
-    return f"sz{c6}"
-
 def make_session():
-    s = requests.Session()
-    retry = Retry(
-        total=RETRY_TOTAL, connect=RETRY_TOTAL, read=RETRY_TOTAL,
-        backoff_factor=0.4,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=frozenset(["GET"]),
-        raise_on_status=False,
-    )
-    s.mount("http://", HTTPAdapter(max_retries=retry))
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    s.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Accept": "*/*",
-        "Connection": "close"
-    })
-    if DISABLE_SYSTEM_PROXY:
-        s.trust_env = False
-    if PROXIES:
-        s.proxies.update(PROXIES)
-    return s
+    """进程内共享的 keep-alive 连接池（大小=CONCURRENCY），新浪/腾讯共用"""
+    return stock_core.make_session(pool_size=CONCURRENCY, retry_total=RETRY_TOTAL, backoff_factor=0.4,
+                                   disable_system_proxy=DISABLE_SYSTEM_PROXY, proxies=PROXIES)
 
 # ========= 盘中进度 =========
-def trading_progress_now() -> float:
-    """A股盘中进度 ft∈[0,1]，午休固定 0.5；盘后为 1.0。"""
+def now_cn() -> datetime:
     try:
-        now = datetime.now(ZoneInfo("Asia/Shanghai")) if ZoneInfo else datetime.utcnow() + timedelta(hours=8)
+        return datetime.now(ZoneInfo("Asia/Shanghai")) if ZoneInfo else datetime.utcnow() + timedelta(hours=8)
     except Exception:
-        now = datetime.utcnow() + timedelta(hours=8)
-    t = now.time()
-    am_start, am_end = time(9,30), time(11,30)
-    pm_start, pm_end = time(13,0), time(15,0)
-    total = 240  # 分钟
-
-    if t < am_start:
-        return 0.0
-    if am_start <= t <= am_end:
-        elapsed = (t.hour*60 + t.minute) - (9*60 + 30)
-        return max(0.0, min(1.0, elapsed/total))
-    if am_end < t < pm_start:
-        return 120/total
-    if pm_start <= t <= pm_end:
-        elapsed = 120 + (t.hour*60 + t.minute - 13*60)
-        return max(0.0, min(1.0, elapsed/total))
-    return 1.0
+        return datetime.utcnow() + timedelta(hours=8)
+
+def trading_progress_now() -> float:
+    """A股盘中进度 ft∈[0,1]，午休固定 0.5；盘后与非交易日为 1.0（查 trade_calendar 分钟表）"""
+    from trade_calendar import progress_now
+    return progress_now()
 
 # ========= 新浪：价格 + 当日量(股) =========
-def fetch_price_and_vol_hand_by_sina(codes: list) -> dict:
+SINA_BATCH = 60
+SINA_HEADERS = {"Referer": "https://finance.sina.com.cn"}
+
+# 一次编译、整段文本单遍扫描：代码、名称、今开、昨收、现价、（跳过高/低/买一/卖一）、成交量(股)、成交额(元)
+SINA_RE = re.compile(r'hq_str_(?:s[hz]|bj)(\d{6})="([^,"]*),([^,"]*),([^,"]*),([^,"]*),(?:[^,"]*,){4}([^,"]*),([^,"]*)')
+
+def parse_sina_text(text: str, out: dict) -> dict:
+    """解析新浪 hq_str 文本，写入 out：{c6: {"name", "price", "vol_hand"}}（停牌/无效代码的空串行跳过）"""
+    for m in SINA_RE.finditer(text):
+        c6, name, _, _, price, vol, _ = m.groups()
+        try:
+            vol_hand = float(vol) / 100.0  # 成交量（股）-> 手
+        except ValueError:
+            vol_hand = None
+        out[c6] = {"name": name.strip(), "price": price.strip(), "vol_hand": vol_hand}
+    return out
+
+def use_async_backend() -> bool:
+    if FETCH_BACKEND != "async":
+        return False
+    import async_fetch
+    if async_fetch.available():
+        return True
+    if PRINT_DEBUG:
+        print("[DBG] 未安装 aiohttp，回退到线程后端", flush=True)
+    return False
+
+def fetch_sina_raw(codes: list, sess=None) -> list:
+    """新浪 60 只一批的原始响应字节列表；FETCH_BACKEND='async' 时所有批并发发出；配置 QUOTE_SERVER 时走本机服务"""
+    if QUOTE_SERVER:
+        import quote_server
+        return [quote_server.client_sina(QUOTE_SERVER, codes)]
+    syms = [to_sina_symbol(c) for c in codes]
+    urls = ["https://hq.sinajs.cn/list=" + ",".join(syms[i:i+SINA_BATCH]) for i in range(0, len(syms), SINA_BATCH)]
+    if use_async_backend():
+        import async_fetch
+        bodies = async_fetch.fetch_all(
+            [{"url": u, "headers": SINA_HEADERS, "raw": True} for u in urls],
+            timeout=REQ_TIMEOUT, retries=RETRY_TOTAL, headers={"User-Agent": "Mozilla/5.0", "Accept": "*/*"},
+            proxies=PROXIES, limit=CONCURRENCY,
+        )
+        for body in bodies:
+            if isinstance(body, Exception):
+                raise body
+        return bodies
+
+    sess = sess or make_session()
+    return [sess.get(url, headers=SINA_HEADERS, timeout=REQ_TIMEOUT).content for url in urls]
+
+def fetch_price_and_vol_hand_by_sina(codes: list, sess=None) -> dict:
     """
     返回 {c6: {"name": 名称, "price": "现价", "vol_hand": 当日量(手)}}
+    sess：可传入常驻会话复用连接；不传则新建
+    FETCH_BACKEND='async' 时所有 60 只一批的请求并发发出
     """
-    sess = make_session()
-    syms = [to_sina_symbol(c) for c in codes]
     out = {}
-    for i in range(0, len(syms), 60):
-        batch = syms[i:i+60]
-        url = "https://hq.sinajs.cn/list=" + ",".join(batch)
-        r = sess.get(url, headers={"Referer": "https://finance.sina.com.cn"}, timeout=REQ_TIMEOUT)
-        r.encoding = "gbk"
-        for line in r.text.strip().splitlines():
-            m = re.match(r'var hq_str_(sh|sz)(\d{6})="([^"]*)";', line)
-            if not m:
-                continue
-            c6 = m.group(2)
-            payload = m.group(3)
-            parts = payload.split(",")
-            name, price, vol_hand = "", "", None
-            if len(parts) >= 9:
-                name = parts[0].strip()
-                price = parts[3].strip()  # 现价
-                try:
-                    vol_shares = float(parts[8].strip())  # 成交量（股）
-                    vol_hand = vol_shares / 100.0
-                except Exception:
-                    vol_hand = None
-            out[c6] = {"name": name, "price": price, "vol_hand": vol_hand}
+    for body in fetch_sina_raw(codes, sess):
+        parse_sina_text(body.decode("gbk", errors="replace"), out)
     return out
 
+def fetch_snapshot_sina(codes: list, sess=None):
+    """
+    全字段快照：quote_parser.SNAPSHOT_DTYPE 结构化数组，行序与 codes 一致（无行情的行 code=-1）
+    含今开/昨收/最高/最低/五档/成交额及派生的涨跌幅、振幅、盘口失衡、均价
+    """
+    import numpy as np
+    import quote_parser as Q
+    snap = Q.sina_snapshot(b"\n".join(fetch_sina_raw(codes, sess)))
+    keys = np.array([int(norm6(c)) + (1_000_000 if to_sina_symbol(c).startswith("sh") else 0) for c in codes],
+                    dtype=np.int64)
+    return Q.align(snap, keys)
+
 # ========= 腾讯 fqkline（日K，复用“稳定版”口径） =========
-def fetch_hist_tencent(code_raw: str, use_qfq: bool=True, limit: int=1200) -> list:
+def fetch_hist_tencent(code_raw: str, use_qfq: bool=True, limit: int=1200) -> "Bars":
     """
-    返回数组 rows: [[date, open, close, high, low, volume], ...]
+    返回 Bars：date(int32 天数) / open / close / high / low / volume 列数组
     volume 单位=手
     """
-    symbol = to_tencent_symbol(code_raw)
-    adj = "qfq" if use_qfq else ""
-    params = {"param": f"{symbol},day,,,{limit},{adj}"}
-    bases = ["http://web.ifzq.gtimg.cn/appstock/app/fqkline/get",
-             "https://web.ifzq.gtimg.cn/appstock/app/fqkline/get"]
-    last_err = None
-    for base in bases:
-        try:
-            sess = make_session()
-            j = sess.get(base, params=params, timeout=REQ_TIMEOUT).json()
-            data = j.get("data", {}) or {}
-            node = data.get(symbol, {}) or {}
-            arr = node.get("qfqday" if use_qfq else "day") or node.get("day")
-            if not arr:
-                raise RuntimeError("empty kline")
-            rows = []
-            for it in arr:
-                parts = it.split(",") if isinstance(it, str) else it
-                if len(parts) < 6:
-                    continue
-                rows.append([parts[0], float(parts[1]), float(parts[2]), float(parts[3]), float(parts[4]), float(parts[5])])
-            return rows
-        except Exception as e:
-            last_err = e
-            continue
-    raise last_err if last_err else RuntimeError(f"kline failed: {code_raw}")
+    return stock_core.fetch_kline(code_raw, use_qfq, limit, sess=make_session(), timeout=REQ_TIMEOUT)
 
-def choose_base_index(n: int, base_day: str) -> int:
-    if n <= 0:
-        return 0
-    if base_day == "yesterday" and n >= 2:
-        return n - 2
-    return n - 1
-
-def calc_vol10_hand_from_rows(rows: list, base_day: str="yesterday") -> float:
+def fetch_hist_many_async(items: list, use_qfq: bool=True) -> list:
+    """
+    items: [(code_raw, limit), ...]；所有请求并发发出，失败的再用下一个 base 并发补一轮
+    返回与 items 等长同序的 Bars 或 Exception
+    """
+    import async_fetch
+    results = [RuntimeError("kline failed")] * len(items)
+    todo = list(range(len(items)))
+    for base in rate_limit.order_bases(KLINE_BASES):
+        if not todo:
+            break
+        reqs = [{"url": base, "params": kline_params(items[i][0], use_qfq, items[i][1]), "json": True} for i in todo]
+        got = async_fetch.fetch_all(reqs, timeout=REQ_TIMEOUT, retries=RETRY_TOTAL,
+                                    headers={"User-Agent": "Mozilla/5.0", "Accept": "*/*"},
+                                    proxies=PROXIES, limit=CONCURRENCY)
+        failed = []
+        for i, j in zip(todo, got):
+            try:
+                if isinstance(j, Exception):
+                    raise j
+                results[i] = parse_kline_json(j, items[i][0], use_qfq)
+            except Exception as e:
+                results[i] = e
+                failed.append(i)
+        todo = failed
+    return results
+
+_KLINE_STORE = None
+
+def get_kline_store():
+    global _KLINE_STORE
+    from kline_store import KlineStore
+    if _KLINE_STORE is None:
+        fetcher = lambda c, q, n: fetch_hist_tencent(c, use_qfq=q, limit=n)
+        factors = None
+        if LOCAL_ADJUST:
+            from adjust import FactorStore
+            factors = FactorStore(KLINE_CACHE_DIR, fetcher, to_tencent_symbol)
+        _KLINE_STORE = KlineStore(KLINE_CACHE_DIR, fetcher, to_tencent_symbol, factors=factors)
+    return _KLINE_STORE
+
+def fetch_hist_cached(code_raw: str, use_qfq: bool=True, limit: int=1200) -> "Bars":
     """
-    rows: [[date, open, close, high, low, volume(手)], ...]
+    同 fetch_hist_tencent；USE_KLINE_CACHE 时读本地日K，只拉缺失的尾部；配置 QUOTE_SERVER 时走本机服务
+    """
+    from bars import Bars
+    if QUOTE_SERVER:
+        import quote_server
+        return Bars.from_rows(quote_server.client_kline(QUOTE_SERVER, code_raw, use_qfq=use_qfq, limit=limit))
+    if not USE_KLINE_CACHE:
+        return fetch_hist_tencent(code_raw, use_qfq=use_qfq, limit=limit)
+    return Bars.from_cols(get_kline_store().get(code_raw, use_qfq=use_qfq, limit=limit))
+
+def fetch_hist_many_cached_async(codes: list, use_qfq: bool=True, limit: int=1200) -> dict:
+    """
+    批量异步版：返回 {code_raw: Bars 或 Exception}；缓存开启时只并发拉各自缺失的尾部
+    """
+    from bars import Bars
+    fetch_many = lambda items, q: fetch_hist_many_async(items, use_qfq=q)
+    if not USE_KLINE_CACHE:
+        return dict(zip(codes, fetch_many([(c, limit) for c in codes], use_qfq)))
+    got = get_kline_store().get_many(codes, use_qfq=use_qfq, limit=limit, fetch_many=fetch_many)
+    return {c: (v if isinstance(v, Exception) else Bars.from_cols(v)) for c, v in got.items()}
+
+def choose_base_index(bars: "Bars", base_day: str) -> int:
+    """基准K线下标：日期不晚于交易日历给出的目标日（'today'=当前行情所属交易日，'yesterday'=其上一交易日）的最后一根"""
+    if not len(bars):
+        return -1
+    from trade_calendar import base_index
+    return base_index(bars.date, base_day)
+
+def calc_vol10_hand_from_rows(bars: "Bars", base_day: str="yesterday") -> float:
+    """
+    bars: 日K（volume 单位=手）
     返回：到“基准日”为止的 10 日均量（手）
     """
-    if not rows:
-        return float("nan")
-    base_idx = choose_base_index(len(rows), base_day)
-    # 取到基准日（含）
-    vols = [r[5] for r in rows[:base_idx+1] if len(r) >= 6]
+    base_idx = choose_base_index(bars, base_day)
+    # 取到基准日（含）的最近10个
+    vols = bars.volume[:base_idx+1]
     if len(vols) < 10:
         return float("nan")
-    # 取最近10个（基准日含在内）
-    last10 = vols[-10:]
-    return float(sum(last10) / 10.0)
+    return float(vols[-10:].sum() / 10.0)
 
 def build_vol10_map_tencent_concurrent(codes: list, use_qfq: bool=True, base_day: str="yesterday") -> dict:
     """
     并发抓腾讯K线，返回 {c6: vol10_hand}
+    FETCH_BACKEND='async' 时所有K线请求在一个事件循环里并发发出
     """
     out = {}
     if not codes:
         return out
+    # 成交量不复权：本地复权时 VOL10 直接用不复权K线，免去因子表刷新
+    use_qfq = use_qfq and not (LOCAL_ADJUST and USE_KLINE_CACHE)
+
+    if use_async_backend() and not QUOTE_SERVER:
+        for code, rows in fetch_hist_many_cached_async(codes, use_qfq=use_qfq, limit=KLINE_LIMIT).items():
+            if isinstance(rows, Exception):
+                if PRINT_DEBUG:
+                    print(f"[DBG-vol10-err] {code}: {rows}", flush=True)
+                out[norm6(code)] = float("nan")
+                continue
+            out[norm6(code)] = calc_vol10_hand_from_rows(rows, base_day=base_day)
+        _warn_vol10_failures(out)
+        return out
 
     def worker(code):
         try:
-            rows = fetch_hist_tencent(code, use_qfq=use_qfq, limit=KLINE_LIMIT)
+            rows = fetch_hist_cached(code, use_qfq=use_qfq, limit=KLINE_LIMIT)
             vol10 = calc_vol10_hand_from_rows(rows, base_day=base_day)
             if PRINT_DEBUG:
                 print(f"[DBG-vol10] {code} via tencent: {vol10}", flush=True)
@@ -311,52 +276,201 @@ def build_vol10_map_tencent_concurrent(codes: list, use_qfq: bool=True, base_day
         for fu in as_completed(futs):
             c6, v = fu.result()
             out[c6] = v
+    _warn_vol10_failures(out)
     return out
 
-# ========= 主流程 =========
-def main():
-    try:
-        fetch_time = (datetime.now(ZoneInfo("Asia/Shanghai")) if ZoneInfo else datetime.utcnow() + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
-    except Exception:
-        fetch_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+def _warn_vol10_failures(out: dict):
+    """VOL10 缺失（多为上游限流 / 熔断）时提示，避免量比整列静默变空"""
+    bad = sum(1 for v in out.values() if v != v)
+    if bad:
+        print(f"[WARN] VOL10 缺失 {bad}/{len(out)} 只（限流状态: {rate_limit.stats()}）", flush=True)
 
-    print(f"获取时间：{fetch_time}")
-    print("股票名称\t价格\t盘中量比")
+# ========= 腾讯分时（成交量分布） =========
+MINUTE_BASES = ["http://web.ifzq.gtimg.cn/appstock/app/day/query",
+                "https://web.ifzq.gtimg.cn/appstock/app/day/query"]
 
-    if not CODES:
-        return
+def fetch_minutes_tencent(code_raw: str) -> dict:
+    """近5个交易日分时 -> {天数: 累计量(手)数组}"""
+    from intraday_profile import parse_minute_json
+    symbol = to_tencent_symbol(code_raw)
+    last_err = None
+    sess = make_session()
+    for base in rate_limit.order_bases(MINUTE_BASES):
+        try:
+            j = sess.get(base, params={"code": symbol}, timeout=REQ_TIMEOUT).json()
+            return parse_minute_json(j, symbol)
+        except Exception as e:
+            last_err = e
+            continue
+    raise last_err if last_err else RuntimeError(f"minute failed: {code_raw}")
 
-    # 1) 新浪：名称、现价、当日量(手)
-    sina_map = fetch_price_and_vol_hand_by_sina(CODES)
+_MINUTE_STORE = None
 
-    # 2) 腾讯：VOL10(手) 口径与“稳定版”一致（到“昨日”为止）
-    vol10_map = build_vol10_map_tencent_concurrent(CODES, use_qfq=USE_QFQ, base_day=BASE_DAY_FOR_VOL10)
+def get_minute_store():
+    global _MINUTE_STORE
+    from intraday_profile import MinuteStore
+    if _MINUTE_STORE is None:
+        _MINUTE_STORE = MinuteStore(KLINE_CACHE_DIR, fetch_minutes_tencent, to_tencent_symbol)
+    return _MINUTE_STORE
 
-    # 3) 盘中进度
-    ft = trading_progress_now()
-    ft_eff = max(FT_MIN_CLAMP, ft) if 0.0 < ft < 1.0 else ft  # 盘中用夹值；盘前0/盘后1不动
+def build_profile_map_concurrent(codes: list) -> dict:
+    """
+    并发取各股分时成交分布，返回 {c6: 分布数组 或 None}；失败/天数不足为 None（回退线性 ft）
+    """
+    out = {}
+    if not codes or not USE_INTRADAY_PROFILE:
+        return out
+    store = get_minute_store()
 
-    # 4) 输出
-    for code in CODES:
+    def worker(code):
+        try:
+            return norm6(code), store.get_profile(code)
+        except Exception as e:
+            if PRINT_DEBUG:
+                print(f"[DBG-profile-err] {code}: {e}", flush=True)
+            return norm6(code), None
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as ex:
+        for c6, prof in ex.map(worker, codes):
+            out[c6] = prof
+    return out
+
+def profile_fracs(profile_map: dict, now: datetime=None) -> dict:
+    """当前时刻各股的应有累计量占比 {c6: frac}（仅有分布的股票）"""
+    from intraday_profile import fraction_at
+    from trade_calendar import TOTAL_MINUTES, get_calendar
+    m = get_calendar().progress(now or now_cn()) * TOTAL_MINUTES
+    return {c6: fraction_at(p, m) for c6, p in profile_map.items() if p is not None}
+
+# ========= 主流程 =========
+def build_rows(codes: list, sina_map: dict, vol10_map: dict, ft: float, ft_eff: float, fracs: dict=None) -> list:
+    """
+    返回 [(c6, 名称, 价格, 盘中量比), ...]，顺序与 codes 一致
+    fracs：{c6: 分时分布给出的应有占比}，有则替代 ft_eff
+    """
+    rows = []
+    for code in codes:
         c6 = norm6(code)
         row = sina_map.get(c6, {})
         name = row.get("name") or code
         price = row.get("price") or ""
         vol_hand = row.get("vol_hand", None)
         vol10 = vol10_map.get(c6, float("nan"))
+        f = (fracs or {}).get(c6, ft_eff)
 
         lb = ""
         if vol_hand is not None and isinstance(vol_hand, (int, float)) and vol_hand == vol_hand \
-           and isinstance(vol10, (int, float)) and vol10 == vol10 and vol10 > 0 and ft_eff > 0:
-            lb_val = vol_hand / (vol10 * ft_eff)
+           and isinstance(vol10, (int, float)) and vol10 == vol10 and vol10 > 0 and f > 0:
+            lb_val = vol_hand / (vol10 * f)
             # 容错：极端值截断到 4 位小数
             if math.isfinite(lb_val) and lb_val >= 0:
                 lb = f"{lb_val:.3f}"
         if PRINT_DEBUG:
-            bad = (vol_hand is None, not (isinstance(vol10, (int,float)) and vol10==vol10 and vol10>0), ft_eff<=0)
-            print(f"[DBG] {name}: ft={ft:.3f} eff={ft_eff:.3f} vol_hand={vol_hand} vol10={vol10} bad={bad}", flush=True)
+            bad = (vol_hand is None, not (isinstance(vol10, (int,float)) and vol10==vol10 and vol10>0), f<=0)
+            print(f"[DBG] {name}: ft={ft:.3f} eff={ft_eff:.3f} frac={f:.3f} vol_hand={vol_hand} vol10={vol10} bad={bad}", flush=True)
+
+        rows.append((c6, name, price, lb))
+    return rows
 
+def progress_eff():
+    ft = trading_progress_now()
+    ft_eff = max(FT_MIN_CLAMP, ft) if 0.0 < ft < 1.0 else ft  # 盘中用夹值；盘前0/盘后1不动
+    return ft, ft_eff
+
+def ratio_array(codes: list, volume, vol10_map: dict, ft_eff: float, fracs: dict=None):
+    """与 codes 同序的盘中量比数组（口径同 build_rows）"""
+    import numpy as np
+    c6 = [norm6(c) for c in codes]
+    vol10 = np.array([vol10_map.get(c, np.nan) for c in c6], dtype=np.float64)
+    f = np.array([(fracs or {}).get(c, ft_eff) for c in c6], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lb = volume / (vol10 * f)
+    return np.where((vol10 > 0) & (f > 0) & np.isfinite(lb) & (lb >= 0), lb, np.nan)
+
+def run_watch(interval: float=WATCH_INTERVAL, sink_spec: str=WATCH_SINK):
+    """
+    常驻轮询：VOL10 每天只算一次；新浪会话常驻复用；只输出越过增量阈值的行
+    """
+    import quote_delta as D
+    import quote_parser as Q
+    sess = make_session()
+    sink = D.make_sink(sink_spec)
+    tracker = D.DeltaTracker(len(CODES), DELTA_PRICE_PCT, DELTA_VOL_HAND, DELTA_RATIO)
+    vol10_map, profile_map, vol10_day, names = {}, {}, None, None
+    try:
+        while True:
+            t0 = _time.monotonic()
+            now = now_cn()
+            day = now.strftime("%Y-%m-%d")
+            if day != vol10_day:
+                vol10_map = build_vol10_map_tencent_concurrent(CODES, use_qfq=USE_QFQ, base_day=BASE_DAY_FOR_VOL10)
+                profile_map = build_profile_map_concurrent(CODES)
+                vol10_day = day
+                tracker.reset()  # 换日后全量输出一次
+
+            try:
+                snap = fetch_snapshot_sina(CODES, sess=sess)
+            except Exception as e:
+                print(f"[WARN] 新浪行情拉取失败: {e}", flush=True)
+                snap = None
+
+            if snap is not None:
+                if names is None:
+                    names = [n or c for n, c in zip(Q.decode_names(snap["name"]), CODES)]
+                _, ft_eff = progress_eff()
+                lb = ratio_array(CODES, snap["volume"], vol10_map, ft_eff, profile_fracs(profile_map, now))
+                delta = tracker.update(snap["price"], snap["volume"], lb, now.timestamp())
+                sink.write(D.records(now.strftime("%H:%M:%S"), [norm6(c) for c in CODES], names,
+                                     snap["price"], snap["chg_pct"], lb, delta))
+
+            _time.sleep(max(0.0, interval - (_time.monotonic() - t0)))
+    finally:
+        sink.close()
+
+def parse_args():
+    p = argparse.ArgumentParser(description="实时价格 + 盘中量比")
+    p.add_argument("--watch", action="store_true", help="常驻轮询模式，只输出越过增量阈值的行")
+    p.add_argument("--interval", type=float, default=WATCH_INTERVAL, help=f"轮询间隔秒数（默认：{WATCH_INTERVAL}）")
+    p.add_argument("--sink", default=WATCH_SINK, help=f"常驻模式输出：stdout / file:路径 / udp:主机:端口（默认：{WATCH_SINK}）")
+    return p.parse_args()
+
+def main():
+    args = parse_args()
+    if args.watch:
+        if not CODES:
+            return
+        try:
+            run_watch(args.interval, args.sink)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    fetch_time = now_cn().strftime("%Y-%m-%d %H:%M:%S")
+
+    print(f"获取时间：{fetch_time}")
+    print("股票名称\t价格\t盘中量比")
+
+    if not CODES:
+        return
+
+    # 1) 新浪：名称、现价、当日量(手)
+    sina_map = fetch_price_and_vol_hand_by_sina(CODES)
+
+    # 2) 腾讯：VOL10(手) 口径与“稳定版”一致（到“昨日”为止）
+    vol10_map = build_vol10_map_tencent_concurrent(CODES, use_qfq=USE_QFQ, base_day=BASE_DAY_FOR_VOL10)
+
+    # 3) 盘中进度（线性 ft；有分时分布的股票按分布折算）
+    ft, ft_eff = progress_eff()
+    fracs = profile_fracs(build_profile_map_concurrent(CODES))
+
+    # 4) 输出
+    for _, name, price, lb in build_rows(CODES, sina_map, vol10_map, ft, ft_eff, fracs):
         print(f"{name}\t{price}\t{lb}")
 
+    if PRINT_DEBUG:
+        import http_pool
+        st = http_pool.pool_stats()
+        print(f"[DBG-pool] 新建连接={st['new']} 请求={st['requests']} 复用={st['reused']}", flush=True)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+进程级共享 HTTP 连接池（requests + urllib3）
+- 按配置（连接池大小 / 重试 / 退避 / 方法 / 请求头 / 代理）各建一个 Session（线程安全懒创建），
+  配置相同的调用方共用同一个 Session 与 keep-alive 连接；配置不同的各自生效，不再被先建的覆盖
+- 每个主机的连接池大小 = 并发数，新浪 / qt.gtimg / fqkline 共用
+- pool_stats()：各主机新建连接数与复用次数（汇总所有 Session）
+- USE_RATE_LIMIT：挂 rate_limit 的自适应令牌桶 / 并发上限 / 熔断（按主机，跨 Session 共享）
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_HOSTS = 10          # 缓存的主机连接池个数
+USE_RATE_LIMIT = True    # 经 rate_limit 自适应限流与熔断
+
+_LOCK = threading.Lock()
+_SESSIONS = {}           # 配置键 -> Session
+
+def _config_key(pool_size, retry_total, backoff_factor, allowed_methods, headers, trust_env, proxies) -> tuple:
+    return (int(pool_size), int(retry_total), float(backoff_factor), tuple(sorted(allowed_methods)),
+            tuple(sorted((headers or {}).items())), bool(trust_env), tuple(sorted((proxies or {}).items())))
+
+def get_session(pool_size: int = 12, retry_total: int = 2, backoff_factor: float = 0.4,
+                allowed_methods=("GET",), headers: dict = None,
+                trust_env: bool = False, proxies: dict = None) -> requests.Session:
+    """
+    返回该配置在进程内共享的 Session（同配置的调用方共用连接池）
+    """
+    key = _config_key(pool_size, retry_total, backoff_factor, allowed_methods, headers, trust_env, proxies)
+    s = _SESSIONS.get(key)
+    if s is not None:
+        return s
+    with _LOCK:
+        s = _SESSIONS.get(key)
+        if s is not None:
+            return s
+        s = requests.Session()
+        retry_cls, adapter_cls = Retry, HTTPAdapter
+        if USE_RATE_LIMIT:
+            import rate_limit
+            retry_cls, adapter_cls = rate_limit.ObservedRetry, rate_limit.GuardedAdapter
+        retry = retry_cls(
+            total=retry_total, connect=retry_total, read=retry_total,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(allowed_methods),
+            raise_on_status=False,
+        )
+        adapter = adapter_cls(pool_connections=POOL_HOSTS, pool_maxsize=pool_size, max_retries=retry)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        s.headers.update({"User-Agent": "Mozilla/5.0", "Accept": "*/*"})
+        if headers:
+            s.headers.update(headers)
+        s.trust_env = trust_env
+        if proxies:
+            s.proxies.update(proxies)
+        _SESSIONS[key] = s
+        return s
+
+def pool_stats() -> dict:
+    """
+    返回 {"new": 新建连接数, "requests": 请求数, "reused": 复用次数, "hosts": {host: {...}}}
+    （所有 Session 汇总，以当前仍缓存的主机池为准）
+    """
+    out = {"new": 0, "requests": 0, "reused": 0, "hosts": {}}
+    seen = set()
+    for adapter in (a for s in list(_SESSIONS.values()) for a in s.adapters.values()):
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            new, reqs = pool.num_connections, pool.num_requests
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            h = out["hosts"].setdefault(host, {"new": 0, "requests": 0, "reused": 0})
+            h["new"] += new
+            h["requests"] += reqs
+            h["reused"] = max(0, h["requests"] - h["new"])
+            out["new"] += new
+            out["requests"] += reqs
+    out["reused"] = max(0, out["requests"] - out["new"])
+    return out
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+增量指标状态（逐根推入，O(1) 更新）
+- MA5/10/20/60、VOL10：定长窗口 + 滑动和（窗口满一圈时按窗口重新求和，抑制浮点漂移）
+- ATR：'sma' = SMA(TR,n)；'wilder' = TR 的 EWM(alpha=1/n, adjust=False)，与 atr_series 口径一致
+- 前高：最近 lookback 根最高价；MA20_1：上一根的 MA20
+- 状态可序列化为 JSON，跨次运行只推入新增K线；除权导致历史变化时整段重建
+"""
+import json
+import math
+import os
+from collections import deque
+from pathlib import Path
+
+MA_WINDOWS = (5, 10, 20, 60)
+VOL_WINDOW = 10
+NAN = float("nan")
+
+class RollingSum:
+    __slots__ = ("n", "buf", "total", "pushes")
+
+    def __init__(self, n: int, values=(), total: float = 0.0, pushes: int = 0):
+        self.n = n
+        self.buf = deque(values, maxlen=n)
+        self.total = total
+        self.pushes = pushes
+
+    def push(self, x: float):
+        if len(self.buf) == self.n:
+            self.total -= self.buf[0]
+        self.buf.append(x)
+        self.total += x
+        self.pushes += 1
+        if self.pushes % self.n == 0:
+            self.total = math.fsum(self.buf)
+
+    def mean(self) -> float:
+        return self.total / self.n if len(self.buf) == self.n else NAN
+
+    def to_dict(self) -> dict:
+        return {"n": self.n, "buf": list(self.buf), "total": self.total, "pushes": self.pushes}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RollingSum":
+        return cls(d["n"], d["buf"], d["total"], d["pushes"])
+
+class IndicatorState:
+    __slots__ = ("atr_n", "atr_method", "lookback", "ma", "vol", "tr", "ema", "count",
+                 "prev_close", "prev_ma20", "ma20", "highs", "last_day", "last_close", "last_vol")
+
+    def __init__(self, atr_n: int = 10, atr_method: str = "sma", lookback: int = 20):
+        self.atr_n = atr_n
+        self.atr_method = atr_method
+        self.lookback = lookback
+        self.ma = {w: RollingSum(w) for w in MA_WINDOWS}
+        self.vol = RollingSum(VOL_WINDOW)
+        self.tr = RollingSum(atr_n)
+        self.ema = NAN
+        self.count = 0
+        self.prev_close = NAN
+        self.prev_ma20 = NAN
+        self.ma20 = NAN
+        self.highs = deque(maxlen=lookback)
+        self.last_day = None
+        self.last_close = NAN
+        self.last_vol = NAN
+
+    def push(self, day: int, high: float, low: float, close: float, volume: float):
+        """推入一根日K（day 为距1970-01-01天数）"""
+        pc = self.prev_close
+        tr = high - low if math.isnan(pc) else max(abs(high - low), abs(high - pc), abs(low - pc))
+        self.tr.push(tr)
+        alpha = 1.0 / self.atr_n
+        self.ema = tr if self.count == 0 else (1 - alpha) * self.ema + alpha * tr
+        self.count += 1
+
+        for w in MA_WINDOWS:
+            self.ma[w].push(close)
+        self.vol.push(volume)
+        self.highs.append(high)
+
+        self.prev_ma20 = self.ma20
+        self.ma20 = self.ma[20].mean()
+        self.prev_close = close
+        self.last_day = int(day)
+        self.last_close = close
+        self.last_vol = volume
+
+    def atr(self) -> float:
+        if self.count < self.atr_n:
+            return NAN
+        return self.ema if self.atr_method == "wilder" else self.tr.mean()
+
+    def metrics(self) -> dict:
+        """当前（最后一根）口径下的指标值，单位与原始K线一致"""
+        return {
+            "ma5": self.ma[5].mean(), "ma10": self.ma[10].mean(),
+            "ma20": self.ma20, "ma60": self.ma[60].mean(), "ma20_prev": self.prev_ma20,
+            "p_res": max(self.highs) if self.highs else NAN,
+            "close": self.last_close, "atr": self.atr(),
+            "vol10": self.vol.mean(), "vol": self.last_vol,
+        }
+
+    def copy(self) -> "IndicatorState":
+        return IndicatorState.from_dict(self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "atr_n": self.atr_n, "atr_method": self.atr_method, "lookback": self.lookback,
+            "ma": {str(w): r.to_dict() for w, r in self.ma.items()},
+            "vol": self.vol.to_dict(), "tr": self.tr.to_dict(),
+            "ema": self.ema, "count": self.count, "prev_close": self.prev_close,
+            "prev_ma20": self.prev_ma20, "ma20": self.ma20, "highs": list(self.highs),
+            "last_day": self.last_day, "last_close": self.last_close, "last_vol": self.last_vol,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "IndicatorState":
+        st = cls(d["atr_n"], d["atr_method"], d["lookback"])
+        st.ma = {int(w): RollingSum.from_dict(r) for w, r in d["ma"].items()}
+        st.vol = RollingSum.from_dict(d["vol"])
+        st.tr = RollingSum.from_dict(d["tr"])
+        st.ema, st.count = d["ema"], d["count"]
+        st.prev_close, st.prev_ma20, st.ma20 = d["prev_close"], d["prev_ma20"], d["ma20"]
+        st.highs = deque(d["highs"], maxlen=st.lookback)
+        st.last_day, st.last_close, st.last_vol = d["last_day"], d["last_close"], d["last_vol"]
+        return st
+
+def advance(state, cols: dict, upto: int, atr_n: int = 10, atr_method: str = "sma", lookback: int = 20):
+    """
+    把 cols（kline_store 列字典）中 state.last_day 之后、索引 upto（含）之前的K线推入 state
+    state 为空、参数不一致、或 last_day 那根收盘价对不上（除权后前复权变化）时从头重建
+    """
+    dates, close = cols["date"], cols["close"]
+    start = 0
+    if state is not None and (state.atr_n, state.atr_method, state.lookback) == (atr_n, atr_method, lookback) \
+            and state.last_day is not None:
+        i = _index_of(dates, state.last_day)
+        if i is not None and i <= upto and close[i] == state.last_close:
+            start = i + 1
+        else:
+            state = None
+    else:
+        state = None
+    if state is None:
+        state = IndicatorState(atr_n, atr_method, lookback)
+        start = 0
+    high, low, vol = cols["high"], cols["low"], cols["volume"]
+    for i in range(start, upto + 1):
+        state.push(int(dates[i]), float(high[i]), float(low[i]), float(close[i]), float(vol[i]))
+    return state
+
+def _index_of(dates, day: int):
+    lo, hi = 0, len(dates)
+    while lo < hi:  # 二分查找（dates 升序）
+        mid = (lo + hi) // 2
+        if dates[mid] < day:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo if lo < len(dates) and dates[lo] == day else None
+
+class StateStore:
+    """{symbol: IndicatorState} 的 JSON 持久化"""
+    def __init__(self, path):
+        self.path = Path(os.path.expandvars(str(path))).expanduser()
+        self.states = {}
+        if self.path.exists():
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8"))
+                self.states = {k: IndicatorState.from_dict(v) for k, v in raw.items()}
+            except Exception:
+                self.states = {}
+
+    def get(self, symbol: str):
+        return self.states.get(symbol)
+
+    def put(self, symbol: str, state: IndicatorState):
+        self.states[symbol] = state
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({k: v.to_dict() for k, v in self.states.items()}), encoding="utf-8")
+        os.replace(tmp, self.path)
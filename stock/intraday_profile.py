@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+分时成交量分布（盘中量比的“应有量”）
+- 分时数据：腾讯分时（近5个交易日），每分钟一行 “HHMM 价格 累计量(手) 累计额”
+- 一天按交易分钟归一为 241 个槽位：0 = 9:30（含集合竞价量），120 = 11:30/13:00，240 = 15:00
+- 每只股票本地存最近 PROFILE_DAYS 个已收盘交易日的累计量（.npz），每次只并入新出现的交易日
+- 分布 = 各日 累计量/全天量 的均值（单调、终点为 1）；随存储一起落盘，盘中查表 O(1)
+- 量比（盘中）= 当日量 / (VOL10 × 分布[已过分钟])，替代按 240 分钟线性折算的 f_t
+"""
+import os
+import time as _time
+from pathlib import Path
+import numpy as np
+
+from kline_store import dates_to_days, last_session_close, now_cn
+
+SLOTS = 241              # 0..240 交易分钟
+PROFILE_DAYS = 20        # 本地保留 / 参与平均的交易日数
+MIN_DAYS = 3             # 不足这么多天不给分布（调用方回退线性 f_t）
+
+# ------------------ 分钟 <-> 槽位 ------------------
+def elapsed_minutes(hour: int, minute: int, second: float = 0.0) -> float:
+    """时刻 -> 已过交易分钟（盘前 0，午休 120，盘后 240；查 trade_calendar 分钟表）"""
+    from trade_calendar import session_minute
+    return session_minute(hour, minute, second)
+
+def parse_minute_lines(lines: list) -> np.ndarray:
+    """
+    ["0930 10.50 1234 1296000.00", ...] -> 长度 SLOTS 的累计量（手）
+    缺失的分钟沿用上一分钟的累计量（停牌/无成交）
+    """
+    cum = np.full(SLOTS, np.nan)
+    for s in lines:
+        parts = str(s).split()
+        if len(parts) < 3 or len(parts[0]) != 4:
+            continue
+        slot = int(round(elapsed_minutes(int(parts[0][:2]), int(parts[0][2:]))))
+        cum[slot] = float(parts[2])
+    cum = np.where(np.isnan(cum), -np.inf, cum)
+    cum = np.maximum.accumulate(cum)
+    cum[np.isinf(cum)] = 0.0
+    return cum
+
+def parse_minute_json(j: dict, symbol: str) -> dict:
+    """
+    腾讯分时 JSON -> {天数(int): 累计量数组}
+    兼容 day/query（近5日，data 为列表）与 minute/query（当日，data 为字典）
+    """
+    node = ((j.get("data") or {}).get(symbol) or {}).get("data")
+    days = node if isinstance(node, list) else [node] if isinstance(node, dict) else []
+    out = {}
+    for d in days:
+        date, lines = str(d.get("date", "")), d.get("data") or []
+        if len(date) != 8 or not lines:
+            continue
+        out[int(dates_to_days([f"{date[:4]}-{date[4:6]}-{date[6:]}"])[0])] = parse_minute_lines(lines)
+    return out
+
+# ------------------ 分布 ------------------
+def build_profile(cum: np.ndarray, min_days: int = MIN_DAYS):
+    """(天数 × SLOTS) 累计量 -> 长度 SLOTS 的累计占比分布；有效天数不足时返回 None"""
+    cum = np.asarray(cum, dtype=np.float64).reshape(-1, SLOTS)
+    total = cum[:, -1]
+    cum = cum[total > 0]
+    if len(cum) < min_days:
+        return None
+    prof = np.maximum.accumulate((cum / cum[:, -1:]).mean(axis=0))
+    prof[-1] = 1.0
+    return prof
+
+def fraction_at(profile, minutes: float) -> float:
+    """已过 minutes 分钟时的应有累计占比（相邻槽位线性插值）；无分布时按线性 minutes/240"""
+    m = min(240.0, max(0.0, float(minutes)))
+    if profile is None:
+        return m / 240.0
+    i = int(m)
+    if i >= SLOTS - 1:
+        return float(profile[-1])
+    return float(profile[i] + (profile[i + 1] - profile[i]) * (m - i))
+
+# ------------------ 本地存储 ------------------
+class MinuteStore:
+    """
+    fetcher(code_raw) -> {天数: 累计量数组}（如 parse_minute_json 的结果）
+    symbol_fn(code_raw) -> 'sh600000'（用作文件名）
+    """
+    def __init__(self, root, fetcher, symbol_fn, keep_days: int = PROFILE_DAYS):
+        self.root = Path(os.path.expandvars(str(root))).expanduser()
+        self.fetcher = fetcher
+        self.symbol_fn = symbol_fn
+        self.keep_days = keep_days
+
+    def path(self, symbol: str) -> Path:
+        return self.root / "minute" / f"{symbol}.npz"
+
+    def load(self, symbol: str):
+        """返回 {"date", "cum", "profile", "fetched_at"} 或 None"""
+        p = self.path(symbol)
+        if not p.exists():
+            return None
+        try:
+            with np.load(p) as z:
+                prof = z["profile"]
+                return {"date": z["date"], "cum": z["cum"], "fetched_at": float(z["fetched_at"]),
+                        "profile": prof if len(prof) == SLOTS else None}
+        except Exception:
+            return None
+
+    def save(self, symbol: str, days: np.ndarray, cum: np.ndarray, profile):
+        p = self.path(symbol)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.name + f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, fetched_at=np.float64(_time.time()), date=days.astype(np.int32), cum=cum,
+                     profile=np.empty(0) if profile is None else profile)
+        os.replace(tmp, p)
+
+    def get_profile(self, code_raw: str):
+        """
+        返回分布数组或 None；本地已含最近一个已收盘交易日时不发请求，否则拉分时并入
+        只并入已收盘的交易日（盘中当日的分时不完整）
+        """
+        symbol = self.symbol_fn(code_raw)
+        st = self.load(symbol)
+        settled = last_session_close(now_cn())
+        if st is not None and st["fetched_at"] >= settled.timestamp():
+            return st["profile"]
+
+        settled_day = int(dates_to_days([settled.strftime("%Y-%m-%d")])[0])
+        merged = {} if st is None else dict(zip(st["date"].tolist(), st["cum"]))
+        merged.update({d: c for d, c in self.fetcher(code_raw).items() if d <= settled_day})
+        days = np.array(sorted(merged)[-self.keep_days:], dtype=np.int32)
+        cum = np.array([merged[d] for d in days.tolist()], dtype=np.float64).reshape(-1, SLOTS)
+        profile = build_profile(cum)
+        self.save(symbol, days, cum, profile)
+        return profile
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+本地日K存储（腾讯 fqkline 的本地缓存）
+- 按股票分文件，列式 .npz：date(int32, 距1970-01-01天数) / open / close / high / low / volume(手)
+- 前复权(qfq) 与 不复权(raw) 分目录保存，互不覆盖
+- 读取时只补“缺失的尾部”：按距上次最后一根的自然日数估算小 limit 拉取，与本地按日期拼接
+- 重叠区间收盘价对不上（除权后前复权整体平移）或缺口超出尾部时，整段重拉
+- 传入 factors（adjust.FactorStore）时前复权在本地生成：只存不复权K线，除权只刷新因子表
+"""
+import os
+import time as _time
+from datetime import datetime, timedelta
+from pathlib import Path
+import numpy as np
+
+try:
+    from zoneinfo import ZoneInfo  # py>=3.9
+except Exception:
+    ZoneInfo = None
+
+COLS = ("open", "close", "high", "low", "volume")
+TOPUP_MIN = 5            # 补尾最少拉取根数（覆盖盘中未定型的最后一根）
+CLOSE_READY = (15, 5)    # 收盘后多久视为当日K线已定型（时, 分）
+OVERLAP_RTOL = 1e-6      # 重叠区间收盘价相对误差容忍度
+
+def now_cn() -> datetime:
+    try:
+        return datetime.now(ZoneInfo("Asia/Shanghai")) if ZoneInfo else datetime.utcnow() + timedelta(hours=8)
+    except Exception:
+        return datetime.utcnow() + timedelta(hours=8)
+
+def dates_to_days(dates) -> np.ndarray:
+    """'YYYY-MM-DD' 序列 -> int32 天数"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int32)
+
+def days_to_dates(days) -> np.ndarray:
+    """int32 天数 -> 'YYYY-MM-DD' 字符串数组"""
+    return np.datetime_as_string(np.asarray(days, dtype=np.int32).astype("datetime64[D]"), unit="D")
+
+def rows_to_cols(rows) -> dict:
+    """[[date, open, close, high, low, volume], ...] 或 bars.Bars -> 列字典"""
+    if hasattr(rows, "cols"):
+        return rows.cols()
+    cols = {"date": dates_to_days([r[0] for r in rows])}
+    for j, c in enumerate(COLS, start=1):
+        cols[c] = np.array([r[j] for r in rows], dtype=np.float64)
+    return cols
+
+def cols_to_rows(cols: dict) -> list:
+    """列字典 -> [[date, open, close, high, low, volume], ...]（与 fetch_hist_tencent 返回格式一致）"""
+    dates = days_to_dates(cols["date"]).tolist()
+    return [list(r) for r in zip(dates, *(cols[c].tolist() for c in COLS))]
+
+def _slice(cols: dict, sl) -> dict:
+    return {k: v[sl] for k, v in cols.items()}
+
+def _concat(a: dict, b: dict) -> dict:
+    return {k: np.concatenate([a[k], b[k]]) for k in a}
+
+def last_session_close(now: datetime) -> datetime:
+    """最近一个已收盘交易日的定型时刻（按交易日历，识别节假日）"""
+    from trade_calendar import last_session_close as _close
+    return _close(now)
+
+class KlineStore:
+    """
+    fetcher(code_raw, use_qfq, limit) -> bars.Bars 或 [[date, open, close, high, low, volume], ...]
+    symbol_fn(code_raw) -> 'sh600000'（用作文件名）
+    factors：adjust.FactorStore；给定时 use_qfq=True 由不复权K线 × 因子表得到
+    """
+    def __init__(self, root, fetcher, symbol_fn, topup_min: int = TOPUP_MIN, factors=None):
+        self.root = Path(os.path.expandvars(str(root))).expanduser()
+        self.fetcher = fetcher
+        self.symbol_fn = symbol_fn
+        self.topup_min = topup_min
+        self.factors = factors
+
+    def path(self, symbol: str, use_qfq: bool) -> Path:
+        return self.root / ("qfq" if use_qfq else "raw") / f"{symbol}.npz"
+
+    def load(self, symbol: str, use_qfq: bool):
+        """返回 (cols, meta) 或 (None, None)"""
+        p = self.path(symbol, use_qfq)
+        if not p.exists():
+            return None, None
+        try:
+            with np.load(p) as z:
+                cols = {k: z[k] for k in ("date",) + COLS}
+                meta = {"fetched_at": float(z["fetched_at"]), "complete": bool(z["complete"])}
+            return cols, meta
+        except Exception:
+            return None, None
+
+    def save(self, symbol: str, use_qfq: bool, cols: dict, complete: bool):
+        p = self.path(symbol, use_qfq)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.name + f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, fetched_at=np.float64(_time.time()), complete=np.bool_(complete), **cols)
+        os.replace(tmp, p)
+
+    def _plan(self, symbol: str, use_qfq: bool, limit: int) -> dict:
+        """
+        判断本地数据需要拉多少根：n=0 本地已最新；full=True 整段拉取；否则只补尾部
+        """
+        cols, meta = self.load(symbol, use_qfq)
+        if cols is None or len(cols["date"]) == 0 or (len(cols["date"]) < limit and not meta["complete"]):
+            return {"cols": None, "meta": None, "n": limit, "full": True, "n_full": limit}
+
+        now = now_cn()
+        close = last_session_close(now)
+        # 最后一根晚于已定型交易日 = 盘中存下的未定型K线，即使本场收盘后抓过也要补尾覆盖
+        settled_day = int(dates_to_days([close.strftime("%Y-%m-%d")])[0])
+        if meta["fetched_at"] >= close.timestamp() and int(cols["date"][-1]) <= settled_day:
+            return {"cols": cols, "meta": meta, "n": 0, "full": False, "n_full": limit}
+
+        last_day = int(cols["date"][-1])
+        today = int(dates_to_days([now.strftime("%Y-%m-%d")])[0])
+        n_tail = max(self.topup_min, today - last_day + 2)
+        # 整段重拉时不少于本地已有根数，避免把长历史截短
+        n_full = max(limit, len(cols["date"]) + n_tail)
+        if n_tail >= limit:
+            return {"cols": cols, "meta": meta, "n": n_full, "full": True, "n_full": n_full}
+        return {"cols": cols, "meta": meta, "n": n_tail, "full": False, "n_full": n_full}
+
+    def _apply(self, symbol: str, use_qfq: bool, plan: dict, rows: list):
+        """
+        把拉到的 rows 合并进本地并落盘；返回合并后的列字典，需整段重拉时返回 None
+        """
+        if plan["full"]:
+            cols = rows_to_cols(rows)
+            # 返回根数不足请求根数说明已拿到上市以来全部历史
+            self.save(symbol, use_qfq, cols, complete=len(rows) < plan["n"])
+            return cols
+
+        cols, meta = plan["cols"], plan["meta"]
+        tail = rows_to_cols(rows)
+        if len(tail["date"]) == 0:
+            return cols
+
+        t0 = int(tail["date"][0])
+        if t0 > int(cols["date"][-1]):
+            # 尾部与本地不衔接（停牌/长假超出估算），整段重拉
+            return None
+
+        # 重叠校验：本地已定型的K线（不含最后一根）收盘价须与新数据一致
+        stored_idx = np.searchsorted(cols["date"], tail["date"])
+        in_range = stored_idx < len(cols["date"]) - 1
+        hit = in_range & (cols["date"][np.minimum(stored_idx, len(cols["date"]) - 1)] == tail["date"])
+        if hit.any() and not np.allclose(cols["close"][stored_idx[hit]], tail["close"][hit], rtol=OVERLAP_RTOL, atol=0.0):
+            return None
+
+        merged = _concat(_slice(cols, cols["date"] < t0), tail)
+        self.save(symbol, use_qfq, merged, complete=meta["complete"])
+        return merged
+
+    @staticmethod
+    def _full_plan(plan: dict) -> dict:
+        return {"cols": None, "meta": None, "n": plan["n_full"], "full": True, "n_full": plan["n_full"]}
+
+    def get(self, code_raw: str, use_qfq: bool = True, limit: int = 1200) -> dict:
+        """
+        返回最近 limit 根日K的列字典；本地缺失/不足时整段拉取，否则只补尾部
+        """
+        if use_qfq and self.factors is not None:
+            from adjust import forward
+            raw = self.get(code_raw, use_qfq=False, limit=limit)
+            return forward(raw, self.factors.get(code_raw, raw))
+        symbol = self.symbol_fn(code_raw)
+        plan = self._plan(symbol, use_qfq, limit)
+        if plan["n"] == 0:
+            return _slice(plan["cols"], slice(-limit, None))
+        cols = self._apply(symbol, use_qfq, plan, self.fetcher(code_raw, use_qfq, plan["n"]))
+        if cols is None:
+            plan = self._full_plan(plan)
+            cols = self._apply(symbol, use_qfq, plan, self.fetcher(code_raw, use_qfq, plan["n"]))
+        return _slice(cols, slice(-limit, None))
+
+    def get_many(self, codes: list, use_qfq: bool = True, limit: int = 1200, fetch_many=None) -> dict:
+        """
+        批量版 get：先在本地算出每只需要拉的根数，再一次性交给 fetch_many 并发拉取
+        fetch_many([(code_raw, n), ...], use_qfq) -> [rows 或 Exception, ...]（与输入等长同序）
+        返回 {code_raw: 列字典 或 Exception}
+        """
+        if use_qfq and self.factors is not None:
+            from adjust import forward
+            out = self.get_many(codes, use_qfq=False, limit=limit, fetch_many=fetch_many)
+            raw_map = {c: v for c, v in out.items() if not isinstance(v, Exception)}
+            qfq_many = (lambda items: fetch_many(items, True)) if fetch_many else None
+            for code, table in self.factors.get_many(raw_map, qfq_many).items():
+                out[code] = table if isinstance(table, Exception) else forward(raw_map[code], table)
+            return out
+        out, plans = {}, {}
+        for code in codes:
+            try:
+                symbol = self.symbol_fn(code)
+                plan = self._plan(symbol, use_qfq, limit)
+            except Exception as e:
+                out[code] = e
+                continue
+            if plan["n"] == 0:
+                out[code] = _slice(plan["cols"], slice(-limit, None))
+            else:
+                plans[code] = (symbol, plan)
+
+        for _ in range(2):  # 第二轮只处理需要整段重拉的
+            if not plans:
+                break
+            todo = list(plans.items())
+            if fetch_many is None:
+                results = []
+                for code, (_, plan) in todo:
+                    try:
+                        results.append(self.fetcher(code, use_qfq, plan["n"]))
+                    except Exception as e:
+                        results.append(e)
+            else:
+                results = fetch_many([(code, plan["n"]) for code, (_, plan) in todo], use_qfq)
+            plans = {}
+            for (code, (symbol, plan)), rows in zip(todo, results):
+                if isinstance(rows, Exception):
+                    out[code] = rows
+                    continue
+                cols = self._apply(symbol, use_qfq, plan, rows)
+                if cols is None:
+                    plans[code] = (symbol, self._full_plan(plan))
+                else:
+                    out[code] = _slice(cols, slice(-limit, None))
+        return out
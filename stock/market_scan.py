@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+全市场实时扫描（沪深A股约5000只）：按盘中量比排序，发现 CODES 之外的候选
+- 股票池：按代码段（沪 600/601/603/605/688，深 000~003/300/301）向新浪试探一遍，
+  有行情的代码落盘缓存（UNIVERSE_TTL_DAYS 天内复用）
+- 行情：新浪 60 只一批，线程池并发 + 共享 keep-alive 连接池；各批原始字节拼成一段，
+  quote_parser.parse_sina 在字节上批量解析成类型化列，按代码键一次散射进预分配的列数组
+- VOL10：腾讯日K（kline_store 本地缓存）算到昨日，每天一份落盘缓存（缺失值不落盘，下次补算），盘中只查表
+- 量比 = 当日量 / (VOL10 × ft)，ft 为线性盘中进度（夹值同 getStockListPrices）
+
+用法：python market_scan.py [--top 50] [--watch] [--refresh-universe]
+"""
+import argparse
+import json
+import os
+import time as _time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+import getStockListPrices as L
+import quote_parser as Q
+import rate_limit
+import stock_core
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+CODE_RANGES = [                      # (起, 止, 交易所)，止不含
+    (600000, 602000, "SH"), (603000, 604000, "SH"), (605000, 606000, "SH"), (688000, 690000, "SH"),
+    (1, 4000, "SZ"), (300000, 302000, "SZ"),
+]
+UNIVERSE_TTL_DAYS = 7                # 股票池缓存有效期（天）
+SCAN_CONCURRENCY = 16                # 并发批数（连接池大小取 max(本值, getStockListPrices.CONCURRENCY)）
+TOP_N = 50                           # 输出前 N 只
+MIN_AMOUNT = 5e7                     # 当日成交额下限（元），过滤冷门股
+EXCLUDE_ST = True                    # 排除 ST / *ST / 退市整理
+WATCH_INTERVAL = 5.0                 # --watch 轮询间隔（秒）
+VOL10_RETRY = 300.0                  # --watch 时仍有 VOL10 缺失，多久补算一次（秒）
+OUTPUT_FILE = None                   # 例如 "scan.csv" / "scan.parquet"（见 table_io），None=只打印
+CACHE_DIR = os.path.join(L.KLINE_CACHE_DIR, "scan")
+
+# ------------------ 抓取 ------------------
+def scan_session():
+    """新浪扫描用会话：连接池大小与并发批数一致（http_pool 按配置共享，不受先建会话影响）"""
+    return stock_core.make_session(
+        pool_size=max(SCAN_CONCURRENCY, L.CONCURRENCY), retry_total=L.RETRY_TOTAL, backoff_factor=0.4,
+        disable_system_proxy=L.DISABLE_SYSTEM_PROXY, proxies=L.PROXIES,
+    )
+
+def _fetch_sina(codes: list, sess=None) -> tuple:
+    """-> (拼接后的原始字节, 失败批数, 总批数)；失败的批跳过；配置 QUOTE_SERVER 时走本机服务"""
+    if L.QUOTE_SERVER:
+        import quote_server
+        return quote_server.client_sina(L.QUOTE_SERVER, codes), 0, 1
+    syms = [L.to_sina_symbol(c) for c in codes]
+    urls = ["https://hq.sinajs.cn/list=" + ",".join(syms[i:i+L.SINA_BATCH])
+            for i in range(0, len(syms), L.SINA_BATCH)]
+    sess = sess or scan_session()
+
+    def get(url):
+        try:
+            r = sess.get(url, headers=L.SINA_HEADERS, timeout=L.REQ_TIMEOUT)
+            r.raise_for_status()
+            return r.content
+        except Exception as e:
+            if L.PRINT_DEBUG:
+                print(f"[DBG-scan-err] {url[:60]}: {e}", flush=True)
+            return None
+
+    with ThreadPoolExecutor(max_workers=SCAN_CONCURRENCY) as ex:
+        chunks = list(ex.map(get, urls))
+    failed = sum(c is None for c in chunks)
+    return b"\n".join(c for c in chunks if c is not None), failed, len(urls)
+
+def _warn_failed(failed: int, total: int, what: str):
+    """有批次失败（多为限流 / 熔断）时总是提示，避免按残缺的股票池排序而不自知"""
+    if failed:
+        print(f"[WARN] {what}：新浪 {failed}/{total} 批失败，结果不完整（限流状态: {rate_limit.stats()}）",
+              flush=True)
+
+def fetch_sina_bytes(codes: list, sess=None) -> bytes:
+    """全部代码按 60 只一批并发请求，返回拼接后的原始字节（gbk，失败的批跳过并告警）"""
+    buf, failed, total = _fetch_sina(codes, sess)
+    _warn_failed(failed, total, "行情扫描")
+    return buf
+
+# ------------------ 股票池 ------------------
+def candidate_codes() -> list:
+    return [f"{n:06d}.{ex}" for lo, hi, ex in CODE_RANGES for n in range(lo, hi)]
+
+def load_universe(refresh: bool = False, sess=None) -> list:
+    """返回有行情的代码列表（'600000.SH'），缓存过期或 refresh 时重新试探"""
+    path = Path(os.path.expandvars(CACHE_DIR)).expanduser() / "universe.json"
+    if not refresh and path.exists():
+        try:
+            d = json.loads(path.read_text(encoding="utf-8"))
+            if _time.time() - d["fetched_at"] < UNIVERSE_TTL_DAYS * 86400 and d["codes"]:
+                return d["codes"]
+        except Exception:
+            pass
+
+    cands = candidate_codes()
+    buf, failed, total = _fetch_sina(cands, sess)
+    _warn_failed(failed, total, "股票池试探")
+    q = Q.parse_sina(buf)
+    codes = sorted(f"{c:06d}.{e.decode().upper()}" for c, e in zip(q["code"].tolist(), q["ex"].tolist()))
+    if failed:
+        return codes                 # 残缺的股票池不落盘，下次重新试探
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"fetched_at": _time.time(), "codes": codes}), encoding="utf-8")
+    os.replace(tmp, path)
+    return codes
+
+def load_vol10(codes: list, day: str) -> np.ndarray:
+    """
+    与 codes 对齐的 VOL10（手）；当天已算过的读缓存，只补算缓存里没有的代码
+    算不出来的（抓取失败/熔断/新股不足 10 根）不落盘，下次再试
+    """
+    path = Path(os.path.expandvars(CACHE_DIR)).expanduser() / f"vol10_{day}.npz"
+    m = {}
+    if path.exists():
+        with np.load(path) as z:
+            m = dict(zip(z["codes"].tolist(), z["vol10"].tolist()))
+    c6 = [L.norm6(c) for c in codes]
+    missing = [c for c, k in zip(codes, c6) if not np.isfinite(m.get(k, np.nan))]
+    if missing:
+        vmap = L.build_vol10_map_tencent_concurrent(missing, use_qfq=L.USE_QFQ, base_day=L.BASE_DAY_FOR_VOL10)
+        m.update({k: v for k, v in vmap.items() if np.isfinite(v)})
+        keep = sorted(k for k, v in m.items() if np.isfinite(v))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp.npz")
+        np.savez(tmp, codes=np.array(keep), vol10=np.array([m[k] for k in keep], dtype=np.float64))
+        os.replace(tmp, path)
+    return np.array([m.get(k, np.nan) for k in c6], dtype=np.float64)
+
+# ------------------ 预分配表 ------------------
+class ScanTable:
+    """
+    股票池上的定长列数组：每轮扫描原地覆盖，不随行情重建
+    name 为 gbk 定长字节列（输出时才解码）；其余为 float64（缺失 NaN）
+    """
+    FIELDS = ("open", "prev_close", "price", "volume", "amount")
+
+    def __init__(self, codes: list):
+        self.codes = list(codes)
+        n = len(self.codes)
+        keys = np.array([int(L.norm6(c)) + (1_000_000 if L.to_sina_symbol(c).startswith("sh") else 0)
+                         for c in self.codes], dtype=np.int64)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+        self.name = np.zeros(n, dtype=f"S{Q.NAME_WIDTH}")
+        self.cols = {k: np.full(n, np.nan) for k in self.FIELDS}
+        self.vol10 = np.full(n, np.nan)
+
+    def rows_of(self, keys: np.ndarray) -> tuple:
+        """代码键 -> (行号, 命中掩码)"""
+        pos = np.minimum(np.searchsorted(self.sorted_keys, keys), len(self.sorted_keys) - 1)
+        hit = self.sorted_keys[pos] == keys if len(self.sorted_keys) else np.zeros(len(keys), dtype=bool)
+        return self.order[pos[hit]], hit
+
+    def fill(self, buf: bytes) -> int:
+        """整段新浪原始字节批量解析后散射写入；返回命中行数"""
+        for a in self.cols.values():
+            a.fill(np.nan)
+        q = Q.parse_sina(buf)
+        rows, hit = self.rows_of(Q.code_keys(q["code"], q["ex"]))
+        self.name[rows] = q["name"][hit]
+        for k in self.FIELDS:
+            self.cols[k][rows] = q[k][hit]
+        return len(rows)
+
+    def rank(self, ft_eff: float, top: int = TOP_N) -> pd.DataFrame:
+        c = self.cols
+        px, pc, vh, am = c["price"], c["prev_close"], c["volume"], c["amount"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lb = vh / (self.vol10 * ft_eff) if ft_eff > 0 else np.full(len(px), np.nan)
+            chg = px / pc - 1.0
+        keep = (px > 0) & (am >= MIN_AMOUNT) & np.isfinite(lb)
+        if EXCLUDE_ST:
+            keep &= (np.char.find(self.name, b"ST") < 0) & ~np.char.startswith(self.name, "退".encode("gbk"))
+        idx = np.flatnonzero(keep)
+        idx = idx[np.argsort(-lb[idx], kind="stable")[:top]]
+        return pd.DataFrame({
+            "代码": [self.codes[i] for i in idx],
+            "名称": Q.decode_names(self.name[idx]),
+            "价格": px[idx],
+            "涨幅%": np.round(chg[idx] * 100, 2),
+            "盘中量比": np.round(lb[idx], 3),
+            "成交额(亿)": np.round(am[idx] / 1e8, 2),
+        })
+
+# ------------------ 主流程 ------------------
+def scan_once(table: ScanTable, sess, top: int = TOP_N) -> tuple:
+    """返回 (排序结果, {阶段: 秒})"""
+    t0 = _time.perf_counter()
+    buf = fetch_sina_bytes(table.codes, sess)
+    t1 = _time.perf_counter()
+    table.fill(buf)
+    t2 = _time.perf_counter()
+    _, ft_eff = L.progress_eff()
+    res = table.rank(ft_eff, top)
+    t3 = _time.perf_counter()
+    return res, {"fetch": t1 - t0, "parse": t2 - t1, "rank": t3 - t2}
+
+def parse_args():
+    p = argparse.ArgumentParser(description="全市场盘中量比扫描")
+    p.add_argument("--top", type=int, default=TOP_N, help=f"输出前 N 只（默认：{TOP_N}）")
+    p.add_argument("--watch", action="store_true", help="常驻轮询")
+    p.add_argument("--interval", type=float, default=WATCH_INTERVAL, help=f"轮询间隔秒数（默认：{WATCH_INTERVAL}）")
+    p.add_argument("--refresh-universe", action="store_true", help="忽略缓存，重新试探股票池")
+    return p.parse_args()
+
+def main():
+    args = parse_args()
+    sess = scan_session()
+    codes = load_universe(args.refresh_universe, sess)
+    table = ScanTable(codes)
+    vol10_day, vol10_at = None, 0.0
+    print(f"股票池: {len(codes)} 只")
+
+    while True:
+        t_loop = _time.monotonic()
+        day = L.now_cn().strftime("%Y-%m-%d")
+        if day != vol10_day or (np.isnan(table.vol10).any() and t_loop - vol10_at >= VOL10_RETRY):
+            table.vol10[:] = load_vol10(codes, day)
+            vol10_day, vol10_at = day, t_loop
+
+        res, dt = scan_once(table, sess, args.top)
+        stamp = L.now_cn().strftime("%H:%M:%S")
+        print(f"\n{stamp}  抓取 {dt['fetch']:.2f}s  解析 {dt['parse']*1000:.0f}ms  排序 {dt['rank']*1000:.0f}ms")
+        if L.PRINT_DEBUG:
+            print(f"[DBG-rate] {rate_limit.stats()}", flush=True)
+        with pd.option_context("display.width", 200, "display.unicode.east_asian_width", True):
+            print(res.to_string(index=False))
+        if OUTPUT_FILE:
+            from table_io import write_table
+            write_table(res, OUTPUT_FILE)
+
+        if not args.watch:
+            break
+        _time.sleep(max(0.0, args.interval - (_time.monotonic() - t_loop)))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+结构位（波谷/波峰）向量化检测
+- 定义同 find_pivot_low：x[i] 严格小于（波峰：严格大于）左右各 k 根的最小值（最大值），平台/持平不算
+- “已确认”：右侧必须有完整的 k 根；exclude_last=True 时最后一根不参与（盘中未定型）
+- 基于 sliding_window_view 的滑动最小/最大值，一次得到整段序列的全部波谷/波峰
+- 支持二维 (股票 × 交易日) 右对齐数组（左侧 NaN 填充）批量计算
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def pivot_mask(x: np.ndarray, k: int = 3, kind: str = "low") -> np.ndarray:
+    """
+    x: (..., n)；返回同形状布尔数组，True=该位置是严格波谷/波峰（两侧各 k 根齐全）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    mask = np.zeros(x.shape, dtype=bool)
+    if k <= 0 or n < 2 * k + 1:
+        return mask
+    win = sliding_window_view(x, k, axis=-1)
+    ext = win.min(axis=-1) if kind == "low" else win.max(axis=-1)   # ext[j] = x[j:j+k] 的极值
+    left = ext[..., :n - 2 * k]          # i∈[k, n-k-1] 的左窗 x[i-k:i]
+    right = ext[..., k + 1:]             # 右窗 x[i+1:i+k+1]
+    mid = x[..., k:n - k]
+    with np.errstate(invalid="ignore"):
+        if kind == "low":
+            hit = np.isfinite(mid) & (mid < left) & (mid < right)
+        else:
+            hit = np.isfinite(mid) & (mid > left) & (mid > right)
+    mask[..., k:n - k] = hit
+    return mask
+
+def find_pivots(x: np.ndarray, k: int = 3, exclude_last: bool = True, kind: str = "low") -> np.ndarray:
+    """返回一维序列全部已确认波谷/波峰的索引（升序）"""
+    x = np.asarray(x, dtype=np.float64)
+    end = len(x) - 1 if exclude_last else len(x)
+    return np.flatnonzero(pivot_mask(x[:max(end, 0)], k, kind))
+
+def find_pivot_lows(x, k: int = 3, exclude_last: bool = True) -> np.ndarray:
+    return find_pivots(x, k, exclude_last, "low")
+
+def find_pivot_highs(x, k: int = 3, exclude_last: bool = True) -> np.ndarray:
+    return find_pivots(x, k, exclude_last, "high")
+
+def last_pivot_index_2d(x: np.ndarray, k: int = 3, max_lookback: int = 120, exclude_last: bool = True,
+                        kind: str = "low") -> np.ndarray:
+    """
+    批量版“最近一个已确认波谷/波峰”：x 为 (S, D) 右对齐数组（最后一列=各自最后一根，左侧 NaN）
+    每行只在最近 max_lookback 根内查找；找不到时回退为该区间最小值（波峰：最大值）
+    返回每行索引（二维数组中的列号）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    S, D = x.shape
+    n = (x == x).sum(axis=1)                       # 各行有效根数
+    offset = D - n
+    end = np.full(S, D - 1 if exclude_last else D)  # 搜索区间 [start, end)
+    start = np.maximum(offset, end - max_lookback - k - 1)
+
+    cols = np.arange(D)
+    # 区间内做检测：把区间外置 NaN，右窗越界位置自然不会命中
+    xr = np.where((cols >= start[:, None]) & (cols < end[:, None]), x, np.nan)
+    mask = pivot_mask(xr, k, kind)
+
+    has = mask.any(axis=1)
+    last = D - 1 - np.argmax(mask[:, ::-1], axis=1)
+
+    fill = np.inf if kind == "low" else -np.inf
+    xf = np.where(np.isnan(xr), fill, xr)
+    fb = np.argmin(xf, axis=1) if kind == "low" else np.argmax(xf, axis=1)
+    empty = end <= start
+    fb = np.where(empty, np.where(n >= 2, D - 2, D - 1), fb)
+    return np.where(has, last, fb)
+
+def last_pivot_index(x: np.ndarray, k: int = 3, max_lookback: int = 120, exclude_last: bool = True,
+                     kind: str = "low") -> int:
+    """一维版：返回最近一个已确认波谷/波峰的索引（语义同 find_pivot_low）"""
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) == 0:
+        return 0
+    return int(last_pivot_index_2d(x[None, :], k, max_lookback, exclude_last, kind)[0])
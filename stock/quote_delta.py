@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+逐笔快照增量（常驻轮询用）
+- DeltaTracker 按股票池定长数组保存“上次输出时”的价格 / 累计量 / 量比 / 时刻，
+  每轮整列计算：Δ价%、增量(手)、Δ量比、量比加速度（每分钟），只标记越过阈值的行
+- 以上次输出为基准（而非上一轮）：缓慢漂移累计到阈值也会输出
+- 首轮（或换日 reset 后）有价格的行全部输出一次作为基线
+- 输出端：stdout / file:路径（TSV 追加）/ udp:主机:端口（每行一条 JSON 数据报，不阻塞轮询）
+"""
+import json
+import math
+import os
+import socket
+import sys
+import numpy as np
+
+COLUMNS = ("时间", "代码", "名称", "价格", "涨跌%", "Δ价%", "增量(手)", "量比", "Δ量比", "量比加速/分")
+
+def _cross(x: np.ndarray, th) -> np.ndarray:
+    """阈值 None=不参与；0=有变化即算；否则 |x| >= th"""
+    if th is None:
+        return np.zeros(len(x), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        return (x != 0) & ~np.isnan(x) if th == 0 else np.abs(x) >= th
+
+class DeltaTracker:
+    def __init__(self, n: int, price_pct=0.1, vol_hand=None, ratio=0.05):
+        self.price_pct, self.vol_hand, self.ratio = price_pct, vol_hand, ratio
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        n = self.n
+        self.price = np.full(n, np.nan)
+        self.volume = np.full(n, np.nan)
+        self.lb = np.full(n, np.nan)
+        self.t = np.full(n, np.nan)
+
+    def update(self, price: np.ndarray, volume: np.ndarray, lb: np.ndarray, t: float) -> dict:
+        """
+        price / volume(手) / lb(量比) 与股票池同序；t 为秒级时间戳
+        返回各增量列与 emit 掩码；emit 的行把基准更新为本轮值
+        """
+        price = np.where(price > 0, price, np.nan)
+        first = np.isnan(self.price) & ~np.isnan(price)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            d_price_pct = (price / self.price - 1.0) * 100.0
+            d_vol = volume - self.volume
+            d_lb = lb - self.lb
+            lb_rate = d_lb / ((t - self.t) / 60.0)
+        emit = first | _cross(d_price_pct, self.price_pct) | _cross(d_vol, self.vol_hand) | _cross(d_lb, self.ratio)
+        emit &= ~np.isnan(price)
+
+        self.price[emit] = price[emit]
+        self.volume[emit] = volume[emit]
+        self.lb[emit] = lb[emit]
+        self.t[emit] = t
+        return {"d_price_pct": d_price_pct, "d_vol": d_vol, "d_lb": d_lb, "lb_rate": lb_rate, "emit": emit}
+
+# ------------------ 输出端 ------------------
+def _fmt(v, nd: int = 3) -> str:
+    if isinstance(v, float):
+        return "" if math.isnan(v) else f"{v:.{nd}f}"
+    return str(v)
+
+class StdoutSink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.header = False
+
+    def write(self, records: list):
+        if not records:
+            return
+        lines = [] if self.header else ["\t".join(COLUMNS)]
+        self.header = True
+        lines += ["\t".join(_fmt(r[c]) for c in COLUMNS) for r in records]
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+class FileSink(StdoutSink):
+    def __init__(self, path: str):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        super().__init__(open(path, "a", encoding="utf-8"))
+        self.header = not new
+
+    def close(self):
+        self.stream.close()
+
+class UdpSink:
+    def __init__(self, host: str, port: int):
+        self.addr = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def write(self, records: list):
+        for r in records:
+            msg = {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in r.items()}
+            try:
+                self.sock.sendto(json.dumps(msg, ensure_ascii=False).encode("utf-8"), self.addr)
+            except OSError:
+                pass    # 无接收方 / 缓冲区满时丢弃，不拖慢轮询
+
+    def close(self):
+        self.sock.close()
+
+def make_sink(spec: str = "stdout"):
+    """'stdout' | 'file:路径' | 'udp:主机:端口'"""
+    kind, _, rest = (spec or "stdout").partition(":")
+    if kind == "stdout":
+        return StdoutSink()
+    if kind == "file" and rest:
+        return FileSink(rest)
+    if kind == "udp" and rest:
+        host, _, port = rest.rpartition(":")
+        return UdpSink(host or "127.0.0.1", int(port))
+    raise ValueError(f"无法识别的输出端: {spec}")
+
+def records(stamp: str, codes: list, names: list, price: np.ndarray, chg_pct: np.ndarray, lb: np.ndarray,
+            delta: dict) -> list:
+    """把 emit 的行组装成输出记录（只遍历需要输出的行）"""
+    out = []
+    for i in np.flatnonzero(delta["emit"]).tolist():
+        out.append({
+            "时间": stamp, "代码": codes[i], "名称": names[i],
+            "价格": float(price[i]), "涨跌%": float(chg_pct[i]),
+            "Δ价%": float(delta["d_price_pct"][i]), "增量(手)": float(delta["d_vol"][i]),
+            "量比": float(lb[i]), "Δ量比": float(delta["d_lb"][i]), "量比加速/分": float(delta["lb_rate"][i]),
+        })
+    return out
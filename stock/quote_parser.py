@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+行情批量解析（直接在原始字节上做，不解码整段文本、不逐字段建 Python 字符串）
+- 新浪 hq_str：var hq_str_sh600000="名称,今开,昨收,现价,最高,最低,买一,卖一,成交量(股),成交额(元),...";
+- 腾讯 qt：    v_sh600000="1~名称~代码~现价~昨收~今开~成交量(手)~...~买一(9)~...~卖一(19)~...~最高(33)~最低(34)~...~成交额(万)(37)~...";
+- 做法：np.frombuffer 取字节 -> 一次找出全部引号/分隔符位置 -> 按记录定位第 k 个字段的起止
+  -> 数值字段字节拼成扁平数组，按位权求和得整数尾数再除以 10^小数位（与 float(str) 结果一致）
+- 输出为类型化列：code(int32) / ex(S2) / name(gbk 定长字节，decode_names 按需解码) / 各价格量额(float64)
+- 空记录（停牌/无效代码 ""）直接跳过；字段缺失或非数字为 NaN
+- 量统一为“手”，额统一为“元”
+- sina_snapshot：新浪全部字段（含五档买卖盘、日期时间）+ 派生字段（涨跌幅/振幅/盘口失衡/均价）
+  一次算好，存为结构化数组（SNAPSHOT_DTYPE）
+
+基准：python quote_parser.py --bench [原始响应文件]（不给文件时用合成的 5000 只）；
+      python quote_parser.py --capture sina.bin 从新浪抓一份全市场原始响应
+"""
+import argparse
+import time as _time
+import numpy as np
+
+NUM_WIDTH = 24          # 数值字段最大字节数（超出视为无效）
+NAME_WIDTH = 24         # 名称定长字节数（gbk，一个汉字 2 字节）
+
+SINA_FIELDS = {"open": 1, "prev_close": 2, "price": 3, "high": 4, "low": 5,
+               "bid": 6, "ask": 7, "volume": 8, "amount": 9}
+QT_FIELDS = {"price": 3, "prev_close": 4, "open": 5, "volume": 6, "bid": 9, "ask": 19,
+             "high": 33, "low": 34, "amount": 37}
+
+# 五档：买1量,买1价,...,买5量,买5价 = 10..19；卖1量,卖1价,...,卖5价 = 20..29；日期 30、时间 31
+SINA_DEPTH = {f"{side}{i}_{kind}": base + 2 * (i - 1) + (kind == "p")
+              for side, base in (("b", 10), ("a", 20)) for i in range(1, 6) for kind in ("v", "p")}
+SINA_TEXT = {"date": (30, 10), "time": (31, 8)}
+SNAPSHOT_DTYPE = np.dtype([
+    ("code", "i4"), ("ex", "S2"), ("name", f"S{NAME_WIDTH}"),
+    ("open", "f8"), ("prev_close", "f8"), ("price", "f8"), ("high", "f8"), ("low", "f8"),
+    ("bid", "f8"), ("ask", "f8"),
+    ("volume", "f8"), ("amount", "f8"),                    # 手 / 元
+    ("bid_p", "f8", (5,)), ("bid_v", "f8", (5,)),          # 五档价 / 量（手）
+    ("ask_p", "f8", (5,)), ("ask_v", "f8", (5,)),
+    ("date", "S10"), ("time", "S8"),
+    ("chg_pct", "f8"),       # 涨跌幅%（相对昨收）
+    ("amp_pct", "f8"),       # 振幅%（(最高-最低)/昨收）
+    ("imbalance", "f8"),     # 盘口失衡 = (五档买量-五档卖量)/(五档买量+五档卖量)，[-1, 1]
+    ("vwap", "f8"),          # 均价 = 成交额/成交量(股)
+])
+
+_QUOTE, _EQ = ord('"'), ord("=")
+_POW10 = 10.0 ** np.arange(NUM_WIDTH + 1)
+_IPOW10 = 10 ** np.arange(18, dtype=np.int64)
+
+# ------------------ 底层 ------------------
+def _records(a: np.ndarray):
+    """返回非空记录的 (左引号位置, 右引号位置)；记录形如 xxx_sh600000="...\""""
+    q = np.flatnonzero(a == _QUOTE)
+    q = q[q >= 9]
+    opens = q[a[q - 1] == _EQ]
+    if len(opens) == 0:
+        return opens, opens
+    nxt = np.searchsorted(q, opens, side="right")
+    ok = nxt < len(q)
+    opens = opens[ok]
+    closes = q[nxt[ok]]
+    keep = closes - opens > 1
+    return opens[keep], closes[keep]
+
+def _gather(a: np.ndarray, start: np.ndarray, end: np.ndarray, width: int):
+    """每条 [start, end) 截成定宽矩阵（越界位置为 0），返回 (矩阵, 有效掩码)"""
+    cols = np.arange(width)
+    idx = start[:, None] + cols
+    valid = idx < end[:, None]
+    mat = np.where(valid, a[np.minimum(idx, len(a) - 1)], 0).astype(np.uint8)
+    return mat, valid
+
+def _to_int(a: np.ndarray, start: np.ndarray, end: np.ndarray, width: int) -> np.ndarray:
+    """纯数字字段 -> int64；含非数字或为空时 -1"""
+    mat, valid = _gather(a, start, end, width)
+    d = mat.astype(np.int64) - 48
+    is_digit = valid & (d >= 0) & (d <= 9)
+    ok = (is_digit == valid).all(axis=1) & valid.any(axis=1)
+    out = np.zeros(len(start), dtype=np.int64)
+    for j in range(width):
+        out = np.where(is_digit[:, j], out * 10 + d[:, j], out)
+    return np.where(ok, out, -1)
+
+def _to_float(a: np.ndarray, start: np.ndarray, end: np.ndarray, width: int = NUM_WIDTH) -> np.ndarray:
+    """
+    十进制字段 -> float64（可带 '-' 与一个 '.'）；空/非法/超宽为 NaN
+    各字段字节首尾相接成一条扁平数组处理（无定宽填充）：每位数字乘 10^(其后数字个数) 按字段求和得整数尾数
+    （< 2^53 时精确），再一次除以 10^小数位，结果与 float(str) 一致
+    """
+    n = len(start)
+    out = np.full(n, np.nan)
+    lens = end - start
+    live = (lens > 0) & (lens <= width)
+    if not live.any():
+        return out
+    st, ln = start[live], lens[live]
+    offs = np.cumsum(ln) - ln                                    # 各字段在扁平数组中的起点
+    total = int(ln.sum())
+    fid = np.repeat(np.arange(len(st)), ln)
+    b = a[np.arange(total) - np.repeat(offs - st, ln)]
+    d = b - np.uint8(48)                                         # 非数字回绕到 >= 10
+    is_digit = d < 10
+    is_dot = b == ord(".")
+    cnt = np.cumsum(is_digit, dtype=np.int32)
+    end_cnt = cnt[offs + ln - 1]
+    n_dig = end_cnt - (cnt[offs] - is_digit[offs])
+    after = end_cnt[fid] - cnt                                   # 每个字节之后（同字段内）的数字个数
+    mant = np.add.reduceat(np.where(is_digit, d.astype(np.int64) * _IPOW10[np.minimum(after, 17)], 0), offs)
+    n_dot = np.add.reduceat(is_dot, offs, dtype=np.int32)
+    scale = np.add.reduceat(np.where(is_dot, after, 0), offs)    # 小数点之后的数字个数
+    neg = b[offs] == ord("-")
+    ok = (n_dig + n_dot + neg == ln) & (n_dig > 0) & (n_dig <= 17) & (n_dot <= 1)
+    val = mant.astype(np.float64) / _POW10[np.minimum(scale, NUM_WIDTH)]
+    out[live] = np.where(ok, np.where(neg, -val, val), np.nan)
+    return out
+
+def _to_bytes(a: np.ndarray, start: np.ndarray, end: np.ndarray, width: int) -> np.ndarray:
+    """字段 -> 定长字节列（S{width}），超长截断"""
+    mat, _ = _gather(a, start, end, width)
+    return np.ascontiguousarray(mat).view(f"S{width}").ravel()
+
+def _field_bounds(seps: np.ndarray, opens: np.ndarray, closes: np.ndarray, k: np.ndarray, first: np.ndarray,
+                  nsep: np.ndarray):
+    """第 k 个字段（k 可逐记录不同）的 [start, end) 与存在掩码"""
+    has = k <= nsep
+    kk = np.where(has, k, 0)
+    last = len(seps) - 1
+    start = np.where(kk == 0, opens + 1, seps[np.clip(first + kk - 1, 0, last)] + 1)
+    end = np.where(kk < nsep, seps[np.clip(first + kk, 0, last)], closes)
+    return np.where(has, start, 0), np.where(has, end, 0), has
+
+def _symbols(a: np.ndarray, opens: np.ndarray) -> tuple:
+    """左引号前的 'sh600000=' -> (code int32, ex S2)；代码非数字为 -1"""
+    code = _to_int(a, opens - 7, opens - 1, 6).astype(np.int32)
+    ex = _to_bytes(a, opens - 9, opens - 7, 2)
+    return code, ex
+
+def _parse(buf, sep: int, fields: dict, name_k: int, code_k: int = None, text_fields: dict = None) -> dict:
+    a = np.frombuffer(buf, dtype=np.uint8)
+    opens, closes = _records(a)
+    code, ex = _symbols(a, opens)
+    keep = code >= 0
+    opens, closes, code, ex = opens[keep], closes[keep], code[keep], ex[keep]
+
+    seps = np.flatnonzero(a == sep)
+    first = np.searchsorted(seps, opens)
+    nsep = np.searchsorted(seps, closes) - first
+
+    # 腾讯 gbk 名称的第二字节可能恰为 '~'（0x7E）：以代码字段对齐，名称之后的字段整体右移
+    shift = np.zeros(len(opens), dtype=np.int64)
+    if code_k is not None:
+        found = np.zeros(len(opens), dtype=bool)
+        for s in range(3):
+            st, en, has = _field_bounds(seps, opens, closes, np.full(len(opens), code_k + s), first, nsep)
+            hit = ~found & has & (_to_int(a, st, en, 6) == code)
+            shift[hit] = s
+            found |= hit
+        keep = found
+        opens, closes, code, ex = opens[keep], closes[keep], code[keep], ex[keep]
+        first, nsep, shift = first[keep], nsep[keep], shift[keep]
+
+    out = {"code": code, "ex": ex}
+    st, _, _ = _field_bounds(seps, opens, closes, np.full(len(opens), name_k), first, nsep)
+    _, en, has = _field_bounds(seps, opens, closes, name_k + shift, first, nsep)
+    out["name"] = _to_bytes(a, st, np.where(has, en, st), NAME_WIDTH)
+    # 全部数值字段拼成一列一次解析
+    m = len(opens)
+    kk = np.concatenate([np.full(m, k) + (shift if k > name_k else 0) for k in fields.values()])
+    tile = lambda x: np.tile(x, len(fields))
+    st, en, has = _field_bounds(seps, tile(opens), tile(closes), kk, tile(first), tile(nsep))
+    vals = np.where(has, _to_float(a, st, en), np.nan)
+    for j, key in enumerate(fields):
+        out[key] = vals[j * m:(j + 1) * m]
+    for key, (k, width) in (text_fields or {}).items():
+        st, en, has = _field_bounds(seps, opens, closes, np.full(m, k) + (shift if k > name_k else 0), first, nsep)
+        out[key] = _to_bytes(a, st, np.where(has, en, st), width)
+    return out
+
+# ------------------ 对外 ------------------
+def parse_sina(buf) -> dict:
+    """新浪原始响应字节 -> 列字典；volume 为手（股/100），amount 为元"""
+    out = _parse(buf, ord(","), SINA_FIELDS, name_k=0)
+    out["volume"] = out["volume"] / 100.0
+    return out
+
+def parse_qt(buf) -> dict:
+    """腾讯 qt 原始响应字节 -> 列字典；volume 为手，amount 为元（原始单位万元）"""
+    out = _parse(buf, ord("~"), QT_FIELDS, name_k=1, code_k=2)
+    out["amount"] = out["amount"] * 1e4
+    return out
+
+def sina_snapshot(buf) -> np.ndarray:
+    """新浪原始响应字节 -> SNAPSHOT_DTYPE 结构化数组（一条记录一只，派生字段同时算好）"""
+    q = _parse(buf, ord(","), {**SINA_FIELDS, **SINA_DEPTH}, name_k=0, text_fields=SINA_TEXT)
+    snap = np.zeros(len(q["code"]), dtype=SNAPSHOT_DTYPE)
+    for key in SNAPSHOT_DTYPE.names:
+        if key in q:
+            snap[key] = q[key]
+    for side, col in (("b", "bid"), ("a", "ask")):
+        snap[f"{col}_p"] = np.column_stack([q[f"{side}{i}_p"] for i in range(1, 6)])
+        snap[f"{col}_v"] = np.column_stack([q[f"{side}{i}_v"] for i in range(1, 6)]) / 100.0
+    snap["volume"] /= 100.0
+    derive(snap)
+    return snap
+
+def derive(snap: np.ndarray) -> np.ndarray:
+    """按列计算派生字段（原地）；未开盘/停牌（现价 0）时涨跌幅、振幅为 NaN"""
+    px, pc = snap["price"], snap["prev_close"]
+    live = (px > 0) & (pc > 0)
+    bv, av = snap["bid_v"].sum(axis=1), snap["ask_v"].sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        snap["chg_pct"] = np.where(live, (px / pc - 1.0) * 100.0, np.nan)
+        snap["amp_pct"] = np.where(live, (snap["high"] - snap["low"]) / pc * 100.0, np.nan)
+        snap["imbalance"] = np.where(bv + av > 0, (bv - av) / (bv + av), np.nan)
+        snap["vwap"] = np.where(snap["volume"] > 0, snap["amount"] / (snap["volume"] * 100.0), np.nan)
+    return snap
+
+def align(snap: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """按 code_keys 给定的顺序取记录；缺失的行 code=-1、数值为 NaN"""
+    out = np.zeros(len(keys), dtype=snap.dtype)
+    for key in snap.dtype.names:
+        if snap.dtype[key].base.kind == "f":
+            out[key] = np.nan
+    out["code"] = -1
+    if len(snap) == 0:
+        return out
+    have = code_keys(snap["code"], snap["ex"])
+    order = np.argsort(have, kind="stable")
+    pos = np.minimum(np.searchsorted(have[order], keys), len(have) - 1)
+    hit = have[order][pos] == keys
+    out[hit] = snap[order[pos[hit]]]
+    return out
+
+def decode_names(names: np.ndarray, encoding: str = "gbk") -> list:
+    """定长名称字节 -> str 列表（截断在半个汉字处的尾字节忽略）"""
+    return [b.decode(encoding, errors="ignore") for b in names.tolist()]
+
+def code_keys(code: np.ndarray, ex: np.ndarray) -> np.ndarray:
+    """(代码, 交易所) -> 唯一整数键：沪市 + 1_000_000"""
+    return code.astype(np.int64) + np.where(ex == b"sh", 1_000_000, 0)
+
+# ------------------ 基准 ------------------
+def synth_sina(n: int = 5000, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(n):
+        sym = f"sh{600000 + i:06d}" if i % 2 else f"sz{i:06d}"
+        pc = rng.uniform(3, 80)
+        p = [round(pc * rng.uniform(0.9, 1.1), 3) for _ in range(6)]
+        v = int(rng.uniform(1e4, 1e9))
+        tail = ",".join(["100", f"{p[4]:.3f}"] * 10)
+        lines.append(f'var hq_str_{sym}="股票{i:04d},{p[0]:.3f},{pc:.3f},{p[1]:.3f},{p[2]:.3f},{p[3]:.3f},'
+                     f'{p[4]:.3f},{p[5]:.3f},{v},{v * p[1]:.3f},{tail},2026-10-16,15:00:03,00,";')
+    return "\n".join(lines).encode("gbk")
+
+def synth_qt(n: int = 5000, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(n):
+        c6 = f"{600000 + i:06d}" if i % 2 else f"{i:06d}"
+        sym = ("sh" if i % 2 else "sz") + c6
+        f = [f"{rng.uniform(3, 80):.2f}" for _ in range(50)]
+        f[0], f[1], f[2], f[6] = "1", f"股票{i:04d}", c6, str(int(rng.uniform(1e3, 1e7)))
+        lines.append(f'v_{sym}="{"~".join(f)}";')
+    return "\n".join(lines).encode("gbk")
+
+def _split_sina(buf: bytes) -> dict:
+    """对照：逐行 re.match + split(",") 的原解析口径（取全部数值字段）"""
+    import re
+    out = {}
+    for line in buf.decode("gbk").strip().splitlines():
+        m = re.match(r'var hq_str_(sh|sz)(\d{6})="([^"]*)";', line)
+        if not m:
+            continue
+        parts = m.group(3).split(",")
+        if len(parts) >= 10:
+            out[m.group(2)] = [parts[0]] + [float(x) for x in parts[1:10]]
+    return out
+
+def _split_qt_names(buf: bytes) -> dict:
+    """对照：GetStockBuyAnalysisData 原 get_name_map_tencent 的逐行 split 解析"""
+    out = {}
+    for line in buf.decode("gbk").strip().splitlines():
+        if "~" in line:
+            parts = line.split("=", 1)[1].strip().strip('";').split("~")
+            out[parts[2].zfill(6)] = parts[1]
+    return out
+
+def _timeit(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = _time.perf_counter()
+        fn()
+        best = min(best, _time.perf_counter() - t0)
+    return best
+
+def bench(path: str = None):
+    import getStockListPrices as L
+    sina = open(path, "rb").read() if path else synth_sina()
+    qt = synth_qt()
+
+    def old_sina():
+        return L.parse_sina_text(sina.decode("gbk"), {})
+
+    ref = old_sina()
+    new = parse_sina(sina)
+    c6 = [f"{c:06d}" for c in new["code"].tolist()]
+    same = all(abs(ref[c]["vol_hand"] - v) < 1e-9 and float(ref[c]["price"]) == p
+               for c, p, v in zip(c6, new["price"].tolist(), new["volume"].tolist()))
+    print(f"新浪  {len(sina) / 1e6:.2f} MB  {len(new['code'])} 只  与现有解析一致: {same and len(ref) == len(c6)}")
+    print(f"  逐行 re.match + split: {_timeit(lambda: _split_sina(sina)) * 1000:7.1f} ms（9 个数值字段转 float）")
+    print(f"  现有 decode + SINA_RE: {_timeit(old_sina) * 1000:7.1f} ms（只取名称/现价/量，现价保留字符串）")
+    print(f"  字节列式 parse_sina:   {_timeit(lambda: parse_sina(sina)) * 1000:7.1f} ms（9 个数值字段 -> float64 列）")
+
+    ref_q = _split_qt_names(qt)
+    new_q = parse_qt(qt)
+    same_q = dict(zip([f"{c:06d}" for c in new_q["code"].tolist()], decode_names(new_q["name"]))) == ref_q
+    print(f"腾讯  {len(qt) / 1e6:.2f} MB  {len(new_q['code'])} 只  名称与现有解析一致: {same_q}")
+    print(f"  现有 逐行 split:       {_timeit(lambda: _split_qt_names(qt)) * 1000:7.1f} ms")
+    print(f"  字节列式 parse_qt:     {_timeit(lambda: parse_qt(qt)) * 1000:7.1f} ms")
+
+def capture(path: str):
+    import market_scan as M
+    sess = M.scan_session()
+    codes = M.load_universe(sess=sess)
+    with open(path, "wb") as f:
+        f.write(M.fetch_sina_bytes(codes, sess))
+    print(f"已保存 {len(codes)} 只新浪原始响应：{path}")
+
+def parse_args():
+    p = argparse.ArgumentParser(description="行情批量解析基准")
+    p.add_argument("--bench", nargs="?", const="", default=None, metavar="FILE", help="跑基准（可给原始新浪响应文件）")
+    p.add_argument("--capture", metavar="FILE", help="抓一份全市场新浪原始响应")
+    return p.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.capture:
+        capture(args.capture)
+    if args.bench is not None:
+        bench(args.bench or None)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+本机行情分发服务（localhost HTTP）：多个本地程序共用一路上游轮询
+- 新浪：服务端维护“被请求过的代码”集合，后台线程每 POLL_INTERVAL 秒批量拉一次，按代码保存原始行（gbk 字节）；
+  客户端 GET /sina?codes=... 拿到与新浪同格式的原始字节，解析链路（parse_sina_text / quote_parser）不变
+  新代码首次请求时同步补拉一次；WATCH_TTL 秒内没人再要的代码不再轮询
+  上游失败时按轮询间隔退避：客户端请求不再各自同步重试上游，直接拿到旧行情，
+  响应头 X-Quote-Age（距上次成功拉取秒数）/ X-Quote-Stale: 1 标明数据已过期
+- 日K：GET /kline?code=&qfq=&limit= 经本地 kline_store 取数，内存缓存到下一次收盘定型；
+  同一只股票并发请求只发一次上游
+- 上游请求量只取决于代码数与轮询间隔，与客户端个数无关
+- 客户端：getStockListPrices / GetStockBuyAnalysisData 的 QUOTE_SERVER 配成 "http://127.0.0.1:8765" 即走本服务
+
+用法：python quote_server.py [--port 8765] [--interval 3]
+"""
+import argparse
+import json
+import re
+import threading
+import time as _time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+HOST = "127.0.0.1"
+PORT = 8765
+POLL_INTERVAL = 3.0          # 新浪轮询间隔（秒）
+WATCH_TTL = 120.0            # 代码多久没人请求就停止轮询（秒）
+CLIENT_TIMEOUT = 10          # 客户端请求本服务的超时（秒）
+
+_LINE_RE = re.compile(rb"hq_str_((?:s[hz]|bj)\d{6})=")
+
+# ------------------ 服务端状态 ------------------
+class QuoteHub:
+    def __init__(self, interval: float = POLL_INTERVAL, watch_ttl: float = WATCH_TTL):
+        import getStockListPrices as L
+        L.QUOTE_SERVER = None            # 服务端自己直连上游
+        self.L = L
+        self.interval, self.watch_ttl = interval, watch_ttl
+        self.lines = {}                  # sina 符号(bytes) -> 原始行
+        self.watch = {}                  # code_raw -> 最近一次被请求的时刻
+        self.polled_at = 0.0             # 最近一次轮询尝试（成功或失败都记，避免客户端请求逐个同步重试）
+        self.ok_at = 0.0                 # 最近一次轮询成功
+        self.failed_at = 0.0             # 最近一次上游失败（之后 interval 秒内不再同步补拉）
+        self.last_error = None
+        self.upstream = {"sina": 0, "kline": 0}
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.RLock()
+        self.klines = {}                 # (code, qfq) -> (rows, limit, fetched_at)
+        self.kline_locks = {}
+        self.sess = L.make_session()
+
+    # —— 新浪 —— #
+    def _fetch(self, codes: list):
+        bodies = self.L.fetch_sina_raw(codes, self.sess)
+        got = {}
+        for body in bodies:
+            for line in body.splitlines():
+                m = _LINE_RE.search(line)
+                if m:
+                    got[m.group(1)] = line
+        with self.lock:
+            self.lines.update(got)
+            self.upstream["sina"] += len(bodies)
+
+    def _missing(self, codes: list) -> tuple:
+        """(缺行情的代码, 是否整体过期)"""
+        with self.lock:
+            missing = [c for c in codes if self.L.to_sina_symbol(c).encode() not in self.lines]
+            return missing, _time.time() - self.polled_at > 3 * self.interval
+
+    def _failed(self, e: Exception):
+        self.failed_at, self.last_error = _time.time(), str(e)
+
+    def age(self) -> float:
+        """距上次成功轮询的秒数（从未成功为 inf）"""
+        return _time.time() - self.ok_at if self.ok_at else float("inf")
+
+    def sina(self, codes: list) -> tuple:
+        """-> (原始字节, 是否过期)；上游退避期内只返回已有的行，不同步请求上游"""
+        now = _time.time()
+        with self.lock:
+            for c in codes:
+                self.watch[c] = now
+        missing, stale = self._missing(codes)
+        if (missing or stale) and now - self.failed_at >= self.interval:
+            with self.fetch_lock:            # 并发到达的请求只让第一个去上游，其余等它完成后复查
+                missing, stale = self._missing(codes)
+                try:
+                    if stale:
+                        self.poll()
+                    elif missing:
+                        self._fetch(missing)
+                except Exception as e:
+                    self._failed(e)
+                    print(f"[WARN] 新浪补拉失败，返回旧行情: {e}", flush=True)
+        syms = [self.L.to_sina_symbol(c).encode() for c in codes]
+        with self.lock:
+            body = b"\n".join(self.lines[s] for s in syms if s in self.lines)
+        return body, self.age() > 3 * self.interval
+
+    def poll(self):
+        with self.fetch_lock:
+            now = _time.time()
+            with self.lock:
+                for c in [c for c, t in self.watch.items() if now - t > self.watch_ttl]:
+                    del self.watch[c]
+                    self.lines.pop(self.L.to_sina_symbol(c).encode(), None)
+                codes = list(self.watch)
+            try:
+                if codes:
+                    self._fetch(codes)
+                self.ok_at = now
+            except Exception as e:
+                self._failed(e)
+                raise
+            finally:
+                self.polled_at = now
+
+    def run_poller(self, stop: threading.Event):
+        while not stop.is_set():
+            t0 = _time.monotonic()
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[WARN] 新浪轮询失败: {e}", flush=True)
+            stop.wait(max(0.0, self.interval - (_time.monotonic() - t0)))
+
+    # —— 日K —— #
+    def kline(self, code: str, use_qfq: bool, limit: int):
+        """最近 limit 根日K（bars.Bars 切片视图）"""
+        from kline_store import last_session_close, now_cn
+        key = (code, use_qfq)
+        with self.lock:
+            lk = self.kline_locks.setdefault(key, threading.Lock())
+        with lk:
+            hit = self.klines.get(key)
+            fresh = last_session_close(now_cn()).timestamp()
+            if hit is None or hit[2] < fresh or limit > hit[1]:
+                rows = self.L.fetch_hist_cached(code, use_qfq=use_qfq, limit=limit)
+                hit = (rows, limit, _time.time())
+                self.klines[key] = hit
+                with self.lock:
+                    self.upstream["kline"] += 1
+        return hit[0][-limit:]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"watch": len(self.watch), "lines": len(self.lines), "klines": len(self.klines),
+                    "polled_at": self.polled_at, "ok_at": self.ok_at, "failed_at": self.failed_at,
+                    "last_error": self.last_error, "upstream": dict(self.upstream)}
+
+class Handler(BaseHTTPRequestHandler):
+    hub = None
+
+    def _send(self, body: bytes, ctype: str, status: int = 200, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, obj, status: int = 200):
+        self._send(json.dumps(obj, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", status)
+
+    def do_GET(self):
+        u = urllib.parse.urlparse(self.path)
+        q = urllib.parse.parse_qs(u.query)
+        try:
+            if u.path == "/sina":
+                codes = [c for c in q.get("codes", [""])[0].split(",") if c]
+                body, stale = self.hub.sina(codes)
+                age = self.hub.age()
+                headers = {"X-Quote-Age": "inf" if age == float("inf") else f"{age:.1f}"}
+                if stale:
+                    headers["X-Quote-Stale"] = "1"
+                self._send(body, "text/plain; charset=gbk", headers=headers)
+            elif u.path == "/kline":
+                rows = self.hub.kline(q["code"][0], q.get("qfq", ["1"])[0] == "1", int(q.get("limit", ["1200"])[0]))
+                self._json(rows.to_rows())
+            elif u.path == "/health":
+                self._json(self.hub.stats())
+            else:
+                self._json({"error": "not found"}, 404)
+        except Exception as e:
+            self._json({"error": str(e)}, 502)
+
+    def log_message(self, fmt, *args):
+        pass
+
+def serve(host: str = HOST, port: int = PORT, interval: float = POLL_INTERVAL):
+    hub = QuoteHub(interval)
+    Handler.hub = hub
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    stop = threading.Event()
+    threading.Thread(target=hub.run_poller, args=(stop,), daemon=True).start()
+    print(f"行情分发服务: http://{host}:{port}  轮询间隔 {interval}s", flush=True)
+    try:
+        httpd.serve_forever()
+    finally:
+        stop.set()
+        httpd.server_close()
+
+# ------------------ 客户端 ------------------
+_OPENER = urllib.request.build_opener(urllib.request.ProxyHandler({}))   # 本机请求不走系统代理
+
+def _open(base: str, path: str, params: dict) -> tuple:
+    url = f"{base.rstrip('/')}{path}?{urllib.parse.urlencode(params)}"
+    with _OPENER.open(url, timeout=CLIENT_TIMEOUT) as r:
+        return r.read(), r.headers
+
+def _get(base: str, path: str, params: dict) -> bytes:
+    return _open(base, path, params)[0]
+
+def client_sina(base: str, codes: list) -> bytes:
+    """与新浪同格式的原始字节（gbk）；服务端上游失败时为旧行情并告警"""
+    body, headers = _open(base, "/sina", {"codes": ",".join(codes)})
+    if headers.get("X-Quote-Stale"):
+        print(f"[WARN] 行情分发服务上游失败，行情已 {headers.get('X-Quote-Age')}s 未更新", flush=True)
+    return body
+
+def client_kline(base: str, code_raw: str, use_qfq: bool = True, limit: int = 1200) -> list:
+    """[[date, open, close, high, low, volume], ...]（与 fetch_hist_tencent 同格式）"""
+    return json.loads(_get(base, "/kline", {"code": code_raw, "qfq": int(bool(use_qfq)), "limit": limit}))
+
+def parse_args():
+    p = argparse.ArgumentParser(description="本机行情分发服务")
+    p.add_argument("--host", default=HOST)
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--interval", type=float, default=POLL_INTERVAL, help=f"新浪轮询间隔秒数（默认：{POLL_INTERVAL}）")
+    return p.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        serve(args.host, args.port, args.interval)
+    except KeyboardInterrupt:
+        pass
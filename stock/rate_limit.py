@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+上游限流 + 熔断（新浪 / 腾讯共用，按主机区分）
+- 令牌桶：每主机一个，速率与并发上限按 AIMD 自适应——
+  一轮（≈当前并发数个）请求都成功且平均延迟低于 TARGET_LATENCY 时速率 ×1.1、并发 +1；
+  出现 429/5xx/超时时速率与并发减半（同一时间窗内只减一次，避免在途请求连环减半）
+- 熔断：每个 base（协议+主机）连续失败 FAIL_THRESHOLD 次即打开，COOLDOWN 秒内直接抛 CircuitOpenError（不发请求）；
+  冷却后半开放行一个试探请求，成功即关闭
+- 接入：http_pool 的共享 Session 挂 GuardedAdapter + ObservedRetry，所有经 Session 的请求自动受控，
+  urllib3 内部的每次重试也计入限流；
+  order_bases 把熔断中的 base 排到最后，http / https 两个 base 互为后备
+- async_fetch：请求前按令牌桶等待、熔断打开时直接失败，结果同样计入统计
+"""
+import threading
+import time as _time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+INIT_RATE = 20.0          # 初始速率（请求/秒/主机）
+MIN_RATE = 1.0
+MAX_RATE = 200.0
+INIT_CONC = 8             # 初始并发上限（每主机）
+MAX_CONC = 64
+TARGET_LATENCY = 0.8      # 目标平均延迟（秒），超过则不再加速
+CUT_WINDOW = 1.0          # 减半后该时间窗内不再重复减半（秒）
+THROTTLE_STATUS = (429, 500, 502, 503, 504)
+FAIL_THRESHOLD = 5        # 连续失败次数 -> 熔断
+COOLDOWN = 30.0           # 熔断冷却（秒）
+
+class CircuitOpenError(requests.ConnectionError):
+    """熔断中，请求未发出"""
+
+class HostLimiter:
+    """令牌桶 + 动态并发上限（线程安全）"""
+    def __init__(self, rate: float = INIT_RATE, conc: int = INIT_CONC):
+        self.rate, self.limit = rate, conc
+        self.tokens = rate
+        self.stamp = _time.monotonic()
+        self.active = 0
+        self.ok_round = 0
+        self.lat_sum = 0.0
+        self.last_cut = 0.0
+        self.cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self) -> float:
+        """取一个令牌，返回需要等待的秒数（令牌可透支，等待由调用方完成）"""
+        with self.cond:
+            self._refill(_time.monotonic())
+            self.tokens -= 1.0
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        wait = self.reserve()
+        if wait > 0:
+            _time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """非阻塞占一个并发槽位（不取令牌）；给 asyncio 后端轮询用，与 acquire 共用同一计数"""
+        with self.cond:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def record(self, latency: float, throttled: bool):
+        with self.cond:
+            now = _time.monotonic()
+            if throttled:
+                if now - self.last_cut >= CUT_WINDOW:
+                    self.rate = max(MIN_RATE, self.rate * 0.5)
+                    self.limit = max(1, self.limit // 2)
+                    self.last_cut = now
+                self.ok_round, self.lat_sum = 0, 0.0
+                return
+            self.ok_round += 1
+            self.lat_sum += latency
+            if self.ok_round >= self.limit:
+                if self.lat_sum / self.ok_round < TARGET_LATENCY:
+                    self.rate = min(MAX_RATE, self.rate * 1.1)
+                    if self.limit < MAX_CONC:
+                        self.limit += 1
+                        self.cond.notify()
+                self.ok_round, self.lat_sum = 0, 0.0
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = FAIL_THRESHOLD, cooldown: float = COOLDOWN):
+        self.threshold, self.cooldown = threshold, cooldown
+        self.fails = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.opened_at is not None and _time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        """关闭时放行；打开时拒绝；冷却结束后只放行一个试探请求"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if _time.monotonic() - self.opened_at < self.cooldown or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def record(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.fails, self.opened_at, self.trial = 0, None, False
+                return
+            self.fails += 1
+            if self.trial or self.fails >= self.threshold:
+                self.opened_at, self.trial = _time.monotonic(), False
+
+# ------------------ 注册表 ------------------
+_LOCK = threading.Lock()
+_LIMITERS = {}
+_BREAKERS = {}
+
+def _keys(url: str) -> tuple:
+    u = urlsplit(url)
+    return u.hostname or "", f"{u.scheme}://{u.netloc}"
+
+def limiter(url: str) -> HostLimiter:
+    host, _ = _keys(url)
+    with _LOCK:
+        return _LIMITERS.setdefault(host, HostLimiter())
+
+def breaker(url: str) -> CircuitBreaker:
+    _, base = _keys(url)
+    with _LOCK:
+        return _BREAKERS.setdefault(base, CircuitBreaker())
+
+def check(url: str):
+    if not breaker(url).allow():
+        raise CircuitOpenError(f"熔断中: {_keys(url)[1]}")
+
+def record(url: str, latency: float, status: int = None, error: Exception = None):
+    """一次请求的结果计入限流与熔断统计；status 为最终 HTTP 状态（异常时为 None）"""
+    throttled = error is not None or (status in THROTTLE_STATUS)
+    limiter(url).record(latency, throttled)
+    breaker(url).record(not throttled)
+
+def order_bases(bases: list) -> list:
+    """熔断中的 base 排到最后（稳定排序），用于 http / https 互为后备"""
+    return sorted(bases, key=lambda b: breaker(b).is_open())
+
+def stats() -> dict:
+    with _LOCK:
+        return {
+            "hosts": {h: {"rate": round(l.rate, 1), "limit": l.limit, "active": l.active} for h, l in _LIMITERS.items()},
+            "open": [b for b, c in _BREAKERS.items() if c.opened_at is not None],
+        }
+
+class ObservedRetry(Retry):
+    """urllib3 内部每次重试（429/5xx/连接错误）也计入限流，避免被重试成功掩盖的限流信号"""
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if _pool is not None:
+            limiter(f"{_pool.scheme}://{_pool.host}").record(0.0, True)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+class GuardedAdapter(HTTPAdapter):
+    """经令牌桶/并发上限/熔断发送；urllib3 Retry 仍在其内部生效"""
+    def send(self, request, **kwargs):
+        url = request.url
+        check(url)
+        lim = limiter(url)
+        lim.acquire()
+        t0 = _time.monotonic()
+        try:
+            resp = super().send(request, **kwargs)
+        except Exception as e:
+            record(url, _time.monotonic() - t0, error=e)
+            raise
+        finally:
+            lim.release()
+        record(url, _time.monotonic() - t0, status=resp.status_code)
+        return resp
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+三个股票脚本共用的基础件（getStockListPrices / GetStockBuyAnalysisData / sy_strategy_calc）
+- 自选股：外部文件 WATCHLIST_FILE（一行一个代码，# 之后为注释；环境变量 STOCK_WATCHLIST 可指定别的文件）
+- 代码规范化：norm6（6位数字）/ with_exchange（补 .SH/.SZ/.BJ）/ to_sina_symbol / to_tencent_symbol；
+  交易所判定统一走证券主表（symbol_master），68x/8xx/4xx/92x/5xx 等号段不再各脚本各猜
+- make_session：进程内共享连接池（http_pool，按配置共享）；请求头、允许的方法统一在这里，各脚本只传并发/重试/代理
+- 腾讯 fqkline 日K：kline_params / parse_kline_json / fetch_kline
+- 只依赖标准库：requests 在建会话时、numpy（bars）在解析K线时才导入，pandas 从不导入，
+  实时价格脚本启动不为用不到的库付费
+"""
+import os
+import re
+from pathlib import Path
+
+from symbol_master import exchange_of
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+WATCHLIST_FILE = os.environ.get("STOCK_WATCHLIST") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "watchlist.txt")
+SESSION_HEADERS = {"Accept": "application/json,text/plain,*/*", "Accept-Language": "zh-CN,zh;q=0.9"}
+KLINE_BASES = ["http://web.ifzq.gtimg.cn/appstock/app/fqkline/get",
+               "https://web.ifzq.gtimg.cn/appstock/app/fqkline/get"]
+
+# ------------------ 自选股 ------------------
+def load_codes(path: str = None) -> list:
+    """读自选股文件 -> ["603019.SH", ...]（保持文件顺序、去重）；文件不存在时告警并返回空列表"""
+    p = Path(os.path.expandvars(str(path or WATCHLIST_FILE))).expanduser()
+    try:
+        text = p.read_text(encoding="utf-8-sig")
+    except FileNotFoundError:
+        print(f"[WARN] 自选股文件不存在: {p}", flush=True)
+        return []
+    codes = []
+    for no, line in enumerate(text.splitlines(), 1):
+        for tok in line.split("#", 1)[0].replace(",", " ").split():
+            if not re.fullmatch(r"(?i)(sh|sz|bj)?\d{6}(\.(sh|sz|bj))?", tok):
+                raise ValueError(f"{p}:{no} 无效代码: {tok}")
+            codes.append(tok.upper())
+    return list(dict.fromkeys(codes))
+
+# ------------------ 代码规范化 ------------------
+def norm6(code: str) -> str:
+    m = re.search(r"(\d{6})", code)
+    if not m:
+        raise ValueError(f"无效代码: {code}")
+    return m.group(1)
+
+norm_code = norm6
+
+def market(code: str) -> str:
+    """'sh' / 'sz' / 'bj'：显式后缀/前缀优先，其次证券主表，最后按号段规则（symbol_master）"""
+    return exchange_of(code)
+
+def with_exchange(code: str) -> str:
+    """'002028' / 'sz002028' -> '002028.SZ'、'830799' -> '830799.BJ'；已带后缀的原样（大写）返回；无法识别的原样返回"""
+    s = str(code).strip().upper()
+    if "." in s or not re.fullmatch(r"(SH|SZ|BJ)?\d{6}", s):
+        return s
+    return f"{s[-6:]}.{exchange_of(s).upper()}"
+
+def to_sina_symbol(code: str) -> str:
+    return market(code) + norm6(code)
+
+def to_tencent_symbol(code: str) -> str:
+    return market(code) + norm6(code)
+
+to_symbol = to_tencent_symbol
+
+# ------------------ 会话 ------------------
+def make_session(pool_size: int = 12, retry_total: int = 2, backoff_factor: float = 0.4,
+                 disable_system_proxy: bool = True, proxies: dict = None):
+    """
+    进程内共享的 keep-alive 连接池（http_pool 按配置各建一个，参数相同的调用方共用）；
+    请求头/方法在这里统一，各脚本默认配置一致时共用同一组连接
+    """
+    import http_pool
+    return http_pool.get_session(
+        pool_size=pool_size, retry_total=retry_total, backoff_factor=backoff_factor,
+        allowed_methods=("GET", "POST"), headers=SESSION_HEADERS,
+        trust_env=not disable_system_proxy, proxies=proxies,
+    )
+
+# ------------------ 腾讯 fqkline 日K ------------------
+def kline_params(code_raw: str, use_qfq: bool, limit: int) -> dict:
+    adj = "qfq" if use_qfq else ""
+    return {"param": f"{to_tencent_symbol(code_raw)},day,,,{limit},{adj}"}
+
+def parse_kline_json(j: dict, code_raw: str, use_qfq: bool):
+    """fqkline JSON -> Bars（volume 单位=手）；无数据时抛 RuntimeError"""
+    from bars import Bars
+    data = j.get("data", {}) or {}
+    node = data.get(to_tencent_symbol(code_raw), {}) or {}
+    arr = node.get("qfqday" if use_qfq else "day") or node.get("day")
+    bars = Bars.from_kline(arr or [])
+    if not len(bars):
+        raise RuntimeError(f"无K线数据: {code_raw}")
+    return bars
+
+def fetch_kline(code_raw: str, use_qfq: bool = True, limit: int = 1200, sess=None, timeout: float = 5):
+    """单只日K -> Bars；按 rate_limit 的健康度依次试 KLINE_BASES"""
+    import rate_limit
+    sess = sess or make_session()
+    params = kline_params(code_raw, use_qfq, limit)
+    last_err = None
+    for base in rate_limit.order_bases(KLINE_BASES):
+        try:
+            return parse_kline_json(sess.get(base, params=params, timeout=timeout).json(), code_raw, use_qfq)
+        except Exception as e:
+            last_err = e
+    raise last_err if last_err else RuntimeError(f"腾讯K线拉取失败: {code_raw}")
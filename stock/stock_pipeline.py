@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+进程内一体化流水线（通过脚本顶部配置控制）：抓日K -> 指标 -> 新浪实时 -> 策略计算 -> 一张结果表
+- 指标沿用 GetStockBuyAnalysisData（日K截到最近一个已收盘交易日，盘中的当日K线不参与）
+- 实时报价 / 当日量 / 名称：一次新浪全字段快照（getStockListPrices.fetch_snapshot_sina，量 手 -> 万手，
+  与 VOL10 同口径），不再另外请求腾讯 qt 取名称；M_elapsed 取自盘中进度
+- 直接以 DataFrame 交给 sy_strategy_calc.compute_frame，不经中间 Excel / CSV
+- 盘中进度：有分时成交分布（intraday_profile）的股票以分布占比作 f_t（compute_frame 的 ft_override），
+  否则按 M_elapsed 线性折算
+- 列映射：ATR10 -> ATR14 列、VOL10(万) -> VOL10 列（与手工拼表时的口径一致）；MA20_1 取基准日前一根 MA20
+
+依赖：pip install pandas numpy requests openpyxl xlsxwriter（Parquet/Arrow 另需 pyarrow）
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+
+import GetStockBuyAnalysisData as G
+import getStockListPrices as L
+import quote_parser as Q
+import sy_strategy_calc as S
+from sy_strategy_calc import C
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+CODES = G.CODES
+OUTPUT_FILE = "pipeline_result.xlsx"   # .xlsx 带格式；.csv / .parquet / .arrow 见 table_io
+PRINT_TOP = 20                          # 控制台打印前 N 只（按策略分）
+
+# ------------------ 组装 ------------------
+NUM_COLS = [C[k] for k in ("pres", "psup", "ma5", "ma10", "ma20", "ma60", "close",
+                                 "atr", "vol10", "vol", "pnow", "m_elapsed", "rs10", "ma20_prev")]
+
+def settled_hist(hist, today: str):
+    """去掉日期 >= today 的K线（盘中腾讯会返回当日未完成的K线）；Bars 切片视图"""
+    from kline_store import dates_to_days
+    return hist[:int(np.searchsorted(hist.date, dates_to_days([today])[0]))]
+
+def build_frame(rows: list, snap, today: str, m_elapsed: float) -> pd.DataFrame:
+    """指标行 + 新浪快照（与 rows 同序）-> sy_strategy_calc 输入表（列名见 sy_strategy_calc.C）"""
+    df = pd.DataFrame({
+        C["date"]: today,
+        C["dow"]: pd.Timestamp(today).isoweekday(),
+        C["code"]: [S._norm_code(r["代码"]) for r in rows],
+        C["name"]: [r.get("名称", "") for r in rows],
+        C["pres"]: [r.get("前高(P_res)") for r in rows], C["psup"]: [r.get("前低(P_sup)") for r in rows],
+        C["ma5"]: [r.get("MA5") for r in rows], C["ma10"]: [r.get("MA10") for r in rows],
+        C["ma20"]: [r.get("MA20") for r in rows], C["ma60"]: [r.get("MA60") for r in rows],
+        C["close"]: [r.get("昨收(Close)") for r in rows],
+        C["atr"]: [r.get("ATR10") for r in rows],
+        C["vol10"]: [r.get("VOL10(万)") for r in rows],
+        C["vol"]: snap["volume"] / G.VOL_UNIT_DIVISOR,
+        C["pnow"]: np.where(snap["price"] > 0, snap["price"], np.nan),   # 停牌/未开盘时新浪现价为 0
+        C["m_elapsed"]: m_elapsed,
+        C["rs10"]: np.nan,
+        C["ma20_prev"]: [r.get("MA20_1", np.nan) for r in rows],
+    })
+    for col in NUM_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def run_pipeline(codes_raw: list, today: str = None) -> pd.DataFrame:
+    """一次完整流程，返回 OUTPUT_COLS 结果表（顺序与 codes_raw 一致；日K失败的股票跳过）"""
+    today = today or L.now_cn().strftime("%Y-%m-%d")
+
+    # 新浪快照一次拿到名称 + 实时价量（先于日K，避免再请求 qt 取名称）
+    snap_all = L.fetch_snapshot_sina(codes_raw)
+    name_map = dict(zip([G.norm_code(c) for c in codes_raw], Q.decode_names(snap_all["name"])))
+
+    hist_map = G.fetch_hists_concurrent(codes_raw, use_qfq=G.USE_QFQ)
+    hists, ok_codes, ok_idx = {}, [], []
+    for i, code in enumerate(codes_raw):
+        h = hist_map[code]
+        if isinstance(h, Exception):
+            print(f"[WARN] {code} 日K拉取失败: {h}")
+            continue
+        h = settled_hist(h, today)
+        if not len(h):
+            print(f"[WARN] {code} 无已收盘日K")
+            continue
+        hists[code] = h
+        ok_codes.append(code)
+        ok_idx.append(i)
+
+    state_store = G.open_state_store()
+    rows = G.compute_rows(ok_codes, name_map, hists, G.LOOKBACK_N, "today", state_store)
+    if state_store is not None:
+        state_store.save()
+
+    df = build_frame(rows, snap_all[ok_idx], today, L.trading_progress_now() * S.TOTAL_MINUTES)
+    df = S._ensure_cols(df)
+    fracs = L.profile_fracs(L.build_profile_map_concurrent(ok_codes))
+    ft_override = np.array([fracs.get(G.norm_code(c), np.nan) for c in ok_codes], dtype=np.float64)
+    out = S.compute_frame(df, prev_ma20=df[C["ma20_prev"]].to_numpy(dtype=np.float64), ft_override=ft_override)
+    return S.finalize_frame(out)
+
+def main():
+    t0 = time.time()
+    out = run_pipeline(CODES[:])
+    S.save_output(out, OUTPUT_FILE)
+    print(f"已生成：{os.path.abspath(OUTPUT_FILE)}  股票数: {len(out)}  用时: {time.time() - t0:.1f}s")
+
+    show = out.sort_values(C["score"], ascending=False, kind="stable").head(PRINT_TOP)
+    cols = [C["code"], C["name"], C["ok_buy"], C["signal"], C["score"], C["pnow"], C["lr_adj"]]
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(show[cols].to_string(index=False))
+
+if __name__ == "__main__":
+    main()
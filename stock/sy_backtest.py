@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+sy_strategy_calc 信号回测（日K，向量化；通过脚本顶部配置控制，不使用命令行）
+- 每个交易日 t：指标取 t-1 收盘口径（同 GetStockBuyAnalysisData --base-day yesterday），
+  P_now = 当日收盘、Vol = 当日量、M_elapsed = 240，整表经 compute_frame 得到信号/买点/SL/R
+- 入场：信号次日起 ENTRY_DAYS 根内挂单
+  · 突破：条件单，最高 ≥ 买价成交（跳空高开按开盘价）
+  · 低吸 / MA20回踩：限价单，最低 ≤ 买价成交（跳空低开按开盘价）
+- 出场（先到先出；同一根内 SL 优先于止盈，盘中触发优先于收盘判断）：
+  最低 ≤ SL 止损；最高 ≥ R{TARGET_R} 止盈；收盘跌破保护线（入场以来最高 - chand_k1×ATR）；
+  持有满 MAX_HOLD 根按收盘价离场
+- 统计：按信号类型的笔数、胜率、期望(R)、累计R、最大回撤(R，按离场日期累计)
+- 全池 (股票 × 交易日) 二维数组：指标、成交、出场对所有股票/交易一次性向量化判定
+
+依赖：pip install pandas numpy xlsxwriter
+"""
+import os
+import numpy as np
+import pandas as pd
+
+import GetStockBuyAnalysisData as G
+from batch_metrics import stack_right, true_range
+from kline_store import days_to_dates
+from pivots import pivot_mask
+from sy_strategy_calc import C, CFG, TOTAL_MINUTES, compute_frame
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+CODES = G.CODES              # 回测股票池（默认与指标脚本一致）
+USE_QFQ = True               # 回测用前复权日K
+HIST_LIMIT = 1200            # 每只股票最多取多少根日K
+# 指标口径与 GetStockBuyAnalysisData 保持一致
+LOOKBACK_N = G.LOOKBACK_N
+ATR_N = G.ATR_N
+ATR_METHOD = G.ATR_METHOD
+PIVOT_K = G.PIVOT_K
+STRUCT_LOOKBACK = G.STRUCT_LOOKBACK
+ROUND_DIGITS = 3             # 指标按导出表同样保留 3 位小数（None=不取整）
+
+ENTRY_DAYS = 1               # 信号后挂单有效根数
+MAX_HOLD = 20                # 最长持有根数（含成交当日）
+TARGET_R = 2                 # 止盈目标：R1 / R2 / R3
+NO_OVERLAP = True            # 同一股票持仓期间不再开新仓
+ROW_CHUNK = 500_000          # compute_frame 每批行数（控制内存）
+OUTPUT_FILE = "sy_backtest.xlsx"
+
+# 信号 -> (买价列, SL列, 挂单方式)
+ENTRY_COLS = {
+    "突破": ("bu_break1", "sl_break", "stop"),
+    "低吸": ("bu_dip1", "sl_dip", "limit"),
+    "MA20回踩": ("bu_ma20", "sl_ma20", "limit"),
+}
+SIGNALS = list(ENTRY_COLS)
+
+# ------------------ 数据 ------------------
+def load_hists(codes: list) -> dict:
+    """并发抓日K（走本地缓存），返回 {code: Bars}；失败的股票跳过"""
+    hist_map = G.fetch_hists_concurrent(codes, use_qfq=USE_QFQ, limit=HIST_LIMIT)
+    out = {}
+    for code in codes:
+        h = hist_map[code]
+        if isinstance(h, Exception):
+            print(f"[WARN] {code} 日K拉取失败: {h}")
+        elif len(h):
+            out[code] = h
+    return out
+
+def stack_hists(hists: dict) -> dict:
+    """{code: Bars} -> {"codes": [...], "date"/"open"/...: (股票 × 交易日) 右对齐数组}"""
+    codes = list(hists)
+    frames = [hists[c] for c in codes]
+    width = max((len(h) for h in frames), default=0)
+    arrs = {"codes": codes}
+    arrs["date"] = stack_right([h.date for h in frames], width)
+    for col in ("open", "close", "high", "low", "volume"):
+        arrs[col] = stack_right([h[col] for h in frames], width)
+    return arrs
+
+# ------------------ 逐日指标（全序列） ------------------
+def _rolling(x: np.ndarray, w: int, how: str = "mean") -> np.ndarray:
+    """(S, D) 沿时间轴 rolling，口径同 pandas Series.rolling(w)（逐列 Cython 计算）"""
+    return getattr(pd.DataFrame(x.T).rolling(w), how)().to_numpy().T
+
+def atr_all(high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int = 10, method: str = "sma") -> np.ndarray:
+    """每根K线的 ATR（同 atr_series：不足 n 根为 NaN）"""
+    tr = true_range(high, low, close)
+    if method == "wilder":
+        ema = pd.DataFrame(tr.T).ewm(alpha=1 / n, adjust=False).mean().to_numpy().T
+        return np.where(np.cumsum(tr == tr, axis=1) >= n, ema, np.nan)
+    return _rolling(tr, n)
+
+def psup_all(low: np.ndarray, k: int = 3, max_lookback: int = 120) -> np.ndarray:
+    """
+    每根K线作为基准日时的前低（结构位），口径同 find_pivot_low(exclude_last=True)：
+    在 [基准日-max_lookback-k-1, 基准日) 内取最近一个已确认波谷，找不到时取该区间最小值
+    """
+    S, D = low.shape
+    out = np.full((S, D), np.nan)
+    if D < 2:
+        return out
+    cols = np.arange(D)
+    # 最近一个波谷的索引（按位置前向填充）
+    mask = pivot_mask(low, k, "low")
+    last = np.maximum.accumulate(np.where(mask, cols, -1), axis=1)
+    # 基准日 b：波谷 i 需满足 i+k <= b-1 且 i-k >= b-max_lookback-k-1
+    L = max_lookback + k + 1
+    b = cols[1:]
+    j = b - 1 - k
+    lp = np.where(j >= 0, last[:, np.clip(j, 0, None)], -1)
+    has = (lp >= 0) & (lp - k >= b - L)
+
+    # 回退：区间 [b-L, b-1] 的最小值（NaN 视为 +inf，首个最小值）
+    pad = np.concatenate([np.full((S, L - 1), np.inf), np.where(np.isnan(low), np.inf, low)], axis=1)
+    win = np.lib.stride_tricks.sliding_window_view(pad, L, axis=1)[:, :D - 1]   # 第 j 个窗口结束于 j
+    fb_val = win.min(axis=-1)
+
+    rows = np.arange(S)[:, None]
+    val = np.where(has, low[rows, np.clip(lp, 0, None)], fb_val)
+    out[:, 1:] = np.where(np.isinf(val), np.nan, val)
+    return out
+
+def daily_metrics(arrs: dict) -> dict:
+    """全序列逐日指标（每根K线作为基准日时的值），单位同原始K线"""
+    close, high, low, vol = arrs["close"], arrs["high"], arrs["low"], arrs["volume"]
+    m = {
+        "ma5": _rolling(close, 5), "ma10": _rolling(close, 10),
+        "ma20": _rolling(close, 20), "ma60": _rolling(close, 60),
+        "pres": _rolling(high, LOOKBACK_N, "max"),
+        "psup": psup_all(low, PIVOT_K, STRUCT_LOOKBACK),
+        "atr": atr_all(high, low, close, ATR_N, ATR_METHOD),
+        "vol10": _rolling(vol, 10),
+    }
+    # 前高：不足 lookback 根时取已有全部（同 high.iloc[-lookback:].max()）
+    early = np.fmax.accumulate(np.where(np.isnan(high), -np.inf, high), axis=1)
+    m["pres"] = np.where(np.isnan(m["pres"]) & ~np.isnan(high), early, m["pres"])
+    if ROUND_DIGITS is not None:
+        m = {k: np.round(v, ROUND_DIGITS) for k, v in m.items()}
+    return m
+
+def build_inputs(arrs: dict, metrics: dict = None) -> tuple:
+    """
+    组装 compute_frame 输入：第 (s, t) 行 = 股票 s 在交易日 t 的盘后评估
+    返回 (DataFrame, s 索引, t 索引, prev_ma20)；只保留 MA60/ATR 已就绪的交易日
+    """
+    metrics = daily_metrics(arrs) if metrics is None else metrics
+    close, vol = arrs["close"], arrs["volume"]
+    S, D = close.shape
+    if D < 3:
+        return pd.DataFrame(), np.array([], int), np.array([], int), np.array([])
+    prev = lambda x: x[:, :-1]          # t-1 口径（列 t=1..D-1）
+    ready = (~np.isnan(close[:, 1:]) & ~np.isnan(prev(metrics["ma60"])) & ~np.isnan(prev(metrics["atr"])))
+    ready[:, 0] = False                  # 需要 t-2 的 MA20
+    si, ti = np.nonzero(ready)
+    ti = ti + 1
+
+    y_close = close[si, ti - 1]
+    if ROUND_DIGITS is not None:
+        y_close = np.round(y_close, ROUND_DIGITS)
+    df = pd.DataFrame({
+        C["date"]: arrs["date"][si, ti],
+        C["code"]: si,
+        C["pres"]: metrics["pres"][si, ti - 1],
+        C["psup"]: metrics["psup"][si, ti - 1],
+        C["ma5"]: metrics["ma5"][si, ti - 1],
+        C["ma10"]: metrics["ma10"][si, ti - 1],
+        C["ma20"]: metrics["ma20"][si, ti - 1],
+        C["ma60"]: metrics["ma60"][si, ti - 1],
+        C["max_entry"]: 0.0,
+        C["close"]: y_close,
+        C["pnow"]: close[si, ti],
+        C["atr"]: metrics["atr"][si, ti - 1],
+        C["vol10"]: metrics["vol10"][si, ti - 1],
+        C["vol"]: vol[si, ti],
+        C["m_elapsed"]: float(TOTAL_MINUTES),
+        C["rs10"]: np.nan,
+    })
+    prev_ma20 = metrics["ma20"][si, ti - 2]
+    return df, si, ti, prev_ma20
+
+def signals(df: pd.DataFrame, prev_ma20: np.ndarray, cfg: dict = None) -> pd.DataFrame:
+    """分批跑 compute_frame，只保留回测需要的列"""
+    keep = [C["signal"], C["atr"]] + sorted({C[k] for v in ENTRY_COLS.values() for k in v[:2]})
+    parts = []
+    for i in range(0, len(df), ROW_CHUNK):
+        r = compute_frame(df.iloc[i:i + ROW_CHUNK], cfg, prev_ma20=prev_ma20[i:i + ROW_CHUNK])
+        parts.append(r[keep])
+    return pd.concat(parts) if parts else pd.DataFrame(columns=keep)
+
+# ------------------ 成交与出场 ------------------
+def _take(x: np.ndarray, si: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """x[si, idx]，idx 越界处为 NaN；idx 形状 (T, W)"""
+    D = x.shape[1]
+    ok = idx < D
+    return np.where(ok, x[si[:, None], np.minimum(idx, D - 1)], np.nan)
+
+def simulate(arrs: dict, si: np.ndarray, ti: np.ndarray, sig: pd.DataFrame, cfg: dict = None,
+             target_r: int = None, entry_days: int = None, max_hold: int = None) -> pd.DataFrame:
+    """
+    对全部信号一次性判定成交与出场；返回逐笔交易（未成交/无效的信号不计）
+    """
+    cfg = CFG if cfg is None else cfg
+    target_r = TARGET_R if target_r is None else target_r
+    E = ENTRY_DAYS if entry_days is None else entry_days
+    H = MAX_HOLD if max_hold is None else max_hold
+    o, h, l, c = arrs["open"], arrs["high"], arrs["low"], arrs["close"]
+
+    label = sig[C["signal"]].to_numpy()
+    n = len(label)
+    price = np.full(n, np.nan); sl = np.full(n, np.nan); is_stop = np.zeros(n, bool)
+    for name, (k_buy, k_sl, how) in ENTRY_COLS.items():
+        m = label == name
+        price[m] = sig[C[k_buy]].to_numpy(dtype=np.float64)[m]
+        sl[m] = sig[C[k_sl]].to_numpy(dtype=np.float64)[m]
+        is_stop[m] = how == "stop"
+    atr = sig[C["atr"]].to_numpy(dtype=np.float64)
+    live = ~np.isnan(price) & ~np.isnan(sl) & (price > sl)
+    si, ti, label, price, sl, is_stop, atr = (a[live] for a in (si, ti, label, price, sl, is_stop, atr))
+
+    # —— 入场：t+1 .. t+E ——
+    idx = ti[:, None] + 1 + np.arange(E)
+    eo, eh, el = _take(o, si, idx), _take(h, si, idx), _take(l, si, idx)
+    with np.errstate(invalid="ignore"):
+        touch = np.where(is_stop[:, None], eh >= price[:, None], el <= price[:, None])
+    filled = touch.any(axis=1)
+    j = np.argmax(touch, axis=1)
+    r = np.arange(len(j))
+    eo_j = np.where(np.isnan(eo[r, j]), price, eo[r, j])
+    fill = np.where(is_stop, np.maximum(eo_j, price), np.minimum(eo_j, price))
+    fday = ti + 1 + j
+    risk = fill - sl
+    keep = filled & (risk > 0)
+    si, ti, label, price, sl, atr, fill, fday, risk = (
+        a[keep] for a in (si, ti, label, price, sl, atr, fill, fday, risk))
+    target = price + target_r * (price - sl)
+
+    # —— 出场：fday .. fday+H-1 ——
+    idx = fday[:, None] + np.arange(H)
+    xo, xh, xl, xc = (_take(a, si, idx) for a in (o, h, l, c))
+    first = np.arange(H)[None, :] == 0
+    with np.errstate(invalid="ignore"):
+        hit_sl = xl <= sl[:, None]
+        hit_tp = (xh >= target[:, None]) & ~(first & (fill[:, None] >= target[:, None]))
+        run_hi = np.fmax.accumulate(np.where(np.isnan(xh), -np.inf, xh), axis=1)
+        chand = run_hi - cfg["chand_k1"] * atr[:, None]
+        hit_ch = xc < chand
+    event = hit_sl | hit_tp | hit_ch
+    has_ev = event.any(axis=1)
+    last_ok = H - 1 - np.argmax(~np.isnan(xc[:, ::-1]), axis=1)
+    xj = np.where(has_ev, np.argmax(event, axis=1), last_ok)
+    r = np.arange(len(xj))
+
+    xo_j = np.where((xj == 0) | np.isnan(xo[r, xj]), np.nan, xo[r, xj])
+    px_sl = np.fmin(xo_j, sl)                 # 跳空低开按开盘价止损
+    px_tp = np.fmax(xo_j, target)             # 跳空高开按开盘价止盈
+    reason = np.select(
+        [~has_ev, hit_sl[r, xj], hit_tp[r, xj]],
+        ["到期", "止损", "止盈"], default="保护线")
+    exit_px = np.select(
+        [~has_ev, hit_sl[r, xj], hit_tp[r, xj]],
+        [xc[r, xj], px_sl, px_tp], default=xc[r, xj])
+    xday = fday + xj
+
+    trades = pd.DataFrame({
+        "s": si, "signal_day": ti, "fill_day": fday, "exit_day": xday,
+        "信号": label, "买价": price, "成交价": fill, "SL": sl, "目标价": target,
+        "离场价": exit_px, "离场原因": reason, "持有根数": xj + 1,
+        "R": (exit_px - fill) / risk,
+    })
+    if NO_OVERLAP and len(trades):
+        trades = _drop_overlap(trades)
+    return trades.reset_index(drop=True)
+
+def _drop_overlap(trades: pd.DataFrame) -> pd.DataFrame:
+    """同一股票：成交日须晚于上一笔保留交易的离场日"""
+    t = trades.sort_values(["s", "fill_day", "signal_day"], kind="stable")
+    s, f, x = t["s"].to_numpy(), t["fill_day"].to_numpy(), t["exit_day"].to_numpy()
+    keep = np.zeros(len(t), bool)
+    cur_s, busy = -1, -1
+    for i in range(len(t)):
+        if s[i] != cur_s:
+            cur_s, busy = s[i], -1
+        if f[i] > busy:
+            keep[i] = True
+            busy = x[i]
+    return t[keep]
+
+# ------------------ 统计 ------------------
+def max_drawdown(r: np.ndarray) -> float:
+    """按顺序累计 R 的最大回撤（从 0 起算）"""
+    if len(r) == 0:
+        return 0.0
+    eq = np.concatenate([[0.0], np.cumsum(r)])
+    return float(np.max(np.maximum.accumulate(eq) - eq))
+
+def summarize(trades: pd.DataFrame, arrs: dict = None) -> pd.DataFrame:
+    """按信号类型汇总：笔数、胜率、期望(R)、累计R、最大回撤(R)、平均持有"""
+    if len(trades) and arrs is not None:
+        order = np.argsort(arrs["date"][trades["s"].to_numpy(), trades["exit_day"].to_numpy()], kind="stable")
+        trades = trades.iloc[order]
+    rows = []
+    for name in SIGNALS + ["合计"]:
+        t = trades if name == "合计" else trades[trades["信号"] == name]
+        r = t["R"].to_numpy(dtype=np.float64)
+        rows.append({
+            "信号": name, "笔数": len(r),
+            "胜率": float((r > 0).mean()) if len(r) else np.nan,
+            "期望(R)": float(r.mean()) if len(r) else np.nan,
+            "累计R": float(r.sum()),
+            "最大回撤(R)": max_drawdown(r),
+            "平均持有": float(t["持有根数"].mean()) if len(r) else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+def run_backtest(arrs: dict, cfg: dict = None, metrics: dict = None, inputs: tuple = None, **kw) -> tuple:
+    """
+    一次完整回测：指标 -> compute_frame 信号 -> 成交/出场 -> 汇总
+    metrics / inputs 可复用（调参时只有 cfg 变化，指标与输入表不必重算）
+    返回 (逐笔交易, 汇总)
+    """
+    if inputs is None:
+        inputs = build_inputs(arrs, metrics)
+    df, si, ti, prev_ma20 = inputs
+    sig = signals(df, prev_ma20, cfg)
+    trades = simulate(arrs, si, ti, sig, cfg, **kw)
+    return trades, summarize(trades, arrs)
+
+# ------------------ 主流程 ------------------
+def main():
+    hists = load_hists(CODES)
+    if not hists:
+        print("无可用日K")
+        return
+    arrs = stack_hists(hists)
+    trades, summary = run_backtest(arrs)
+
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(summary.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    codes = np.array([G.norm_code(c) for c in arrs["codes"]])
+    out = trades.copy()
+    out.insert(0, "代码", codes[out["s"].to_numpy()])
+    for k in ("signal_day", "fill_day", "exit_day"):
+        out[k] = days_to_dates(arrs["date"][out["s"].to_numpy(), out[k].to_numpy()].astype(np.int32))
+    out = out.drop(columns="s").rename(columns={"signal_day": "信号日", "fill_day": "成交日", "exit_day": "离场日"})
+
+    os.makedirs(os.path.dirname(os.path.abspath(OUTPUT_FILE)), exist_ok=True)
+    with pd.ExcelWriter(OUTPUT_FILE, engine="xlsxwriter") as writer:
+        summary.to_excel(writer, index=False, sheet_name="Summary")
+        out.to_excel(writer, index=False, sheet_name="Trades")
+    print(f"已生成：{os.path.abspath(OUTPUT_FILE)}  交易笔数: {len(out)}  股票数: {len(arrs['codes'])}")
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,29 @@
 # -*- coding: utf-8 -*-
 """
-多股票策略计算（通过脚本内置数组控制股票列表；不使用命令行）
-- 用 CODES 指定要计算的股票代码列表（输出顺序与 CODES 完全一致）
+多股票策略计算（股票列表取共享自选股文件；不使用命令行）
+- CODES 默认读 stock_core.WATCHLIST_FILE（与价格/指标脚本同一份），也可在此写死列表；输出顺序与 CODES 完全一致
 - 每只股票内部按“日期”升序排列（无法解析时按原始顺序）
 - 公式/口径与单股版保持一致，便于对表校核
+- 输入/输出按扩展名选格式（table_io）：.xlsx / .csv / .parquet / .arrow；列式格式免去 Excel 往返
 
-依赖：pip install pandas numpy openpyxl xlsxwriter
+依赖：pip install pandas numpy openpyxl xlsxwriter（Parquet/Arrow 另需 pyarrow）
 """
 
-import os, math
-from typing import Optional
+import os
 import numpy as np
 import pandas as pd
+from stock_core import load_codes, with_exchange
+from table_io import format_of, read_table, write_table
 
 # ======================
 # 顶部配置（仅改这里）
 # ======================
-CODES = [
-    "002028.SZ",  # 思源电气
-    "002335.SZ",  # 科华数据
-    "002979.SZ",  # 雷赛智能
-]
+CODES = load_codes()          # 或写死：["002028.SZ", "002335.SZ", ...]
 
-INPUT_FILE   = "data.xlsx"   # 可填 .xlsx 或 .csv；若留空(None)则使用内置示例
+INPUT_FILE   = "data.xlsx"   # 可填 .xlsx / .csv / .parquet / .arrow；若留空(None)则使用内置示例
 SHEET_NAME   = "Sheet1"         # 仅对 .xlsx 有效
-OUTPUT_FILE  = "multi_calc.xlsx"
+OUTPUT_FILE  = "multi_calc.xlsx"   # .xlsx 带格式导出；.parquet / .arrow / .csv 为列式快速输出
+EXPORT_EXCEL = False            # 输出为非 xlsx 时，另存一份带格式的 xlsx 便于查看
 TOTAL_MINUTES = 240             # A股交易分钟数（用于盘中量能校正）
 CFG = dict(
     ft_floor=0.0,
@@ -156,24 +155,7 @@ OUTPUT_COLS = [
 ]
 
 # ------------------ 工具函数 ------------------
-def _norm_code(x: str) -> str:
-    s = str(x).strip().upper()
-    if '.' in s:
-        return s
-    # 不带后缀时自动推断交易所
-    if s.startswith(("00", "30", "20")):  # 深市
-        return s + ".SZ"
-    if s.startswith(("60", "68")):        # 沪市
-        return s + ".SH"
-    return s
-
-def _to_num(x) -> float:
-    try:
-        if x is None or (isinstance(x, float) and math.isnan(x)): return np.nan
-        if isinstance(x, str) and x.strip() == "": return np.nan
-        return float(x)
-    except Exception:
-        return np.nan
+_norm_code = with_exchange      # '002028' -> '002028.SZ'（已带后缀的原样）
 
 def _ensure_cols(df: pd.DataFrame) -> pd.DataFrame:
     must_have = [C["date"], C["code"], C["name"], C["pres"], C["psup"],
@@ -213,147 +195,171 @@ def _format_and_save(df: pd.DataFrame, output_path: str):
             else: ws.set_column(j, j, 14)
 
 # ------------------ 核心计算 ------------------
-def compute_row(row: pd.Series, ma20_prev_val: Optional[float]) -> pd.Series:
-    r = row.copy()
-
-    pres = _to_num(r.get(C["pres"]))
-    psup = _to_num(r.get(C["psup"]))
-    ma5  = _to_num(r.get(C["ma5"]))
-    ma10 = _to_num(r.get(C["ma10"]))
-    ma20 = _to_num(r.get(C["ma20"]))
-    ma60 = _to_num(r.get(C["ma60"]))
-    cost = _to_num(r.get(C["cost"]))
-    max_entry = _to_num(r.get(C["max_entry"]))
-    close = _to_num(r.get(C["close"]))
-    pnow = _to_num(r.get(C["pnow"]))
-    atr = _to_num(r.get(C["atr"]))
-    vol10 = _to_num(r.get(C["vol10"]))
-    vol = _to_num(r.get(C["vol"]))
-    m_elapsed = _to_num(r.get(C["m_elapsed"]))
-    rs10 = _to_num(r.get(C["rs10"]))
-    atr_med = _to_num(r.get(C["atr_med"]))
-
-    peval = pnow if not np.isnan(pnow) else close
-    if np.isnan(m_elapsed): m_elapsed = TOTAL_MINUTES
-    ft = min(1.0, max(CFG["ft_floor"], (m_elapsed or 0)/TOTAL_MINUTES))
-    r[C["peval"]] = peval; r[C["ft"]] = ft
-
-    r[C["vol10_15"]] = vol10*1.5 if not np.isnan(vol10) else np.nan
-    r[C["vol10_20"]] = vol10*2.0 if not np.isnan(vol10) else np.nan
-    r[C["lr"]] = (vol/vol10) if (not np.isnan(vol) and vol10 and vol10!=0) else np.nan
-    r[C["lr_adj"]] = (vol/(vol10*ft)) if (not np.isnan(vol) and vol10 and vol10!=0 and ft>0) else np.nan
-    r[C["atr_pct"]] = (atr/peval) if (not np.isnan(atr) and peval and peval!=0) else np.nan
-
-    ma20_prev = ma20_prev_val if ma20_prev_val is not None else (ma20 if not np.isnan(ma20) else np.nan)
-    r[C["ma20_prev"]] = ma20_prev
-    r[C["ma20_up"]] = bool((not np.isnan(ma20)) and (not np.isnan(ma20_prev)) and (ma20 >= ma20_prev))
-
-    s = 0
-    if (not np.isnan(peval)) and (not np.isnan(ma5))  and (peval > ma5):  s += 1
-    if (not np.isnan(peval)) and (not np.isnan(ma10)) and (peval > ma10): s += 1
-    if (not np.isnan(peval)) and (not np.isnan(ma20)) and (peval > ma20): s += 1
-    if (not np.isnan(ma5))   and (not np.isnan(ma10)) and (ma5 > ma10):   s += 1
-    if (not np.isnan(ma10))  and (not np.isnan(ma20)) and (ma10 > ma20):  s += 1
-    if (not np.isnan(ma20))  and (not np.isnan(ma60)) and (ma20 > ma60):  s += 1
-    r[C["s_ma"]] = s
-    r[C["rs10_ge0"]] = True if np.isnan(rs10) else bool(rs10 >= 0)
-
-    r[C["dist_res"]] = ((peval - pres)/pres) if (not np.isnan(peval) and not np.isnan(pres) and pres!=0) else np.nan
-    r[C["dist_sup"]] = ((peval - psup)/psup) if (not np.isnan(peval) and not np.isnan(psup) and psup!=0) else np.nan
-    r[C["dist_ma20"]] = ((peval - ma20)/ma20) if (not np.isnan(peval) and not np.isnan(ma20) and ma20!=0) else np.nan
-
-    # 买点/SL
-    if not np.isnan(pres) and not np.isnan(atr):
-        bu_break1 = pres*(1+CFG["breakout_eps"])
-        bu_break2 = bu_break1 + CFG["add_atr_break2"]*atr
-        sl_break  = pres - CFG["sl_atr_break"]*atr
-    else:
-        bu_break1 = bu_break2 = sl_break = np.nan
+def _num(df: pd.DataFrame, key: str) -> np.ndarray:
+    """按列转数值（空串/非数字 -> NaN）"""
+    return pd.to_numeric(df[C[key]], errors="coerce").to_numpy(dtype=np.float64)
+
+def prev_ma20_by_code(df: pd.DataFrame) -> np.ndarray:
+    """
+    每行的“上一根 MA20”：同一代码内、当前行之前最近一个非空 MA20（按当前行序）
+    没有时为 NaN（compute_frame 中回退为当行 MA20）
+    """
+    ma20 = pd.Series(_num(df, "ma20"))
+    codes = pd.factorize(df[C["code"]].astype(str))[0]
+    return ma20.groupby(codes).ffill().groupby(codes).shift(1).to_numpy(dtype=np.float64)
+
+def compute_frame(df: pd.DataFrame, cfg: dict = None, prev_ma20: np.ndarray = None,
+                  ft_override: np.ndarray = None) -> pd.DataFrame:
+    """
+    列式向量化计算：整表一次算出 OUTPUT_COLS 中的全部派生列（NaN 用掩码处理），逐行口径同原 compute_row
+    cfg：参数字典（默认 CFG）；prev_ma20：每行上一根 MA20（默认按代码分组 shift）
+    ft_override：每行盘中进度（非 NaN 处替代按 M_elapsed 线性估算的 f_t）
+    """
+    cfg = CFG if cfg is None else cfg
+    r = {}   # 派生列，最后一次性与输入列合并
+
+    pres = _num(df, "pres"); psup = _num(df, "psup")
+    ma5 = _num(df, "ma5"); ma10 = _num(df, "ma10"); ma20 = _num(df, "ma20"); ma60 = _num(df, "ma60")
+    max_entry = _num(df, "max_entry"); close = _num(df, "close"); pnow = _num(df, "pnow")
+    atr = _num(df, "atr"); vol10 = _num(df, "vol10"); vol = _num(df, "vol")
+    m_elapsed = _num(df, "m_elapsed"); rs10 = _num(df, "rs10")
+    nan = np.nan
+    ok = lambda *xs: np.logical_and.reduce([~np.isnan(x) for x in xs])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        peval = np.where(np.isnan(pnow), close, pnow)
+        m_elapsed = np.where(np.isnan(m_elapsed), TOTAL_MINUTES, m_elapsed)
+        ft = np.minimum(1.0, np.maximum(cfg["ft_floor"], m_elapsed / TOTAL_MINUTES))
+        if ft_override is not None:
+            ft_override = np.asarray(ft_override, dtype=np.float64)
+            ft = np.where(np.isnan(ft_override), ft, ft_override)
+        r[C["peval"]] = peval; r[C["ft"]] = ft
+
+        r[C["vol10_15"]] = vol10 * 1.5
+        r[C["vol10_20"]] = vol10 * 2.0
+        r[C["lr"]] = np.where(vol10 != 0, vol / vol10, nan)
+        r[C["lr_adj"]] = np.where((vol10 != 0) & (ft > 0), vol / (vol10 * ft), nan)
+        r[C["atr_pct"]] = np.where(peval != 0, atr / peval, nan)
+
+        if prev_ma20 is None:
+            prev_ma20 = prev_ma20_by_code(df)
+        ma20_prev = np.where(np.isnan(prev_ma20), ma20, prev_ma20)
+        r[C["ma20_prev"]] = ma20_prev
+        r[C["ma20_up"]] = ok(ma20, ma20_prev) & (ma20 >= ma20_prev)
+
+        s = ((peval > ma5).astype(int) + (peval > ma10) + (peval > ma20)
+             + (ma5 > ma10) + (ma10 > ma20) + (ma20 > ma60))
+        r[C["s_ma"]] = s
+        r[C["rs10_ge0"]] = np.isnan(rs10) | (rs10 >= 0)
+
+        r[C["dist_res"]] = np.where(pres != 0, (peval - pres) / pres, nan)
+        r[C["dist_sup"]] = np.where(psup != 0, (peval - psup) / psup, nan)
+        r[C["dist_ma20"]] = np.where(ma20 != 0, (peval - ma20) / ma20, nan)
+
+        # 买点/SL（参考价与 ATR 须同时有效）
+        m_break = ok(pres, atr)
+        bu_break1 = np.where(m_break, pres * (1 + cfg["breakout_eps"]), nan)
+        bu_break2 = bu_break1 + cfg["add_atr_break2"] * atr
+        sl_break = np.where(m_break, pres - cfg["sl_atr_break"] * atr, nan)
+
+        m_dip = ok(psup, atr)
+        bu_dip1 = np.where(m_dip, psup + cfg["dip_b1_atr"] * atr, nan)
+        bu_dip2 = np.where(m_dip, psup + cfg["dip_b2_atr"] * atr, nan)
+        sl_dip = np.where(m_dip, psup - cfg["dip_sl_atr"] * atr, nan)
+
+        m_ma20 = ok(ma20, atr)
+        bu_ma20 = np.where(m_ma20, ma20 - cfg["ma20_b_atr"] * atr, nan)
+        sl_ma20 = np.where(m_ma20, ma20 - cfg["ma20_sl_atr"] * atr, nan)
+
+        r[C["bu_break1"]] = bu_break1; r[C["bu_break2"]] = bu_break2; r[C["sl_break"]] = sl_break
+        r[C["bu_dip1"]] = bu_dip1; r[C["bu_dip2"]] = bu_dip2; r[C["sl_dip"]] = sl_dip
+        r[C["bu_ma20"]] = bu_ma20; r[C["sl_ma20"]] = sl_ma20
+
+        def _fill_R(base, sl, k):
+            R = base - sl   # 任一为 NaN 时四列均为 NaN
+            r[k[0]] = R; r[k[1]] = base + 1 * R; r[k[2]] = base + 2 * R; r[k[3]] = base + 3 * R
+
+        _fill_R(bu_break1, sl_break, (C["R_break1"], C["R1_break1"], C["R2_break1"], C["R3_break1"]))
+        _fill_R(bu_break2, sl_break, (C["R_break2"], C["R1_break2"], C["R2_break2"], C["R3_break2"]))
+        _fill_R(bu_dip1,   sl_dip,   (C["R_dip1"],   C["R1_dip1"],   C["R2_dip1"],   C["R3_dip1"]))
+        _fill_R(bu_dip2,   sl_dip,   (C["R_dip2"],   C["R1_dip2"],   C["R2_dip2"],   C["R3_dip2"]))
+        _fill_R(bu_ma20,   sl_ma20,  (C["R_ma20"],   C["R1_ma20"],   C["R2_ma20"],   C["R3_ma20"]))
+
+        base_for_chand = np.fmax(max_entry, close)
+        m_chand = ok(base_for_chand, atr)
+        r[C["chand_25"]] = np.where(m_chand, base_for_chand - cfg["chand_k1"] * atr, nan)
+        r[C["chand_30"]] = np.where(m_chand, base_for_chand - cfg["chand_k2"] * atr, nan)
+        r[C["chand_sub_25"]] = np.where(m_chand, cfg["chand_k1"] * atr, nan)
+        r[C["chand_sub_30"]] = np.where(m_chand, cfg["chand_k2"] * atr, nan)
+
+        hit_break = ok(peval, pres, bu_break1) & ((peval >= pres) | (peval >= bu_break1))
+        lo, hi = np.fmin(bu_dip1, bu_dip2), np.fmax(bu_dip1, bu_dip2)
+        in_dip_band = ok(peval, bu_dip1, bu_dip2) & (lo <= peval) & (peval <= hi)
+        in_ma20_band = ok(peval, bu_ma20, ma20) & (bu_ma20 <= peval) & (peval <= ma20)
+        r[C["hit_break"]] = hit_break
+        r[C["in_dip_band"]] = in_dip_band
+        r[C["in_ma20_band"]] = in_ma20_band
+
+        vol_ok = ok(vol, vol10, ft) & (vol10 != 0) & (ft != 0)
+        hit_break_vol = vol_ok & (vol >= cfg["vol_mult_break"] * vol10 * ft)
+        hit_dip_vol = vol_ok & (vol >= cfg["vol_mult_dip"] * vol10 * ft)
+        hit_ma20_vol = vol_ok & (vol >= cfg["vol_mult_ma20"] * vol10 * ft)
+        r[C["hit_break_vol"]] = hit_break_vol
+        r[C["hit_dip_vol"]] = hit_dip_vol
+        r[C["hit_ma20_vol"]] = hit_ma20_vol
 
-    if (not np.isnan(psup)) and (not np.isnan(atr)):
-        bu_dip1 = psup + CFG["dip_b1_atr"] * atr
-        bu_dip2 = psup + CFG["dip_b2_atr"] * atr
-        sl_dip = psup - CFG["dip_sl_atr"] * atr
-    else:
-        bu_dip1 = bu_dip2 = sl_dip = np.nan
-
-    if (not np.isnan(ma20)) and (not np.isnan(atr)):
-        bu_ma20 = ma20 - CFG["ma20_b_atr"] * atr
-        sl_ma20 = ma20 - CFG["ma20_sl_atr"] * atr
-    else:
-        bu_ma20 = sl_ma20 = np.nan
-
-    r[C["bu_break1"]]=bu_break1; r[C["bu_break2"]]=bu_break2; r[C["sl_break"]]=sl_break
-    r[C["bu_dip1"]]=bu_dip1; r[C["bu_dip2"]]=bu_dip2; r[C["sl_dip"]]=sl_dip
-    r[C["bu_ma20"]]=bu_ma20; r[C["sl_ma20"]]=sl_ma20
-
-    def _fill_R(base, sl, k):
-        if np.isnan(base) or np.isnan(sl):
-            r[k[0]]=r[k[1]]=r[k[2]]=r[k[3]]=np.nan; return
-        R = base - sl
-        r[k[0]]=R; r[k[1]]=base+1*R; r[k[2]]=base+2*R; r[k[3]]=base+3*R
-
-    _fill_R(bu_break1, sl_break, (C["R_break1"], C["R1_break1"], C["R2_break1"], C["R3_break1"]))
-    _fill_R(bu_break2, sl_break, (C["R_break2"], C["R1_break2"], C["R2_break2"], C["R3_break2"]))
-    _fill_R(bu_dip1,   sl_dip,   (C["R_dip1"],   C["R1_dip1"],   C["R2_dip1"],   C["R3_dip1"]))
-    _fill_R(bu_dip2,   sl_dip,   (C["R_dip2"],   C["R1_dip2"],   C["R2_dip2"],   C["R3_dip2"]))
-    _fill_R(bu_ma20,   sl_ma20,  (C["R_ma20"],   C["R1_ma20"],   C["R2_ma20"],   C["R3_ma20"]))
-
-    base_for_chand = max(x for x in [max_entry, close] if not np.isnan(x)) if not (np.isnan(max_entry) and np.isnan(close)) else np.nan
-    if not np.isnan(base_for_chand) and not np.isnan(atr):
-        r[C["chand_25"]] = base_for_chand - CFG["chand_k1"]*atr
-        r[C["chand_30"]] = base_for_chand - CFG["chand_k2"]*atr
-        r[C["chand_sub_25"]] = CFG["chand_k1"]*atr
-        r[C["chand_sub_30"]] = CFG["chand_k2"]*atr
-    else:
-        r[C["chand_25"]] = r[C["chand_30"]] = r[C["chand_sub_25"]] = r[C["chand_sub_30"]] = np.nan
-
-    r[C["hit_break"]] = bool((not np.isnan(peval)) and (not np.isnan(pres)) and (not np.isnan(bu_break1)) and (peval >= pres or peval >= bu_break1))
-    lo, hi = (min(bu_dip1, bu_dip2), max(bu_dip1, bu_dip2)) if (not np.isnan(bu_dip1) and not np.isnan(bu_dip2)) else (np.nan, np.nan)
-    r[C["in_dip_band"]] = bool((not np.isnan(peval)) and (not np.isnan(lo)) and (not np.isnan(hi)) and (lo <= peval <= hi))
-    lo_m, hi_m = (bu_ma20, ma20) if (not np.isnan(bu_ma20) and not np.isnan(ma20)) else (np.nan, np.nan)
-    r[C["in_ma20_band"]] = bool((not np.isnan(peval)) and (not np.isnan(lo_m)) and (not np.isnan(hi_m)) and (lo_m <= peval <= hi_m))
+    # ATR 动态带（保留上下限常数）
+    r[C["atr_dyn_low"]] = cfg["atr_min_pct"]
+    r[C["atr_dyn_high"]] = cfg["atr_max_pct"]
 
-    def _hit(mult):
-        if np.isnan(vol) or np.isnan(vol10) or vol10==0 or np.isnan(ft) or ft==0: return False
-        return bool(vol >= mult*vol10*ft)
+    base = s * 10
+    score_break = base + 20 * hit_break + 10 * (hit_break & hit_break_vol)
+    score_dip = base + 20 * in_dip_band + 10 * (in_dip_band & hit_dip_vol)
+    score_ma20 = base + 20 * in_ma20_band + 10 * (in_ma20_band & hit_ma20_vol)
+    score = np.maximum(np.maximum(score_break, score_dip), score_ma20)
+    th = cfg["signal_threshold"]
 
-    r[C["hit_break_vol"]] = _hit(CFG["vol_mult_break"])
-    r[C["hit_dip_vol"]]   = _hit(CFG["vol_mult_dip"])
-    r[C["hit_ma20_vol"]]  = _hit(CFG["vol_mult_ma20"])
+    r[C["score_break"]] = score_break
+    r[C["score_dip"]] = score_dip
+    r[C["score_ma20"]] = score_ma20
+    r[C["score"]] = score
+    r[C["score_th"]] = th
+
+    passed = score >= th
+    r[C["signal"]] = np.select(
+        [~passed,
+         (score_break >= th) & (score_break >= np.maximum(score_dip, score_ma20)),
+         (score_dip >= th) & (score_dip >= score_ma20)],
+        ["无", "突破", "低吸"], default="MA20回踩")
+    r[C["ok_buy"]] = np.where(passed, "是", "否")
+
+    cols = {c: df[c].to_numpy() for c in df.columns if c not in r}
+    cols.update(r)
+    return pd.DataFrame(cols, index=df.index)
 
-    # ATR 动态带（保留上下限常数）
-    r[C["atr_dyn_low"]]  = CFG["atr_min_pct"]
-    r[C["atr_dyn_high"]] = CFG["atr_max_pct"]
+# ------------------ 主流程 ------------------
+def finalize_frame(df_out: pd.DataFrame) -> pd.DataFrame:
+    """补 代码_next / 是否最后一行 / LAST键，按 OUTPUT_COLS 取列（缺列补空）"""
+    codes = df_out[C["code"]].astype(str).tolist()
+    next_codes = codes[1:] + [""]
+    df_out[C["code_next"]] = next_codes
+    df_out[C["is_last"]] = (df_out[C["code"]].astype(str) != df_out[C["code_next"]]).astype(int)
+    df_out[C["last_key"]] = np.where(df_out[C["is_last"]] == 1, df_out[C["code"]].astype(str) + "|LAST", "")
 
-    base = s*10
-    score_break = base + (20 if r[C["hit_break"]] else 0) + (10 if (r[C["hit_break"]] and r[C["hit_break_vol"]]) else 0)
-    score_dip   = base + (20 if r[C["in_dip_band"]] else 0) + (10 if (r[C["in_dip_band"]] and r[C["hit_dip_vol"]]) else 0)
-    score_ma20  = base + (20 if r[C["in_ma20_band"]] else 0) + (10 if (r[C["in_ma20_band"]] and r[C["hit_ma20_vol"]]) else 0)
+    for col in OUTPUT_COLS:
+        if col not in df_out.columns:
+            df_out[col] = np.nan
+    return df_out[OUTPUT_COLS]
 
-    r[C["score_break"]] = score_break
-    r[C["score_dip"]]   = score_dip
-    r[C["score_ma20"]]  = score_ma20
-    r[C["score"]]       = max(score_break, score_dip, score_ma20)
-    r[C["score_th"]]    = CFG["signal_threshold"]
-
-    sig = "无"
-    if r[C["score"]] >= CFG["signal_threshold"]:
-        if score_break >= CFG["signal_threshold"] and score_break >= max(score_dip, score_ma20):
-            sig = "突破"
-        elif score_dip >= CFG["signal_threshold"] and score_dip >= score_ma20:
-            sig = "低吸"
-        else:
-            sig = "MA20回踩"
-        ok = "是"
+def save_output(df_out: pd.DataFrame, path: str):
+    """xlsx 带格式保存；其他格式走 table_io，EXPORT_EXCEL 时另存一份 xlsx"""
+    if format_of(path) == "excel":
+        _format_and_save(df_out, path)
     else:
-        ok = "否"
-    r[C["signal"]] = sig
-    r[C["ok_buy"]] = ok
-
-    return r
+        write_table(df_out, path)
+        if EXPORT_EXCEL:
+            _format_and_save(df_out, os.path.splitext(path)[0] + ".xlsx")
 
-# ------------------ 主流程 ------------------
 def load_input_df() -> pd.DataFrame:
     if not INPUT_FILE:
         # —— 示例模式：为 CODES 中的每只股票各造一行 —— #
@@ -383,9 +389,7 @@ def load_input_df() -> pd.DataFrame:
         return pd.DataFrame(rows)
 
     # —— 文件模式 —— #
-    if INPUT_FILE.lower().endswith(".csv"):
-        return pd.read_csv(INPUT_FILE)
-    return pd.read_excel(INPUT_FILE, sheet_name=SHEET_NAME or 0)
+    return read_table(INPUT_FILE, sheet_name=SHEET_NAME or 0)
 
 def main():
     df = load_input_df()
@@ -408,32 +412,11 @@ def main():
     df[C["code"]] = pd.Categorical(df[C["code"]], categories=codes_norm, ordered=True)
     df = df.sort_values(by=[C["code"], "_sort_dt", "_orig_idx"], kind="stable").reset_index(drop=True)
 
-    # —— 后续计算逻辑不变 —— #
-    out_rows = []
-    prev_ma20 = {}
-    for _, row in df.iterrows():
-        code = str(row.get(C["code"]))
-        prev_val = prev_ma20.get(code)
-        new_row = compute_row(row, prev_val)
-        cur_ma20 = _to_num(new_row.get(C["ma20"]))
-        if not np.isnan(cur_ma20):
-            prev_ma20[code] = cur_ma20
-        out_rows.append(new_row)
-
-    df_out = pd.DataFrame(out_rows)
-
-    codes = df_out[C["code"]].astype(str).tolist()
-    next_codes = codes[1:] + [""]
-    df_out[C["code_next"]] = next_codes
-    df_out[C["is_last"]] = (df_out[C["code"]].astype(str) != df_out[C["code_next"]]).astype(int)
-    df_out[C["last_key"]] = np.where(df_out[C["is_last"]] == 1, df_out[C["code"]].astype(str) + "|LAST", "")
-
-    for col in OUTPUT_COLS:
-        if col not in df_out.columns:
-            df_out[col] = np.nan
-    df_out = df_out[OUTPUT_COLS]
+    # —— 列式向量化计算（MA20_1 按代码分组 shift）—— #
+    df_out = compute_frame(df)
 
-    _format_and_save(df_out, OUTPUT_FILE)
+    df_out = finalize_frame(df_out)
+    save_output(df_out, OUTPUT_FILE)
     print(f"已生成：{os.path.abspath(OUTPUT_FILE)}")
     print(f"行数: {len(df_out)}, 股票数: {df_out[C['code']].astype(str).nunique()}, 日期范围: {df_out[C['date']].min()} ~ {df_out[C['date']].max()}")
 
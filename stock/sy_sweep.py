@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+CFG 参数扫描（网格 / 随机采样，多进程；通过脚本顶部配置控制，不使用命令行）
+- 输入数据固定：日K与逐日指标只算一次（sy_backtest.build_inputs），放入共享内存，
+  各工作进程只读挂载，任务只传参数字典，不重复序列化大数组
+- 每组参数：CFG 覆盖项 + 回测参数（target_r / max_hold / entry_days）-> sy_backtest.run_backtest
+- 结果为一行一组参数的紧凑表（参数列 + 合计统计 + 各信号期望R），按 RANK_BY 排序后保存（CSV/Parquet）
+- 贝叶斯优化未内置：先用随机采样缩小范围，再在附近加密网格
+
+依赖：pip install pandas numpy
+"""
+import itertools
+import os
+import time
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import pandas as pd
+
+import sy_backtest as B
+from table_io import write_table
+from sy_strategy_calc import CFG
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+SEARCH = "grid"              # 'grid' 或 'random'
+GRID = {
+    "signal_threshold": [60, 70, 80],
+    "vol_mult_break": [1.2, 1.5, 2.0],
+    "sl_atr_break": [0.6, 0.8, 1.0],
+    "dip_b1_atr": [0.2, 0.3, 0.5],
+    "target_r": [1, 2, 3],
+}
+RANDOM_SPACE = {             # 随机采样：(下限, 上限)，整数上下限按整数采样
+    "signal_threshold": (50, 90),
+    "vol_mult_break": (1.0, 2.5),
+    "vol_mult_dip": (0.5, 1.2),
+    "vol_mult_ma20": (0.6, 1.5),
+    "breakout_eps": (0.0, 0.01),
+    "add_atr_break2": (0.1, 0.6),
+    "sl_atr_break": (0.4, 1.5),
+    "dip_b1_atr": (0.1, 0.6),
+    "dip_b2_atr": (0.5, 1.2),
+    "dip_sl_atr": (0.3, 1.2),
+    "ma20_b_atr": (0.0, 0.5),
+    "ma20_sl_atr": (0.6, 1.5),
+    "chand_k1": (1.5, 3.5),
+    "target_r": (1, 3),
+    "max_hold": (5, 40),
+}
+N_RANDOM = 300
+SEED = 42
+WORKERS = os.cpu_count() or 1   # 1 = 当前进程内顺序执行
+RANK_BY = "期望(R)"             # 排序指标：期望(R) / 累计R / 胜率 / 最大回撤(R)（回撤越小越好）
+MIN_TRADES = 30                 # 合计笔数不足的参数组排在最后
+OUTPUT_FILE = "sy_sweep.csv"    # .csv / .parquet / .arrow（见 table_io）
+
+BT_KEYS = ("target_r", "max_hold", "entry_days")   # 传给 run_backtest 的回测参数，其余键覆盖 CFG
+ASCENDING = {"最大回撤(R)"}
+
+# ------------------ 参数组 ------------------
+def grid_params(grid: dict) -> list:
+    keys = list(grid)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+def random_params(space: dict, n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        p = {}
+        for k, (lo, hi) in space.items():
+            if isinstance(lo, int) and isinstance(hi, int):
+                p[k] = int(rng.integers(lo, hi + 1))
+            else:
+                p[k] = round(float(rng.uniform(lo, hi)), 4)
+        out.append(p)
+    return out
+
+# ------------------ 共享内存 ------------------
+def _share(arrays: dict) -> tuple:
+    """把一组 numpy 数组拷入共享内存，返回 (SharedMemory 列表, {键: (名称, 形状, dtype)})"""
+    blocks, meta = [], {}
+    for k, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        blocks.append(shm)
+        meta[k] = (shm.name, a.shape, a.dtype.str)
+    return blocks, meta
+
+def _attach(name: str):
+    """只读挂载（Pool 子进程与主进程共用同一个 resource_tracker，由主进程负责 unlink）"""
+    return shared_memory.SharedMemory(name=name)
+
+def _views(meta: dict, blocks: list) -> dict:
+    out = {}
+    for k, (name, shape, dt) in meta.items():
+        shm = _attach(name)
+        blocks.append(shm)
+        a = np.ndarray(shape, np.dtype(dt), buffer=shm.buf)
+        a.flags.writeable = False
+        out[k] = a
+    return out
+
+def pack(arrs: dict, inputs: tuple) -> tuple:
+    """回测数据 -> (可共享的数组字典, 小对象元数据)"""
+    df, si, ti, prev_ma20 = inputs
+    arrays = {f"a:{k}": v for k, v in arrs.items() if k != "codes"}
+    arrays.update({f"c:{j}": df[c].to_numpy(dtype=np.float64) for j, c in enumerate(df.columns)})
+    arrays.update({"si": si, "ti": ti, "prev_ma20": prev_ma20})
+    return arrays, {"columns": list(df.columns), "codes": arrs["codes"]}
+
+def unpack(arrays: dict, info: dict) -> tuple:
+    arrs = {k[2:]: v for k, v in arrays.items() if k.startswith("a:")}
+    arrs["codes"] = info["codes"]
+    df = pd.DataFrame({c: arrays[f"c:{j}"] for j, c in enumerate(info["columns"])})
+    return arrs, (df, arrays["si"], arrays["ti"], arrays["prev_ma20"])
+
+# ------------------ 工作进程 ------------------
+_W = {}
+
+def _init_worker(meta: dict, info: dict):
+    blocks = []
+    _W["blocks"] = blocks
+    _W["data"] = unpack(_views(meta, blocks), info)
+
+def evaluate(params: dict, arrs: dict, inputs: tuple) -> dict:
+    """单组参数回测，返回 参数 + 合计统计 + 各信号期望R"""
+    cfg = dict(CFG)
+    cfg.update({k: v for k, v in params.items() if k not in BT_KEYS})
+    kw = {k: v for k, v in params.items() if k in BT_KEYS}
+    _, summary = B.run_backtest(arrs, cfg, inputs=inputs, **kw)
+    total = summary[summary["信号"] == "合计"].iloc[0]
+    row = dict(params)
+    for k in ("笔数", "胜率", "期望(R)", "累计R", "最大回撤(R)", "平均持有"):
+        row[k] = total[k]
+    for _, r in summary[summary["信号"] != "合计"].iterrows():
+        row[f"期望R_{r['信号']}"] = r["期望(R)"]
+    return row
+
+def _run_one(params: dict) -> dict:
+    arrs, inputs = _W["data"]
+    return evaluate(params, arrs, inputs)
+
+# ------------------ 扫描 ------------------
+def rank(results: pd.DataFrame, by: str = RANK_BY, min_trades: int = MIN_TRADES) -> pd.DataFrame:
+    if results.empty:
+        return results
+    r = results.copy()
+    r["_few"] = r["笔数"] < min_trades
+    r = r.sort_values(["_few", by], ascending=[True, by in ASCENDING], kind="stable", na_position="last")
+    return r.drop(columns="_few").reset_index(drop=True)
+
+def sweep(arrs: dict, param_list: list, workers: int = WORKERS, inputs: tuple = None) -> pd.DataFrame:
+    """在固定数据上跑完全部参数组，返回按 RANK_BY 排好序的结果表"""
+    inputs = B.build_inputs(arrs) if inputs is None else inputs
+    if workers <= 1 or len(param_list) <= 1:
+        rows = [evaluate(p, arrs, inputs) for p in param_list]
+        return rank(pd.DataFrame(rows))
+
+    arrays, info = pack(arrs, inputs)
+    blocks, meta = _share(arrays)
+    try:
+        chunk = max(1, len(param_list) // (workers * 8))
+        with Pool(workers, initializer=_init_worker, initargs=(meta, info)) as pool:
+            rows = list(pool.imap(_run_one, param_list, chunksize=chunk))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    return rank(pd.DataFrame(rows))
+
+def main():
+    hists = B.load_hists(B.CODES)
+    if not hists:
+        print("无可用日K")
+        return
+    arrs = B.stack_hists(hists)
+    params = grid_params(GRID) if SEARCH == "grid" else random_params(RANDOM_SPACE, N_RANDOM, SEED)
+
+    t0 = time.time()
+    res = sweep(arrs, params, WORKERS)
+    dt = time.time() - t0
+    print(f"参数组: {len(params)}  进程数: {WORKERS}  用时: {dt:.1f}s  排序: {RANK_BY}")
+    with pd.option_context("display.width", 200, "display.max_columns", 40):
+        print(res.head(10).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    write_table(res, OUTPUT_FILE)
+    print(f"已生成：{os.path.abspath(OUTPUT_FILE)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+证券主表：6位代码 -> 名称 / 交易所 / 板块 / 上市日期，本地持久化（JSON），按 6 位代码建索引 O(1) 查询
+- 交易所/板块按代码号段规则判定（PREFIX_RULES，最长前缀优先）：68x 科创板、8xx/4xx/92x 北交所、
+  5xx 沪市基金、15x/16x/18x 深市基金等；stock_core 的 to_sina_symbol / to_tencent_symbol / with_exchange 都走这里
+- 名称：腾讯 qt.gtimg 批量取；上市日期：东方财富 ulist（f26）批量取，失败时留空不影响名称
+- 按条目 TTL 刷新：只补拉缺失或超过 TTL_DAYS 的代码，其余直接读本地；网络失败时沿用旧条目
+- 带后缀/前缀的代码（000001.SH、sh000001）以显式交易所为准（指数与个股 6 位代码可能重号，指数不入表）
+"""
+import json
+import os
+import re
+import threading
+import time as _time
+from pathlib import Path
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+CACHE_FILE = os.path.join("~", ".cache", "stock_kline", "symbols.json")   # 与日K缓存同目录
+TTL_DAYS = 7                   # 条目多久后重新核对名称（改名/戴帽摘帽）
+FETCH_LIST_DATE = True         # 是否从东方财富补上市日期
+BATCH = 60                     # 每个请求的代码数
+TIMEOUT = 6
+# (代码前缀, 交易所, 板块)；最长前缀优先，未命中按首位数字回退（5/6/9 沪市，其余深市）
+PREFIX_RULES = (
+    ("688", "sh", "科创板"), ("689", "sh", "科创板"),
+    ("60", "sh", "主板"), ("900", "sh", "B股"), ("5", "sh", "基金"),
+    ("000", "sz", "主板"), ("001", "sz", "主板"), ("002", "sz", "主板"), ("003", "sz", "主板"),
+    ("300", "sz", "创业板"), ("301", "sz", "创业板"), ("302", "sz", "创业板"),
+    ("15", "sz", "基金"), ("16", "sz", "基金"), ("18", "sz", "基金"), ("200", "sz", "B股"),
+    ("4", "bj", "北交所"), ("8", "bj", "北交所"), ("92", "bj", "北交所"),
+)
+EM_MARKET = {"sh": 1, "sz": 0, "bj": 0}   # 东方财富 secid 市场号
+
+_RULES = sorted(PREFIX_RULES, key=lambda r: -len(r[0]))
+_EXPLICIT = re.compile(r"(?i)^(sh|sz|bj)\d{6}$|^\d{6}\.(sh|sz|bj)$")
+
+# ------------------ 号段规则 ------------------
+def _c6(code: str) -> str:
+    m = re.search(r"(\d{6})", str(code))
+    if not m:
+        raise ValueError(f"无效代码: {code}")
+    return m.group(1)
+
+def classify(code: str) -> tuple:
+    """6位代码 -> (交易所 'sh'/'sz'/'bj', 板块)；只看号段，不查表"""
+    c6 = _c6(code)
+    for prefix, ex, board in _RULES:
+        if c6.startswith(prefix):
+            return ex, board
+    return ("sh" if c6.startswith(("5", "6", "9")) else "sz"), ""
+
+def explicit_exchange(code: str):
+    """代码自带的交易所（'600000.SH' / 'sh600000'）；没有则 None"""
+    s = str(code).strip()
+    m = _EXPLICIT.match(s)
+    if not m:
+        return None
+    return (m.group(1) or m.group(2)).lower()
+
+# ------------------ 数据源 ------------------
+def _session():
+    import stock_core
+    return stock_core.make_session()
+
+def fetch_names_tencent(syms: list, sess=None) -> dict:
+    """['sh600000', ...] -> {c6: (交易所, 名称)}；qt 原始字节交给 quote_parser.parse_qt"""
+    from quote_parser import decode_names, parse_qt
+    sess = sess or _session()
+    out = {}
+    for i in range(0, len(syms), BATCH):
+        q = parse_qt(sess.get("https://qt.gtimg.cn/q=" + ",".join(syms[i:i+BATCH]), timeout=TIMEOUT).content)
+        for c, ex, name in zip(q["code"].tolist(), q["ex"].tolist(), decode_names(q["name"])):
+            out[f"{c:06d}"] = (ex.decode(), name)
+    return out
+
+def fetch_list_dates_eastmoney(syms: list, sess=None) -> dict:
+    """['sh600000', ...] -> {c6: 'YYYY-MM-DD'}（东方财富 ulist 字段 f26 = 上市日期 yyyymmdd）"""
+    sess = sess or _session()
+    out = {}
+    for i in range(0, len(syms), BATCH):
+        secids = ",".join(f"{EM_MARKET[s[:2]]}.{s[2:]}" for s in syms[i:i+BATCH])
+        j = sess.get("https://push2.eastmoney.com/api/qt/ulist.np/get",
+                     params={"fltt": 2, "secids": secids, "fields": "f12,f26"}, timeout=TIMEOUT).json()
+        for it in ((j or {}).get("data") or {}).get("diff") or []:
+            d = str(it.get("f26") or "")
+            if re.fullmatch(r"\d{8}", d) and d != "00000000":
+                out[str(it.get("f12"))] = f"{d[:4]}-{d[4:6]}-{d[6:]}"
+    return out
+
+# ------------------ 主表 ------------------
+class SymbolMaster:
+    """
+    rows：{c6: {"name", "exchange", "board", "list_date", "updated"}}
+    fetch_names(syms, sess) -> {c6: (交易所, 名称)}；fetch_list_dates(syms, sess) -> {c6: 'YYYY-MM-DD'}（可为 None）
+    """
+    def __init__(self, path=CACHE_FILE, fetch_names=fetch_names_tencent,
+                 fetch_list_dates=fetch_list_dates_eastmoney, ttl_days: float = TTL_DAYS):
+        self.path = Path(os.path.expandvars(str(path))).expanduser()
+        self.fetch_names = fetch_names
+        self.fetch_list_dates = fetch_list_dates
+        self.ttl = ttl_days * 86400
+        self.rows = self.load()
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))["rows"]
+        except Exception:
+            return {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"rows": self.rows}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def get(self, code: str):
+        """6位代码（或带前后缀的代码）-> 条目 dict；表中没有则 None"""
+        return self.rows.get(_c6(code))
+
+    def exchange(self, code: str) -> str:
+        """显式交易所 > 主表 > 号段规则"""
+        ex = explicit_exchange(code)
+        if ex:
+            return ex
+        row = self.rows.get(_c6(code))
+        return row["exchange"] if row else classify(code)[0]
+
+    def stale(self, code: str, now: float = None) -> bool:
+        row = self.rows.get(_c6(code))
+        return row is None or (now or _time.time()) - row.get("updated", 0) >= self.ttl
+
+    def refresh(self, codes: list, force: bool = False, sess=None) -> dict:
+        """补拉缺失/过期条目并落盘；返回 {c6: 条目}（拉取失败的代码沿用旧条目或只有号段信息）"""
+        now = _time.time()
+        todo = list(dict.fromkeys(_c6(c) for c in codes if force or self.stale(c, now)))
+        if todo:
+            with self._lock:
+                self._refresh(todo, now, sess)
+        return {c6: self.rows[c6] for c6 in (_c6(c) for c in codes) if c6 in self.rows}
+
+    def _refresh(self, todo: list, now: float, sess=None):
+        syms = [self.exchange(c6) + c6 for c6 in todo]
+        try:
+            names = self.fetch_names(syms, sess)
+        except Exception as e:
+            print(f"[WARN] 证券名称刷新失败，沿用本地主表: {e}", flush=True)
+            return
+        dates = {}
+        if self.fetch_list_dates is not None:
+            need = [s for s in syms if s[2:] in names and not (self.rows.get(s[2:]) or {}).get("list_date")]
+            try:
+                dates = self.fetch_list_dates(need, sess) if need else {}
+            except Exception as e:
+                print(f"[WARN] 上市日期拉取失败（名称不受影响）: {e}", flush=True)
+        for c6 in todo:
+            if c6 not in names:
+                continue        # 无行情（退市/代码错）：不入表，下次再试
+            ex, name = names[c6]
+            old = self.rows.get(c6) or {}
+            self.rows[c6] = {"name": name, "exchange": ex or classify(c6)[0], "board": classify(c6)[1],
+                             "list_date": dates.get(c6) or old.get("list_date", ""), "updated": now}
+        self.save()
+
+    def names(self, codes: list, refresh: bool = True, sess=None) -> dict:
+        """{c6: 名称}；refresh=True 时先补拉缺失/过期条目"""
+        if refresh:
+            self.refresh(codes, sess=sess)
+        return {c6: self.rows[c6]["name"] for c6 in (_c6(c) for c in codes) if c6 in self.rows}
+
+# ------------------ 进程内默认主表 ------------------
+_MASTER = None
+_MASTER_LOCK = threading.Lock()
+
+def get_master() -> SymbolMaster:
+    global _MASTER
+    if _MASTER is None:
+        with _MASTER_LOCK:
+            if _MASTER is None:
+                _MASTER = SymbolMaster(fetch_list_dates=fetch_list_dates_eastmoney if FETCH_LIST_DATE else None)
+    return _MASTER
+
+def exchange_of(code: str) -> str:
+    """代码 -> 'sh' / 'sz' / 'bj'"""
+    return explicit_exchange(code) or get_master().exchange(code)
+
+def name_map(codes: list, sess=None) -> dict:
+    """{c6: 名称}：本地主表命中且未过期的不发请求"""
+    return get_master().names(codes, sess=sess)
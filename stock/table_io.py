@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+表格读写（按扩展名或显式格式选择）
+- .parquet / .pq：Parquet（列式压缩，读时 memory_map）
+- .arrow / .feather / .ipc：Arrow IPC（未压缩时内存映射读取，几乎零拷贝）
+- .csv：utf-8-sig；.xlsx / .xls：Excel（只作展示导出，数据量大时最慢）
+- 列式格式按原类型保存：代码保持字符串（前导零不丢），布尔/数值不经文本往返
+
+依赖：pip install pyarrow（Parquet / Arrow）；openpyxl（读 Excel）
+"""
+import os
+import pandas as pd
+
+FORMATS = {
+    ".parquet": "parquet", ".pq": "parquet",
+    ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow",
+    ".csv": "csv",
+    ".xlsx": "excel", ".xls": "excel",
+}
+EXTS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv", "excel": ".xlsx"}
+
+def available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+def format_of(path, fmt: str = None) -> str:
+    """显式格式优先，否则按扩展名判断（未知扩展名按 Excel）"""
+    if fmt:
+        fmt = {"xlsx": "excel", "feather": "arrow", "ipc": "arrow", "pq": "parquet"}.get(fmt, fmt)
+        if fmt not in EXTS:
+            raise ValueError(f"不支持的表格格式: {fmt}")
+        return fmt
+    return FORMATS.get(os.path.splitext(str(path))[1].lower(), "excel")
+
+def with_ext(path, fmt: str) -> str:
+    """把路径扩展名换成格式对应的扩展名"""
+    return os.path.splitext(str(path))[0] + EXTS[format_of(path, fmt)]
+
+def _require_arrow(fmt: str):
+    if not available():
+        raise RuntimeError(f"{fmt} 读写需要 pyarrow：pip install pyarrow")
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arrow 要求一列一个类型：object 列里混有空串占位（如 “MA20 向上?” 的 True/False/""）时，
+    空串转为缺失值；仍混类型的列整体转字符串
+    """
+    out = None
+    for col in df.columns:
+        s = df[col]
+        if s.dtype != object:
+            continue
+        types = {type(v) for v in s.dropna().tolist()}
+        if len(types) <= 1:
+            continue
+        s2 = s.mask(s.map(lambda v: isinstance(v, str) and v == ""))
+        if len({type(v) for v in s2.dropna().tolist()}) > 1:
+            s2 = s2.map(lambda v: v if pd.isna(v) else str(v))
+        out = df.copy() if out is None else out
+        out[col] = s2
+    return df if out is None else out
+
+def read_table(path, fmt: str = None, sheet_name=0, columns: list = None) -> pd.DataFrame:
+    """按格式读表；Parquet / Arrow 支持只读部分列"""
+    fmt = format_of(path, fmt)
+    if fmt == "parquet":
+        _require_arrow("Parquet")
+        return pd.read_parquet(path, engine="pyarrow", columns=columns, memory_map=True)
+    if fmt == "arrow":
+        _require_arrow("Arrow")
+        import pyarrow.feather as feather
+        return feather.read_table(str(path), columns=columns, memory_map=True).to_pandas()
+    if fmt == "csv":
+        return pd.read_csv(path, usecols=columns, encoding="utf-8-sig")
+    df = pd.read_excel(path, sheet_name=sheet_name if sheet_name is not None else 0)
+    return df[columns] if columns else df
+
+def write_table(df: pd.DataFrame, path, fmt: str = None, sheet_name: str = "Sheet1"):
+    """按格式写表（先写临时文件再替换，中途失败不留半个文件）"""
+    fmt = format_of(path, fmt)
+    os.makedirs(os.path.dirname(os.path.abspath(str(path))), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp{EXTS[fmt]}"    # 带格式扩展名（Excel 引擎按扩展名校验）
+    try:
+        if fmt == "parquet":
+            _require_arrow("Parquet")
+            _arrow_safe(df).to_parquet(tmp, engine="pyarrow", index=False, compression="zstd")
+        elif fmt == "arrow":
+            _require_arrow("Arrow")
+            import pyarrow.feather as feather
+            # 不压缩：读取时可直接内存映射
+            feather.write_feather(_arrow_safe(df).reset_index(drop=True), tmp, compression="uncompressed")
+        elif fmt == "csv":
+            df.to_csv(tmp, index=False, encoding="utf-8-sig")
+        else:
+            with pd.ExcelWriter(tmp, engine="openpyxl") as writer:
+                df.to_excel(writer, index=False, sheet_name=sheet_name)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
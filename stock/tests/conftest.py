@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+回归测试公共件：脚本目录加入 sys.path（各模块按同级平铺导入），合成日K固定随机种子
+- 不联网：数据源用假的 fetcher，时间用 clock 固定
+"""
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from zoneinfo import ZoneInfo
+    CN = ZoneInfo("Asia/Shanghai")
+except Exception:
+    from datetime import timedelta, timezone
+    CN = timezone(timedelta(hours=8))
+
+def make_cols(n: int = 300, seed: int = 0, end: str = "2025-03-10") -> dict:
+    """
+    几何随机游走日K -> kline_store 列字典（工作日，最后一根为 end）
+    价格保留 2 位小数，制造持平/平台（波谷判定的边界情况）
+    """
+    import pandas as pd
+    from kline_store import dates_to_days
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=n).strftime("%Y-%m-%d").tolist()
+    close = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.02, n))), 2)
+    high = np.round(close * (1 + rng.uniform(0, 0.03, n)), 2)
+    low = np.round(close * (1 - rng.uniform(0, 0.03, n)), 2)
+    return {"date": dates_to_days(dates), "open": np.round((high + low) / 2, 2), "close": close,
+            "high": high, "low": low, "volume": np.round(rng.uniform(1e4, 1e6, n))}
+
+def make_hist(n: int = 300, seed: int = 0, end: str = "2025-03-10"):
+    """合成日K -> GetStockBuyAnalysisData.fetch_hist_tencent 的返回格式（Bars）"""
+    from bars import Bars
+    return Bars.from_cols(make_cols(n, seed, end))
+
+def cn_time(text: str) -> datetime:
+    """'2025-03-10 16:00' -> 北京时间 datetime"""
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=CN)
+
+# 各模块 from kline_store import now_cn 后各持一份引用，逐个替换
+CLOCK_MODULES = ("kline_store", "adjust", "trade_calendar")
+
+@pytest.fixture
+def clock(monkeypatch):
+    """clock("2025-03-10 16:00")：固定 now_cn 与落盘时间戳"""
+    import importlib
+    mods = [importlib.import_module(m) for m in CLOCK_MODULES]
+
+    def set_now(text: str) -> datetime:
+        now = cn_time(text)
+        for mod in mods:
+            monkeypatch.setattr(mod, "now_cn", lambda: now)
+            monkeypatch.setattr(mod, "_time", SimpleNamespace(time=now.timestamp))
+        return now
+    return set_now
+
+@pytest.fixture(autouse=True)
+def offline_calendar(monkeypatch):
+    """交易日历不拉指数日K、不读本地缓存：按工作日减 HOLIDAYS 推算，每个用例重建"""
+    import trade_calendar
+    monkeypatch.setattr(trade_calendar, "_load_settled", lambda refresh: np.zeros(0, dtype=np.int32))
+    monkeypatch.setattr(trade_calendar, "_CAL", None)
+
+@pytest.fixture
+def hist_source(monkeypatch):
+    """G.fetch_hist_tencent 改为从返回的 {code: 日K} 里取（不联网、不读本地缓存）"""
+    import GetStockBuyAnalysisData as G
+    hists = {}
+    monkeypatch.setattr(G, "fetch_hist_tencent", lambda code_raw, use_qfq=True, limit=1200: hists[code_raw])
+    return hists
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""adjust：已知送转 / 现金分红下的事件识别、前/后复权，以及 KlineStore 本地前复权在除权日当天生效"""
+import numpy as np
+import pytest
+
+from adjust import FactorStore, backward, factor_series, find_events, forward
+from conftest import make_cols
+from kline_store import KlineStore, _slice, cols_to_rows, dates_to_days
+
+PRICES = ("open", "close", "high", "low")
+
+def qfq_of(raw: dict, events: list) -> dict:
+    """events [(事件日 int, ratio)] -> 腾讯口径前复权（事件日之前的价格 × ratio，保留 2 位小数，量不变）"""
+    f = np.ones(len(raw["date"]))
+    for day, ratio in events:
+        f[raw["date"] < day] *= ratio
+    return {k: (np.round(v * f, 2) if k in PRICES else v.copy()) for k, v in raw.items()}
+
+def split_and_dividend(raw: dict, i_split: int = 100, i_div: int = 200, cash: float = 0.3) -> list:
+    """10 送 10（ratio 0.5）+ 每股派现 cash（ratio = (前收 - cash) / 前收）"""
+    prev = raw["close"][i_div - 1]
+    return [(int(raw["date"][i_split]), 0.5), (int(raw["date"][i_div]), (prev - cash) / prev)]
+
+def test_factor_series_and_backward_exact():
+    days = np.array([5, 10, 15, 20, 25], dtype=np.int32)
+    ev_days, ev_ratio = np.array([10, 20], dtype=np.int32), np.array([0.5, 0.9])
+    np.testing.assert_allclose(factor_series(days, ev_days, ev_ratio), [0.45, 0.9, 0.9, 1.0, 1.0])
+    cols = {"date": days, "close": np.full(5, 10.0), "open": np.full(5, 10.0),
+            "high": np.full(5, 10.0), "low": np.full(5, 10.0), "volume": np.full(5, 100.0)}
+    table = {"days": ev_days, "ratio": ev_ratio}
+    np.testing.assert_allclose(forward(cols, table)["close"], [4.5, 9.0, 9.0, 10.0, 10.0])
+    np.testing.assert_allclose(backward(cols, table)["close"], [10.0, 20.0, 20.0, 10.0 / 0.45, 10.0 / 0.45])
+    np.testing.assert_array_equal(forward(cols, table)["volume"], cols["volume"])
+
+def test_find_events_split_and_dividend():
+    raw = make_cols(300)
+    events = split_and_dividend(raw)
+    ev_days, ev_ratio = find_events(raw["date"], raw["close"], qfq_of(raw, events)["close"])
+    np.testing.assert_array_equal(ev_days, [d for d, _ in events])
+    np.testing.assert_allclose(ev_ratio, [r for _, r in events], atol=2e-3)
+
+def test_rounding_noise_is_not_an_event():
+    """整段同一因子、只有 2 位小数舍入差异时不应识别出事件"""
+    raw = make_cols(300)
+    qfq = qfq_of(raw, [(int(raw["date"][-1]) + 1, 0.8)])
+    ev_days, _ = find_events(raw["date"], raw["close"], qfq["close"])
+    assert len(ev_days) == 0
+
+def test_forward_backward_match_source():
+    raw = make_cols(300)
+    events = split_and_dividend(raw)
+    qfq = qfq_of(raw, events)
+    ev_days, ev_ratio = find_events(raw["date"], raw["close"], qfq["close"])
+    table = {"days": ev_days, "ratio": ev_ratio}
+    fwd = forward(raw, table)
+    for k in PRICES:
+        np.testing.assert_allclose(fwd[k], qfq[k], atol=0.03, err_msg=k)
+    last = raw["date"] >= events[-1][0]
+    np.testing.assert_array_equal(fwd["close"][last], raw["close"][last])     # 最近一段为原价
+    bwd = backward(raw, table)
+    first = raw["date"] < events[0][0]
+    np.testing.assert_allclose(bwd["close"][first], raw["close"][first])       # 最早一段为原价
+    np.testing.assert_allclose(bwd["close"], fwd["close"] / np.prod(ev_ratio))
+
+class Source:
+    """假数据源：同一份不复权K线 + 事件表，按 use_qfq 返回不复权 / 前复权的最后 limit 根"""
+    def __init__(self, raw, events=()):
+        self.raw, self.events = raw, list(events)
+        self.calls = []
+
+    def __call__(self, code_raw, use_qfq, limit):
+        self.calls.append(("qfq" if use_qfq else "raw", limit))
+        cols = qfq_of(self.raw, self.events) if use_qfq else self.raw
+        return cols_to_rows(_slice(cols, slice(-limit, None)))
+
+def _append(cols, day: str, close: float) -> dict:
+    bar = {"date": dates_to_days([day]), "open": [close], "close": [close],
+           "high": [close * 1.01], "low": [close * 0.99], "volume": [5e5]}
+    return {k: np.concatenate([cols[k], np.asarray(bar[k], dtype=cols[k].dtype)]) for k in cols}
+
+def _local_qfq(tmp_path, src, **kw):
+    sym = lambda code: "sh600000"
+    return KlineStore(tmp_path, src, sym, factors=FactorStore(tmp_path, src, sym, **kw))
+
+def _qfq_calls(src) -> int:
+    return sum(kind == "qfq" for kind, _ in src.calls)
+
+def _assert_close(got, want, n):
+    for k in PRICES:
+        np.testing.assert_allclose(got[k], want[k][-n:], atol=0.03, err_msg=k)
+
+def test_local_qfq_builds_then_reuses(tmp_path, clock):
+    clock("2025-03-10 16:00")
+    raw = make_cols(300)
+    src = Source(raw, [(int(raw["date"][150]), 0.5)])
+    st = _local_qfq(tmp_path, src)
+    _assert_close(st.get("600000", limit=250), qfq_of(raw, src.events), 250)
+    assert src.calls == [("raw", 250), ("qfq", 250 + st.factors.topup_min)]
+
+    clock("2025-03-10 20:00")
+    st.get("600000", limit=250)
+    assert len(src.calls) == 2
+
+def test_cash_dividend_applied_on_ex_date(tmp_path, clock):
+    """默认每个交易日收盘后核对：现金分红（跳空在涨跌幅内）除权日当天进入因子表，此前K线按新因子前复权"""
+    clock("2025-03-10 16:00")
+    raw = make_cols(300)
+    src = Source(raw)
+    st = _local_qfq(tmp_path, src)
+    st.get("600000", limit=250)
+
+    clock("2025-03-11 16:00")
+    prev = raw["close"][-1]
+    src.raw = _append(raw, "2025-03-11", round(prev - 0.5, 2))
+    src.events = [(int(dates_to_days(["2025-03-11"])[0]), (prev - 0.5) / prev)]
+    got = st.get("600000", limit=250)
+    table = st.factors.load("sh600000")
+    np.testing.assert_array_equal(table["days"], [src.events[0][0]])
+    assert table["ratio"][0] == pytest.approx(src.events[0][1], abs=2e-3)
+    _assert_close(got, qfq_of(src.raw, src.events), 250)
+    assert got["close"][-2] < prev - 0.4                                       # 除权日前一根已按分红下调
+    assert src.calls[-1] == ("qfq", st.factors.topup_min)                      # 只拉 TOPUP_MIN 根尾部
+
+    clock("2025-03-11 20:00")                                                  # 同一交易日不再核对
+    st.get("600000", limit=250)
+    assert _qfq_calls(src) == 2
+
+def test_probe_tail_counts_bars_not_calendar_days(tmp_path, clock):
+    """多日未运行后：尾部按锚点之后本地已有的K线根数拉（跨周末/长假不按自然日多拉）"""
+    base, i0, ex = _history()
+    clock("2025-03-10 16:00")
+    src = Source(_head(base, i0 + 1))
+    st = _local_qfq(tmp_path, src)
+    st.get("600000", limit=250)
+
+    clock("2025-03-21 16:00")
+    src.raw = _head(base, ex + 9)                                              # 03-11..03-21 共 9 根
+    st.get("600000", limit=250)
+    assert src.calls[-1] == ("qfq", 10)
+
+def _history():
+    """2025-04-10 为止的日K，及 2025-03-10 / 03-11（除权日）的下标"""
+    cols = make_cols(322, end="2025-04-10")
+    i0 = int(np.searchsorted(cols["date"], dates_to_days(["2025-03-10"])[0]))
+    return cols, i0, i0 + 1
+
+def _head(cols, k):
+    return _slice(cols, slice(None, k))
+
+def test_split_probed_on_price_limit_gap(tmp_path, clock):
+    """只在有迹象时核对：10 送 10 的不复权跳空越过涨跌停，除权日当天即核对；无跳空的交易日不拉 qfq"""
+    base, i0, ex = _history()
+    clock("2025-03-10 16:00")
+    src = Source(_head(base, i0 + 1))
+    st = _local_qfq(tmp_path, src, probe_daily=False)
+    st.get("600000", limit=250)
+
+    clock("2025-03-11 16:00")
+    after = base["date"] >= base["date"][ex]
+    split = {k: (np.where(after, np.round(v * 0.5, 2), v) if k in PRICES else v) for k, v in base.items()}
+    src.raw, src.events = _head(split, ex + 1), [(int(base["date"][ex]), 0.5)]
+    got = st.get("600000", limit=250)
+    np.testing.assert_array_equal(st.factors.load("sh600000")["days"], [src.events[0][0]])
+    _assert_close(got, qfq_of(src.raw, src.events), 250)
+    assert _qfq_calls(src) == 2
+
+    clock("2025-03-12 16:00")
+    src.raw = _head(split, ex + 2)
+    st.get("600000", limit=250)
+    assert _qfq_calls(src) == 2
+
+def test_cash_dividend_waits_for_periodic_probe(tmp_path, clock):
+    """只在有迹象时核对：现金分红的跳空在涨跌幅内，要等满 PROBE_EVERY_DAYS 才进因子表"""
+    base, i0, ex = _history()
+    clock("2025-03-10 16:00")
+    src = Source(_head(base, i0 + 1))
+    st = _local_qfq(tmp_path, src, probe_daily=False)
+    st.get("600000", limit=250)
+
+    clock("2025-03-11 16:00")
+    prev = base["close"][i0]
+    src.raw, src.events = _head(base, ex + 1), [(int(base["date"][ex]), (prev - 0.2) / prev)]
+    st.get("600000", limit=250)
+    assert _qfq_calls(src) == 1 and len(st.factors.load("sh600000")["days"]) == 0
+
+    clock("2025-04-10 16:00")
+    src.raw = base
+    got = st.get("600000", limit=250)
+    assert _qfq_calls(src) == 2
+    np.testing.assert_array_equal(st.factors.load("sh600000")["days"], [src.events[0][0]])
+    _assert_close(got, qfq_of(src.raw, src.events), 250)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""sy_backtest 逐日指标（整池二维数组）与逐只按基准日截断后的 last_metrics / find_pivot_low 口径一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import GetStockBuyAnalysisData as G
+import sy_backtest as B
+from conftest import make_hist
+
+LENGTHS = [260, 200, 90, 15]   # 长短不一，右对齐后左侧 NaN 填充
+
+@pytest.mark.parametrize("atr_method", ["sma", "wilder"])
+def test_daily_metrics_match_per_day(monkeypatch, atr_method):
+    monkeypatch.setattr(B, "ROUND_DIGITS", None)
+    monkeypatch.setattr(B, "ATR_METHOD", atr_method)
+    hists = {f"{600000 + i}.SH": make_hist(n, seed=10 + i) for i, n in enumerate(LENGTHS)}
+    arrs = B.stack_hists(hists)
+    m = B.daily_metrics(arrs)
+    D = arrs["close"].shape[1]
+    for s, h in enumerate(hists.values()):
+        off = D - len(h)
+        close, high, low, vol = (pd.Series(h[c]) for c in ("close", "high", "low", "volume"))
+        ref = {
+            "ma5": close.rolling(5).mean(), "ma10": close.rolling(10).mean(),
+            "ma20": close.rolling(20).mean(), "ma60": close.rolling(60).mean(),
+            "pres": high.rolling(B.LOOKBACK_N, min_periods=1).max(),   # 同 high.iloc[-lookback:].max()
+            "vol10": vol.rolling(10).mean(),
+        }
+        if len(h) >= B.ATR_N - 1:   # atr_series('wilder') 不足 n-1 根时不能算
+            ref["atr"] = G.atr_series(high, low, close, n=B.ATR_N, method=atr_method)
+        for k, v in ref.items():
+            np.testing.assert_allclose(m[k][s, off:], v.to_numpy(), rtol=1e-9, atol=0, equal_nan=True,
+                                       err_msg=f"{len(h)} 根 {k}")
+        # 前低：每个基准日 b 截断到 [0, b] 后走原 find_pivot_low
+        want = [G.find_pivot_low(h[:b + 1], k=B.PIVOT_K, max_lookback=B.STRUCT_LOOKBACK)[0]
+                for b in range(1, len(h))]
+        np.testing.assert_array_equal(m["psup"][s, off + 1:], want, err_msg=f"{len(h)} 根 psup")
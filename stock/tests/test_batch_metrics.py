@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""batch_metrics / G.batch_metrics_rows 与逐只 last_metrics（pandas 口径）一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import GetStockBuyAnalysisData as G
+from conftest import make_hist
+
+# 长短不一（含不足 60 根、不足 ATR 窗口的），检验右对齐 NaN 填充
+LENGTHS = [300, 250, 61, 59, 21, 12, 9, 8, 3, 1]
+
+def _lengths(atr_method):
+    # atr_series('wilder') 在不足 n-1 根时 iloc 切片赋值长度不符会抛错，参照口径只覆盖它能算的长度
+    return [n for n in LENGTHS if atr_method != "wilder" or n >= 9]
+
+def _hists(lengths):
+    return [make_hist(n, seed=i) for i, n in enumerate(lengths)]
+
+def _pandas_last(h, lookback, atr_n, atr_method):
+    close, high, low, vol = (pd.Series(np.asarray(h[c], dtype=np.float64)) for c in ("close", "high", "low", "volume"))
+    ma20 = close.rolling(20).mean()
+    return {
+        "ma5": close.rolling(5).mean().iloc[-1], "ma10": close.rolling(10).mean().iloc[-1],
+        "ma20": ma20.iloc[-1], "ma60": close.rolling(60).mean().iloc[-1],
+        "ma20_prev": ma20.shift(1).iloc[-1] if len(ma20) >= 2 else np.nan,
+        "p_res": high.iloc[-lookback:].max(), "close": close.iloc[-1],
+        "atr": G.atr_series(high, low, close, n=atr_n, method=atr_method).iloc[-1],
+        "vol10": vol.rolling(10).mean().iloc[-1], "vol": vol.iloc[-1],
+    }
+
+@pytest.mark.parametrize("atr_method", ["sma", "wilder"])
+def test_batch_last_metrics_matches_pandas(atr_method):
+    from batch_metrics import batch_last_metrics, stack_right
+    lengths = _lengths(atr_method)
+    hists = _hists(lengths)
+    width = max(lengths)
+    arr = {c: stack_right([np.asarray(h[c]) for h in hists], width) for c in ("close", "high", "low", "volume")}
+    m = batch_last_metrics(arr["close"], arr["high"], arr["low"], arr["volume"],
+                           lookback=20, atr_n=10, atr_method=atr_method)
+    for i, h in enumerate(hists):
+        ref = _pandas_last(h, 20, 10, atr_method)
+        for k, v in ref.items():
+            np.testing.assert_array_equal(m[k][i], v, err_msg=f"{lengths[i]} 根 {k}")
+
+@pytest.mark.parametrize("atr_method", ["sma", "wilder"])
+def test_batch_metrics_rows_matches_last_metrics(hist_source, monkeypatch, atr_method):
+    monkeypatch.setattr(G, "ATR_METHOD", atr_method)
+    codes = [f"{600000 + i}.SH" for i in range(len(_lengths(atr_method)))]
+    hist_source.update(zip(codes, _hists(_lengths(atr_method))))
+    rows = G.batch_metrics_rows(codes, {}, lookback=20)
+    for code, row in zip(codes, rows):
+        ref = G.last_metrics(code, {}, lookback=20)
+        assert row.keys() == ref.keys()
+        for k in ref:
+            np.testing.assert_array_equal(row[k], ref[k], err_msg=f"{code} {k}")
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""IndicatorState：增量推进（含 JSON 落盘往返）与整段重建、与 pandas 口径一致"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_cols
+from indicator_state import IndicatorState, advance
+
+KEYS = ("ma5", "ma10", "ma20", "ma60", "ma20_prev", "p_res", "close", "atr", "vol10", "vol")
+STOPS = (0, 5, 9, 10, 59, 60, 61, 137, 250, 299)   # 每次运行推进到的位置（跨越各窗口边界）
+
+def _roundtrip(st: IndicatorState) -> IndicatorState:
+    return IndicatorState.from_dict(json.loads(json.dumps(st.to_dict())))
+
+def _assert_close(got: dict, ref: dict, where: str):
+    for k in KEYS:
+        np.testing.assert_allclose(got[k], ref[k], rtol=1e-9, atol=0, equal_nan=True, err_msg=f"{where} {k}")
+
+@pytest.mark.parametrize("atr_method", ["sma", "wilder"])
+def test_incremental_matches_rebuild(atr_method):
+    cols = make_cols(300, seed=1)
+    st = None
+    for upto in STOPS:
+        st = advance(st, cols, upto, 10, atr_method, 20)
+        full = advance(None, cols, upto, 10, atr_method, 20)
+        assert st.last_day == full.last_day == int(cols["date"][upto])
+        _assert_close(st.metrics(), full.metrics(), f"upto={upto}")
+        st = _roundtrip(st)
+
+@pytest.mark.parametrize("atr_method", ["sma", "wilder"])
+def test_state_matches_pandas(atr_method):
+    import GetStockBuyAnalysisData as G
+    cols = make_cols(300, seed=2)
+    close, high, low, vol = (pd.Series(cols[c]) for c in ("close", "high", "low", "volume"))
+    ma = {w: close.rolling(w).mean() for w in (5, 10, 20, 60)}
+    atr = G.atr_series(high, low, close, n=10, method=atr_method)
+    vol10 = vol.rolling(10).mean()
+    st = None
+    for upto in STOPS[3:]:   # atr_series('wilder') 不足 n-1 根时不能算，从满窗口起比
+        st = advance(st, cols, upto, 10, atr_method, 20)
+        ref = {"ma5": ma[5][upto], "ma10": ma[10][upto], "ma20": ma[20][upto], "ma60": ma[60][upto],
+               "ma20_prev": ma[20].shift(1)[upto], "p_res": high[max(0, upto - 19):upto + 1].max(),
+               "close": close[upto], "atr": atr[upto], "vol10": vol10[upto], "vol": vol[upto]}
+        _assert_close(st.metrics(), ref, f"upto={upto}")
+
+def test_rebuild_when_history_changes():
+    """last_day 那根收盘价对不上（除权后前复权整段变化）时从头重建，而不是接着旧状态推"""
+    cols = make_cols(200, seed=3)
+    st = advance(None, cols, 149)
+    adj = dict(cols, close=cols["close"] * 0.9, high=cols["high"] * 0.9, low=cols["low"] * 0.9)
+    got = advance(st, adj, 199).metrics()
+    _assert_close(got, advance(None, adj, 199).metrics(), "除权后")
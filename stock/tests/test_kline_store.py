@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""KlineStore：整段拉取 / complete 标记 / 只补尾部 / 重叠区覆盖与校验"""
+import numpy as np
+import pytest
+
+from conftest import make_cols
+from kline_store import KlineStore, _slice, cols_to_rows, dates_to_days
+
+class Source:
+    """假数据源：返回当前 cols 的最后 limit 根，并记录每次请求的根数"""
+    def __init__(self, cols):
+        self.cols = cols
+        self.calls = []
+
+    def __call__(self, code_raw, use_qfq, limit):
+        self.calls.append(limit)
+        return cols_to_rows(_slice(self.cols, slice(-limit, None)))
+
+def _store(tmp_path, src):
+    return KlineStore(tmp_path, src, lambda code: "sh600000")
+
+def _append(cols, day: str, close: float) -> dict:
+    bar = {"date": dates_to_days([day]), "open": [close], "close": [close],
+           "high": [close * 1.01], "low": [close * 0.99], "volume": [5e5]}
+    return {k: np.concatenate([cols[k], np.asarray(bar[k], dtype=cols[k].dtype)]) for k in cols}
+
+def _assert_cols(got, want):
+    assert set(got) == set(want)
+    for k in want:
+        np.testing.assert_array_equal(got[k], want[k], err_msg=k)
+
+@pytest.mark.parametrize("n,complete", [(300, False), (120, True)])
+def test_full_fetch_sets_complete(tmp_path, clock, n, complete):
+    """返回根数不足 limit = 上市以来全部历史（complete）；之后本地不足 limit 也不再整段重拉"""
+    clock("2025-03-10 16:00")
+    src = Source(make_cols(n))
+    st = _store(tmp_path, src)
+    _assert_cols(st.get("600000", limit=200), _slice(src.cols, slice(-200, None)))
+    assert st.load("sh600000", True)[1]["complete"] is complete
+    assert src.calls == [200]
+
+    clock("2025-03-11 16:00")
+    src.cols = _append(src.cols, "2025-03-11", 30.0)
+    st.get("600000", limit=200)
+    assert src.calls[1] < 200   # 只补尾部
+
+def test_fresh_store_skips_fetch(tmp_path, clock):
+    clock("2025-03-10 16:00")
+    src = Source(make_cols(300))
+    st = _store(tmp_path, src)
+    st.get("600000", limit=200)
+    clock("2025-03-10 20:00")
+    _assert_cols(st.get("600000", limit=200), _slice(src.cols, slice(-200, None)))
+    assert src.calls == [200]
+
+def test_topup_overwrites_unsettled_tail(tmp_path, clock):
+    """盘中存下的最后一根（未定型）在收盘后补尾时被新数据覆盖；已定型部分按日期拼接"""
+    base = make_cols(300)
+    clock("2025-03-11 10:00")
+    src = Source(_append(base, "2025-03-11", 21.0))
+    st = _store(tmp_path, src)
+    st.get("600000", limit=250)
+
+    clock("2025-03-11 16:00")
+    src.cols = _append(base, "2025-03-11", 22.5)
+    got = st.get("600000", limit=250)
+    assert src.calls == [250, 5]
+    _assert_cols(got, _slice(src.cols, slice(-250, None)))
+    _assert_cols(st.load("sh600000", True)[0], _slice(src.cols, slice(-250, None)))
+
+def test_intraday_tail_refreshed_later_same_day(tmp_path, clock):
+    """09:40 存下的未定型最后一根，14:00 再读时补尾刷新，不当作已最新"""
+    base = make_cols(300)
+    clock("2025-03-11 09:40")
+    src = Source(_append(base, "2025-03-11", 21.0))
+    st = _store(tmp_path, src)
+    st.get("600000", limit=250)
+
+    clock("2025-03-11 14:00")
+    src.cols = _append(base, "2025-03-11", 21.8)
+    got = st.get("600000", limit=250)
+    assert src.calls == [250, 5]
+    assert got["close"][-1] == 21.8
+
+    clock("2025-03-11 16:00")                   # 收盘后再补一次定型的最后一根，之后当天不再拉
+    src.cols = _append(base, "2025-03-11", 22.0)
+    st.get("600000", limit=250)
+    clock("2025-03-11 20:00")
+    assert st.get("600000", limit=250)["close"][-1] == 22.0
+    assert src.calls == [250, 5, 5]
+
+def test_overlap_mismatch_refetches_full(tmp_path, clock):
+    """重叠区已定型收盘价对不上（除权后前复权整体平移）时整段重拉"""
+    clock("2025-03-10 16:00")
+    src = Source(make_cols(300))
+    st = _store(tmp_path, src)
+    st.get("600000", limit=200)
+
+    clock("2025-03-11 16:00")
+    shifted = {k: (v if k in ("date", "volume") else np.round(v * 0.95, 2)) for k, v in src.cols.items()}
+    src.cols = _append(shifted, "2025-03-11", 20.0)
+    got = st.get("600000", limit=200)
+    assert len(src.calls) == 3 and src.calls[1] < 200 and src.calls[2] >= 200
+    _assert_cols(got, _slice(src.cols, slice(-200, None)))
+
+def test_gap_beyond_tail_refetches_full(tmp_path, clock):
+    """尾部与本地不衔接（长停牌）时整段重拉"""
+    clock("2025-03-10 16:00")
+    src = Source(make_cols(300))
+    st = _store(tmp_path, src)
+    st.get("600000", limit=200)
+
+    clock("2025-03-11 16:00")
+    cols = make_cols(300, end="2025-03-20")   # 新数据第一根晚于本地最后一根
+    src.cols = _slice(cols, slice(-3, None))
+    st.get("600000", limit=200)
+    assert src.calls[-1] >= 200
+
+def test_get_many_plans_then_refetches_mismatch(tmp_path, clock):
+    """批量版：先按 _plan 统一拉尾部，_apply 判定需整段重拉的只在第二轮拉"""
+    clock("2025-03-10 16:00")
+    srcs = {"600000": Source(make_cols(300, seed=1)), "600001": Source(make_cols(300, seed=2))}
+    st = KlineStore(tmp_path, lambda code, q, n: srcs[code](code, q, n), lambda code: "sh" + code)
+    rounds = []
+
+    def fetch_many(items, use_qfq=True):
+        rounds.append(dict(items))
+        return [srcs[code](code, use_qfq, n) for code, n in items]
+
+    st.get_many(list(srcs), limit=200, fetch_many=fetch_many)
+    clock("2025-03-11 16:00")
+    srcs["600000"].cols = _append(srcs["600000"].cols, "2025-03-11", 30.0)
+    shifted = {k: (v if k in ("date", "volume") else np.round(v * 0.9, 2)) for k, v in srcs["600001"].cols.items()}
+    srcs["600001"].cols = _append(shifted, "2025-03-11", 30.0)
+    out = st.get_many(list(srcs), limit=200, fetch_many=fetch_many)
+
+    assert rounds[0] == {"600000": 200, "600001": 200}
+    assert rounds[1] == {"600000": 5, "600001": 5}
+    assert list(rounds[2]) == ["600001"] and rounds[2]["600001"] >= 200
+    for code, src in srcs.items():
+        _assert_cols(out[code], _slice(src.cols, slice(-200, None)))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""market_scan.load_vol10：当天缓存只补算缺失代码，算不出来（NaN）的不落盘"""
+import numpy as np
+
+import getStockListPrices as L
+import market_scan as M
+
+def test_vol10_cache_skips_nan(tmp_path, monkeypatch):
+    monkeypatch.setattr(M, "CACHE_DIR", str(tmp_path))
+    vols = {"600000": 1200.0, "000001": float("nan"), "300750": 800.0}
+    calls = []
+
+    def build(codes, use_qfq=True, base_day="yesterday"):
+        calls.append([L.norm6(c) for c in codes])
+        return {L.norm6(c): vols[L.norm6(c)] for c in codes}
+    monkeypatch.setattr(L, "build_vol10_map_tencent_concurrent", build)
+
+    codes = ["600000.SH", "000001.SZ", "300750.SZ"]
+    np.testing.assert_array_equal(M.load_vol10(codes, "2025-03-10"), [1200.0, np.nan, 800.0])
+    with np.load(tmp_path / "vol10_2025-03-10.npz") as z:
+        assert sorted(z["codes"].tolist()) == ["300750", "600000"] and np.isfinite(z["vol10"]).all()
+
+    vols["000001"] = 950.0                       # 熔断恢复后：只补算上次缺失的
+    np.testing.assert_array_equal(M.load_vol10(codes, "2025-03-10"), [1200.0, 950.0, 800.0])
+    assert calls == [["600000", "000001", "300750"], ["000001"]]
+
+    M.load_vol10(codes, "2025-03-10")            # 全部命中缓存：不再请求
+    assert len(calls) == 2
+    M.load_vol10(codes, "2025-03-11")            # 换日重算
+    assert len(calls) == 3
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""pivots 向量化检测与原 find_pivot_low 逐根循环一致"""
+import numpy as np
+import pytest
+
+from pivots import find_pivot_highs, find_pivot_lows, last_pivot_index, last_pivot_index_2d
+from batch_metrics import stack_right
+
+def loop_pivot_low(lows, k=3, max_lookback=120, exclude_last=True):
+    """原 find_pivot_low 的逐根循环（参照实现）"""
+    n = len(lows)
+    end = n - 1 if exclude_last else n
+    start = max(0, end - max_lookback - k - 1)
+    pivot_idx = None
+    for i in range(end - k - 1, start + k - 1, -1):
+        left_min = np.min(lows[i - k:i])
+        right_min = np.min(lows[i + 1:i + 1 + k])
+        if np.isfinite(lows[i]) and lows[i] < left_min and lows[i] < right_min:
+            pivot_idx = i
+            break
+    if pivot_idx is None:
+        window = lows[start:end]
+        pivot_idx = (n - 2 if n >= 2 else 0) if len(window) == 0 else start + int(np.nanargmin(window))
+    return pivot_idx
+
+def brute_pivots(x, k, exclude_last, kind):
+    end = len(x) - 1 if exclude_last else len(x)
+    cmp = np.less if kind == "low" else np.greater
+    ext = np.min if kind == "low" else np.max
+    return [i for i in range(k, end - k)
+            if np.isfinite(x[i]) and cmp(x[i], ext(x[i - k:i])) and cmp(x[i], ext(x[i + 1:i + 1 + k]))]
+
+def _series(n, seed):
+    """随机游走，保留 1 位小数制造持平/平台"""
+    rng = np.random.default_rng(seed)
+    return np.round(10 + np.cumsum(rng.normal(0, 0.3, n)), 1)
+
+CASES = [(n, seed) for seed in range(6) for n in (1, 2, 5, 7, 8, 9, 30, 130, 400)]
+
+@pytest.mark.parametrize("k,max_lookback,exclude_last", [(3, 120, True), (3, 120, False), (2, 20, True), (5, 60, True)])
+def test_last_pivot_index_matches_loop(k, max_lookback, exclude_last):
+    for n, seed in CASES:
+        x = _series(n, seed)
+        want = loop_pivot_low(x, k, max_lookback, exclude_last)
+        assert last_pivot_index(x, k, max_lookback, exclude_last, kind="low") == want, (n, seed)
+
+@pytest.mark.parametrize("k,max_lookback,exclude_last", [(3, 120, True), (2, 20, False)])
+def test_last_pivot_index_2d_matches_loop(k, max_lookback, exclude_last):
+    xs = [_series(n, seed) for n, seed in CASES if n >= 2]
+    width = max(len(x) for x in xs)
+    arr = stack_right(xs, width)
+    got = last_pivot_index_2d(arr, k, max_lookback, exclude_last, kind="low")
+    for i, x in enumerate(xs):
+        assert got[i] - (width - len(x)) == loop_pivot_low(x, k, max_lookback, exclude_last), (len(x), i)
+
+@pytest.mark.parametrize("exclude_last", [True, False])
+def test_find_pivots_matches_brute_force(exclude_last):
+    for n, seed in CASES:
+        x = _series(n, seed)
+        assert find_pivot_lows(x, 3, exclude_last).tolist() == brute_pivots(x, 3, exclude_last, "low")
+        assert find_pivot_highs(x, 3, exclude_last).tolist() == brute_pivots(x, 3, exclude_last, "high")
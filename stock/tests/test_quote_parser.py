@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""quote_parser 字节级解析与原逐行 re.match + split 口径一致（含空记录、停牌、超长名称、gbk 名称含分隔符）"""
+import re
+
+import numpy as np
+import pytest
+
+from quote_parser import (NAME_WIDTH, QT_FIELDS, SINA_FIELDS, align, code_keys, decode_names, parse_qt, parse_sina,
+                          sina_snapshot)
+
+# ------------------ 参照实现：原逐行解析 ------------------
+def _num(s: str) -> float:
+    try:
+        return float(s)
+    except ValueError:
+        return np.nan
+
+def split_sina(buf: bytes) -> dict:
+    """原 fetch_price_and_vol_hand_by_sina 的逐行 re.match + split(",")，取全部数值字段"""
+    out = {}
+    for line in buf.decode("gbk").strip().splitlines():
+        m = re.match(r'var hq_str_(sh|sz|bj)(\d{6})="([^"]*)";', line)
+        if not m or not m.group(3):
+            continue
+        parts = m.group(3).split(",")
+        row = {"ex": m.group(1), "name": parts[0]}
+        row.update({k: _num(parts[j]) if j < len(parts) else np.nan for k, j in SINA_FIELDS.items()})
+        row["volume"] /= 100.0
+        out[int(m.group(2))] = row
+    return out
+
+def split_qt(buf: bytes) -> dict:
+    """原 get_name_map_tencent 的逐行 split("~")，取全部数值字段"""
+    out = {}
+    for line in buf.decode("gbk").strip().splitlines():
+        if "~" not in line:
+            continue
+        sym, body = line.split("=", 1)
+        parts = body.strip().strip('";').split("~")
+        row = {"ex": sym.strip()[-8:-6], "name": parts[1]}
+        row.update({k: _num(parts[j]) if j < len(parts) else np.nan for k, j in QT_FIELDS.items()})
+        row["amount"] *= 1e4
+        out[int(parts[2])] = row
+    return out
+
+def as_rows(q: dict) -> dict:
+    names = decode_names(q["name"])
+    return {int(c): {"ex": q["ex"][i].decode(), "name": names[i], **{k: q[k][i] for k in q if k not in ("code", "ex", "name")}}
+            for i, c in enumerate(q["code"].tolist())}
+
+def assert_same(got: dict, want: dict):
+    assert sorted(got) == sorted(want)
+    for c, row in want.items():
+        assert got[c]["ex"] == row["ex"] and got[c]["name"] == row["name"], c
+        for k, v in row.items():
+            if k not in ("ex", "name"):
+                np.testing.assert_array_equal(got[c][k], v, err_msg=f"{c} {k}")
+
+# ------------------ 样例响应 ------------------
+def sina_line(sym: str, name: str, nums: list, tail: str = "2026-10-16,15:00:03,00") -> str:
+    return f'var hq_str_{sym}="{name},{",".join(nums)},{tail},";'
+
+def sina_payload(n: int = 40, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(n):
+        sym = ("sh6%05d" if i % 3 == 0 else "sz00%04d" if i % 3 == 1 else "bj83%04d") % i
+        pc = rng.uniform(1, 300)
+        px = [f"{pc * rng.uniform(0.9, 1.1):.{rng.integers(2, 4)}f}" for _ in range(7)]
+        vol = str(int(rng.uniform(0, 1e10)))
+        amt = f"{float(vol) * pc:.3f}"
+        depth = [str(int(rng.uniform(0, 1e6))) if j % 2 == 0 else px[0] for j in range(20)]
+        lines.append(sina_line(sym, f"股票{i:03d}", [px[0], f"{pc:.3f}"] + px[1:6] + [vol, amt] + depth))
+    return "\n".join(lines).encode("gbk")
+
+def qt_line(sym: str, name: str, fields: list) -> str:
+    return f'v_{sym}="{"~".join(["1", name, sym[2:]] + fields)}";'
+
+def qt_payload(n: int = 40, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(n):
+        sym = "sh6%05d" % i if i % 2 else "sz30%04d" % i
+        f = [f"{rng.uniform(1, 300):.2f}" for _ in range(50)]
+        f[3] = str(int(rng.uniform(0, 1e7)))                  # 成交量(手)，字段 6
+        lines.append(qt_line(sym, f"股票{i:03d}", f))
+    return "\n".join(lines).encode("gbk")
+
+# ------------------ 新浪 ------------------
+def test_sina_matches_split():
+    buf = sina_payload()
+    assert_same(as_rows(parse_sina(buf)), split_sina(buf))
+
+def test_sina_empty_and_suspended():
+    """空记录（无效代码/退市 ""）跳过；停牌记录（现价/今开/量 0）照常解析"""
+    lines = [
+        'var hq_str_sh600001="";',
+        sina_line("sh600002", "停牌股", ["0.000", "12.340", "0.000", "0.000", "0.000", "0.000", "0.000", "0", "0.000"]
+                  + ["0", "0.000"] * 10),
+        'var hq_str_sz000003="";',
+        sina_line("sz000004", "*ST测试", ["5.01", "5.00", "5.02", "5.10", "4.98", "5.01", "5.02", "123400", "619000.50"]
+                  + ["100", "5.01"] * 10),
+    ]
+    buf = "\n".join(lines).encode("gbk")
+    got = as_rows(parse_sina(buf))
+    assert sorted(got) == [4, 600002]
+    assert got[600002]["price"] == 0.0 and got[600002]["prev_close"] == 12.34 and got[600002]["volume"] == 0.0
+    assert_same(got, split_sina(buf))
+    assert len(parse_sina('var hq_str_sh600001="";'.encode())["code"]) == 0
+    assert len(parse_sina(b"")["code"]) == 0
+
+def test_sina_bad_fields_are_nan():
+    """字段为空/非数字时为 NaN，不影响同一记录的其他字段"""
+    buf = sina_line("sh600005", "坏字段", ["1.00", "", "abc", "1.2.3", "-1.5", "1.10", "1.11", "100", "110.0"]).encode("gbk")
+    got = as_rows(parse_sina(buf))[600005]
+    assert np.isnan(got["prev_close"]) and np.isnan(got["price"]) and np.isnan(got["high"])
+    assert got["open"] == 1.0 and got["low"] == -1.5 and got["volume"] == 1.0 and got["amount"] == 110.0
+
+def test_long_name_truncated():
+    """名称超过 NAME_WIDTH 字节时截断（半个汉字丢弃），其后字段不受影响"""
+    long_name = "超长名称" * 4                         # 16 个汉字 = 32 字节 > NAME_WIDTH
+    odd_name = "A" + "超长名称" * 3 + "字"             # 1 + 26 字节，截断落在汉字中间
+    nums = ["5.01", "5.00", "5.02", "5.10", "4.98", "5.01", "5.02", "123400", "619000.50"]
+    buf = "\n".join([sina_line("sh600006", long_name, nums), sina_line("sh600007", odd_name, nums)]).encode("gbk")
+    got = as_rows(parse_sina(buf))
+    assert got[600006]["name"] == long_name[:NAME_WIDTH // 2]
+    assert got[600007]["name"] == odd_name[:1 + (NAME_WIDTH - 1) // 2]
+    for c in (600006, 600007):
+        assert got[c]["price"] == 5.02 and got[c]["amount"] == 619000.5
+
+# ------------------ 新浪全字段快照 ------------------
+def test_snapshot_depth_matches_split():
+    """五档价/量、日期时间与逐行 split 的第 10..31 个字段一致；量换算为手"""
+    buf = sina_payload(seed=1)
+    snap = sina_snapshot(buf)
+    ref = {}
+    for line in buf.decode("gbk").splitlines():
+        m = re.match(r'var hq_str_(sh|sz|bj)(\d{6})="([^"]*)";', line)
+        ref[int(m.group(2))] = m.group(3).split(",")
+    assert sorted(snap["code"].tolist()) == sorted(ref)
+    for rec in snap:
+        parts = ref[int(rec["code"])]
+        np.testing.assert_array_equal(rec["bid_v"], [float(parts[10 + 2 * i]) / 100 for i in range(5)])
+        np.testing.assert_array_equal(rec["bid_p"], [float(parts[11 + 2 * i]) for i in range(5)])
+        np.testing.assert_array_equal(rec["ask_v"], [float(parts[20 + 2 * i]) / 100 for i in range(5)])
+        np.testing.assert_array_equal(rec["ask_p"], [float(parts[21 + 2 * i]) for i in range(5)])
+        assert rec["date"].decode() == parts[30] and rec["time"].decode() == parts[31]
+        assert rec["volume"] == float(parts[8]) / 100 and rec["price"] == float(parts[3])
+
+def test_snapshot_derived_fields():
+    nums = ["10.00", "10.00", "11.00", "11.50", "9.50", "10.99", "11.01", "200000", "2150000.00"]
+    depth = ["300", "10.99", "100", "10.98"] + ["0", "0.00"] * 3 + ["100", "11.01"] + ["0", "0.00"] * 4
+    stop = ["0.000", "12.000", "0.000", "0.000", "0.000", "0.000", "0.000", "0", "0.000"] + ["0", "0.000"] * 10
+    buf = "\n".join([sina_line("sh600011", "派生", nums + depth), sina_line("sh600012", "停牌", stop)]).encode("gbk")
+    snap = sina_snapshot(buf)
+    live, halted = snap[snap["code"] == 600011][0], snap[snap["code"] == 600012][0]
+    assert live["chg_pct"] == pytest.approx(10.0) and live["amp_pct"] == pytest.approx(20.0)
+    assert live["imbalance"] == pytest.approx((4 - 1) / (4 + 1))
+    assert live["vwap"] == pytest.approx(10.75)
+    assert np.isnan(halted["chg_pct"]) and np.isnan(halted["amp_pct"])
+    assert np.isnan(halted["imbalance"]) and np.isnan(halted["vwap"])
+
+def test_align_fills_missing():
+    buf = sina_payload(n=6)
+    snap = sina_snapshot(buf)
+    keys = np.concatenate([code_keys(snap["code"], snap["ex"])[::-1], [1_000_000 + 999999]])
+    out = align(snap, keys)
+    np.testing.assert_array_equal(out["code"][:-1], snap["code"][::-1])
+    assert out["code"][-1] == -1 and np.isnan(out["price"][-1]) and np.isnan(out["bid_p"][-1]).all()
+    empty = align(sina_snapshot(b""), keys[:2])
+    assert (empty["code"] == -1).all()
+
+# ------------------ 腾讯 ------------------
+def test_qt_matches_split():
+    buf = qt_payload()
+    assert_same(as_rows(parse_qt(buf)), split_qt(buf))
+
+def test_qt_empty_records_skipped():
+    buf = "\n".join(['v_pv_none_match="1";', 'v_sh600008="";', qt_line("sh600009", "正常", ["1.5"] * 50)]).encode("gbk")
+    got = as_rows(parse_qt(buf))
+    assert list(got) == [600009] and got[600009]["price"] == 1.5
+
+def _tilde_char() -> str:
+    """gbk 第二字节恰为 '~'（0x7E）的汉字"""
+    for cp in range(0x4E00, 0x9FA6):
+        try:
+            b = chr(cp).encode("gbk")
+        except UnicodeEncodeError:
+            continue
+        if b[1] == 0x7E:
+            return chr(cp)
+    pytest.skip("gbk 中没有第二字节为 0x7E 的汉字")
+
+def test_qt_name_with_tilde_byte():
+    """名称字节里出现 '~' 时按代码字段对齐，后续字段整体不错位（逐行 split 在这里会错位）"""
+    name = "中" + _tilde_char() + "科技"
+    fields = [f"{10 + j / 100:.2f}" for j in range(50)]
+    buf = qt_line("sz000010", name, fields).encode("gbk")
+    got = as_rows(parse_qt(buf))[10]
+    assert got["name"] == name
+    for k, j in QT_FIELDS.items():
+        want = float(fields[j - 3]) * (1e4 if k == "amount" else 1.0)
+        assert got[k] == want, k
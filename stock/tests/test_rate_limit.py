@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""rate_limit：AIMD 加速/减半（每个 CUT_WINDOW 只减一次）、熔断 打开 -> 半开试探 -> 关闭"""
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit as R
+
+@pytest.fixture
+def mono(monkeypatch):
+    """可手动拨动的 monotonic 时钟"""
+    t = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(R, "_time", SimpleNamespace(monotonic=lambda: t.now, sleep=lambda s: None))
+    return t
+
+def test_cut_once_per_window(mono):
+    lim = R.HostLimiter(rate=40.0, conc=16)
+    lim.record(0.1, throttled=True)
+    assert (lim.rate, lim.limit) == (20.0, 8)
+    mono.now += R.CUT_WINDOW / 2
+    lim.record(0.1, throttled=True)          # 同一时间窗内：在途请求的后续失败不再减半
+    assert (lim.rate, lim.limit) == (20.0, 8)
+    mono.now += R.CUT_WINDOW
+    lim.record(0.1, throttled=True)
+    assert (lim.rate, lim.limit) == (10.0, 4)
+
+def test_cut_floors(mono):
+    lim = R.HostLimiter(rate=R.MIN_RATE * 1.5, conc=1)
+    lim.record(0.1, throttled=True)
+    assert (lim.rate, lim.limit) == (R.MIN_RATE, 1)
+
+def test_additive_increase_per_round(mono):
+    lim = R.HostLimiter(rate=10.0, conc=4)
+    for _ in range(3):
+        lim.record(0.1, throttled=False)
+    assert (lim.rate, lim.limit) == (10.0, 4)    # 一轮（= 当前并发数个）未满
+    lim.record(0.1, throttled=False)
+    assert lim.rate == pytest.approx(11.0) and lim.limit == 5
+
+def test_slow_round_does_not_increase(mono):
+    lim = R.HostLimiter(rate=10.0, conc=2)
+    for _ in range(4):
+        lim.record(R.TARGET_LATENCY * 2, throttled=False)
+    assert (lim.rate, lim.limit) == (10.0, 2)
+
+def test_throttle_resets_round(mono):
+    lim = R.HostLimiter(rate=10.0, conc=4)
+    for _ in range(3):
+        lim.record(0.1, throttled=False)
+    lim.record(0.1, throttled=True)
+    for _ in range(2):
+        lim.record(0.1, throttled=False)
+    # 减半到 (5, 2) 后重新计一轮：两次成功即满一轮
+    assert lim.rate == pytest.approx(5.5) and lim.limit == 3
+
+def test_reserve_waits_when_bucket_empty(mono):
+    lim = R.HostLimiter(rate=10.0, conc=4)
+    waits = [lim.reserve() for _ in range(12)]
+    assert waits[:10] == [0.0] * 10
+    assert waits[10] == pytest.approx(0.1) and waits[11] == pytest.approx(0.2)
+    mono.now += 1.0
+    assert lim.reserve() == 0.0
+
+def test_breaker_open_half_open_close(mono):
+    br = R.CircuitBreaker(threshold=3, cooldown=30.0)
+    for _ in range(2):
+        br.record(False)
+    assert br.allow() and not br.is_open()
+    br.record(False)
+    assert br.is_open() and not br.allow()
+
+    mono.now += 30.0
+    assert not br.is_open()
+    assert br.allow()                  # 冷却后放行一个试探请求
+    assert not br.allow()              # 试探未返回前其余仍拒绝
+    br.record(False)                   # 试探失败：重新打开、重新计冷却
+    assert br.is_open() and not br.allow()
+
+    mono.now += 30.0
+    assert br.allow()
+    br.record(True)                    # 试探成功：关闭
+    assert not br.is_open() and br.allow() and br.allow()
+    assert br.fails == 0
+
+def test_order_bases_puts_open_last(mono, monkeypatch):
+    monkeypatch.setattr(R, "_BREAKERS", {})
+    bases = ["http://example.test/a", "https://example.test/a"]
+    for _ in range(R.FAIL_THRESHOLD):
+        R.breaker(bases[0]).record(False)
+    assert R.order_bases(bases) == bases[::-1]
+    with pytest.raises(R.CircuitOpenError):
+        R.check(bases[0])
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""sy_strategy_calc.compute_frame（列式向量化）与原逐行 compute_row 一致（含空值/非数字/0 等脏数据）"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sy_strategy_calc import C, CFG, TOTAL_MINUTES, compute_frame
+
+# ------------------ 参照实现：原逐行计算 ------------------
+def _to_num(x) -> float:
+    try:
+        if x is None or (isinstance(x, float) and math.isnan(x)): return np.nan
+        if isinstance(x, str) and x.strip() == "": return np.nan
+        return float(x)
+    except Exception:
+        return np.nan
+
+def compute_row(row: pd.Series, ma20_prev_val) -> pd.Series:
+    r = row.copy()
+
+    pres = _to_num(r.get(C["pres"]))
+    psup = _to_num(r.get(C["psup"]))
+    ma5  = _to_num(r.get(C["ma5"]))
+    ma10 = _to_num(r.get(C["ma10"]))
+    ma20 = _to_num(r.get(C["ma20"]))
+    ma60 = _to_num(r.get(C["ma60"]))
+    cost = _to_num(r.get(C["cost"]))
+    max_entry = _to_num(r.get(C["max_entry"]))
+    close = _to_num(r.get(C["close"]))
+    pnow = _to_num(r.get(C["pnow"]))
+    atr = _to_num(r.get(C["atr"]))
+    vol10 = _to_num(r.get(C["vol10"]))
+    vol = _to_num(r.get(C["vol"]))
+    m_elapsed = _to_num(r.get(C["m_elapsed"]))
+    rs10 = _to_num(r.get(C["rs10"]))
+    atr_med = _to_num(r.get(C["atr_med"]))
+
+    peval = pnow if not np.isnan(pnow) else close
+    if np.isnan(m_elapsed): m_elapsed = TOTAL_MINUTES
+    ft = min(1.0, max(CFG["ft_floor"], (m_elapsed or 0)/TOTAL_MINUTES))
+    r[C["peval"]] = peval; r[C["ft"]] = ft
+
+    r[C["vol10_15"]] = vol10*1.5 if not np.isnan(vol10) else np.nan
+    r[C["vol10_20"]] = vol10*2.0 if not np.isnan(vol10) else np.nan
+    r[C["lr"]] = (vol/vol10) if (not np.isnan(vol) and vol10 and vol10!=0) else np.nan
+    r[C["lr_adj"]] = (vol/(vol10*ft)) if (not np.isnan(vol) and vol10 and vol10!=0 and ft>0) else np.nan
+    r[C["atr_pct"]] = (atr/peval) if (not np.isnan(atr) and peval and peval!=0) else np.nan
+
+    ma20_prev = ma20_prev_val if ma20_prev_val is not None else (ma20 if not np.isnan(ma20) else np.nan)
+    r[C["ma20_prev"]] = ma20_prev
+    r[C["ma20_up"]] = bool((not np.isnan(ma20)) and (not np.isnan(ma20_prev)) and (ma20 >= ma20_prev))
+
+    s = 0
+    if (not np.isnan(peval)) and (not np.isnan(ma5))  and (peval > ma5):  s += 1
+    if (not np.isnan(peval)) and (not np.isnan(ma10)) and (peval > ma10): s += 1
+    if (not np.isnan(peval)) and (not np.isnan(ma20)) and (peval > ma20): s += 1
+    if (not np.isnan(ma5))   and (not np.isnan(ma10)) and (ma5 > ma10):   s += 1
+    if (not np.isnan(ma10))  and (not np.isnan(ma20)) and (ma10 > ma20):  s += 1
+    if (not np.isnan(ma20))  and (not np.isnan(ma60)) and (ma20 > ma60):  s += 1
+    r[C["s_ma"]] = s
+    r[C["rs10_ge0"]] = True if np.isnan(rs10) else bool(rs10 >= 0)
+
+    r[C["dist_res"]] = ((peval - pres)/pres) if (not np.isnan(peval) and not np.isnan(pres) and pres!=0) else np.nan
+    r[C["dist_sup"]] = ((peval - psup)/psup) if (not np.isnan(peval) and not np.isnan(psup) and psup!=0) else np.nan
+    r[C["dist_ma20"]] = ((peval - ma20)/ma20) if (not np.isnan(peval) and not np.isnan(ma20) and ma20!=0) else np.nan
+
+    # 买点/SL
+    if not np.isnan(pres) and not np.isnan(atr):
+        bu_break1 = pres*(1+CFG["breakout_eps"])
+        bu_break2 = bu_break1 + CFG["add_atr_break2"]*atr
+        sl_break  = pres - CFG["sl_atr_break"]*atr
+    else:
+        bu_break1 = bu_break2 = sl_break = np.nan
+
+    if (not np.isnan(psup)) and (not np.isnan(atr)):
+        bu_dip1 = psup + CFG["dip_b1_atr"] * atr
+        bu_dip2 = psup + CFG["dip_b2_atr"] * atr
+        sl_dip = psup - CFG["dip_sl_atr"] * atr
+    else:
+        bu_dip1 = bu_dip2 = sl_dip = np.nan
+
+    if (not np.isnan(ma20)) and (not np.isnan(atr)):
+        bu_ma20 = ma20 - CFG["ma20_b_atr"] * atr
+        sl_ma20 = ma20 - CFG["ma20_sl_atr"] * atr
+    else:
+        bu_ma20 = sl_ma20 = np.nan
+
+    r[C["bu_break1"]]=bu_break1; r[C["bu_break2"]]=bu_break2; r[C["sl_break"]]=sl_break
+    r[C["bu_dip1"]]=bu_dip1; r[C["bu_dip2"]]=bu_dip2; r[C["sl_dip"]]=sl_dip
+    r[C["bu_ma20"]]=bu_ma20; r[C["sl_ma20"]]=sl_ma20
+
+    def _fill_R(base, sl, k):
+        if np.isnan(base) or np.isnan(sl):
+            r[k[0]]=r[k[1]]=r[k[2]]=r[k[3]]=np.nan; return
+        R = base - sl
+        r[k[0]]=R; r[k[1]]=base+1*R; r[k[2]]=base+2*R; r[k[3]]=base+3*R
+
+    _fill_R(bu_break1, sl_break, (C["R_break1"], C["R1_break1"], C["R2_break1"], C["R3_break1"]))
+    _fill_R(bu_break2, sl_break, (C["R_break2"], C["R1_break2"], C["R2_break2"], C["R3_break2"]))
+    _fill_R(bu_dip1,   sl_dip,   (C["R_dip1"],   C["R1_dip1"],   C["R2_dip1"],   C["R3_dip1"]))
+    _fill_R(bu_dip2,   sl_dip,   (C["R_dip2"],   C["R1_dip2"],   C["R2_dip2"],   C["R3_dip2"]))
+    _fill_R(bu_ma20,   sl_ma20,  (C["R_ma20"],   C["R1_ma20"],   C["R2_ma20"],   C["R3_ma20"]))
+
+    base_for_chand = max(x for x in [max_entry, close] if not np.isnan(x)) if not (np.isnan(max_entry) and np.isnan(close)) else np.nan
+    if not np.isnan(base_for_chand) and not np.isnan(atr):
+        r[C["chand_25"]] = base_for_chand - CFG["chand_k1"]*atr
+        r[C["chand_30"]] = base_for_chand - CFG["chand_k2"]*atr
+        r[C["chand_sub_25"]] = CFG["chand_k1"]*atr
+        r[C["chand_sub_30"]] = CFG["chand_k2"]*atr
+    else:
+        r[C["chand_25"]] = r[C["chand_30"]] = r[C["chand_sub_25"]] = r[C["chand_sub_30"]] = np.nan
+
+    r[C["hit_break"]] = bool((not np.isnan(peval)) and (not np.isnan(pres)) and (not np.isnan(bu_break1)) and (peval >= pres or peval >= bu_break1))
+    lo, hi = (min(bu_dip1, bu_dip2), max(bu_dip1, bu_dip2)) if (not np.isnan(bu_dip1) and not np.isnan(bu_dip2)) else (np.nan, np.nan)
+    r[C["in_dip_band"]] = bool((not np.isnan(peval)) and (not np.isnan(lo)) and (not np.isnan(hi)) and (lo <= peval <= hi))
+    lo_m, hi_m = (bu_ma20, ma20) if (not np.isnan(bu_ma20) and not np.isnan(ma20)) else (np.nan, np.nan)
+    r[C["in_ma20_band"]] = bool((not np.isnan(peval)) and (not np.isnan(lo_m)) and (not np.isnan(hi_m)) and (lo_m <= peval <= hi_m))
+
+    def _hit(mult):
+        if np.isnan(vol) or np.isnan(vol10) or vol10==0 or np.isnan(ft) or ft==0: return False
+        return bool(vol >= mult*vol10*ft)
+
+    r[C["hit_break_vol"]] = _hit(CFG["vol_mult_break"])
+    r[C["hit_dip_vol"]]   = _hit(CFG["vol_mult_dip"])
+    r[C["hit_ma20_vol"]]  = _hit(CFG["vol_mult_ma20"])
+
+    # ATR 动态带（保留上下限常数）
+    r[C["atr_dyn_low"]]  = CFG["atr_min_pct"]
+    r[C["atr_dyn_high"]] = CFG["atr_max_pct"]
+
+    base = s*10
+    score_break = base + (20 if r[C["hit_break"]] else 0) + (10 if (r[C["hit_break"]] and r[C["hit_break_vol"]]) else 0)
+    score_dip   = base + (20 if r[C["in_dip_band"]] else 0) + (10 if (r[C["in_dip_band"]] and r[C["hit_dip_vol"]]) else 0)
+    score_ma20  = base + (20 if r[C["in_ma20_band"]] else 0) + (10 if (r[C["in_ma20_band"]] and r[C["hit_ma20_vol"]]) else 0)
+
+    r[C["score_break"]] = score_break
+    r[C["score_dip"]]   = score_dip
+    r[C["score_ma20"]]  = score_ma20
+    r[C["score"]]       = max(score_break, score_dip, score_ma20)
+    r[C["score_th"]]    = CFG["signal_threshold"]
+
+    sig = "无"
+    if r[C["score"]] >= CFG["signal_threshold"]:
+        if score_break >= CFG["signal_threshold"] and score_break >= max(score_dip, score_ma20):
+            sig = "突破"
+        elif score_dip >= CFG["signal_threshold"] and score_dip >= score_ma20:
+            sig = "低吸"
+        else:
+            sig = "MA20回踩"
+        ok = "是"
+    else:
+        ok = "否"
+    r[C["signal"]] = sig
+    r[C["ok_buy"]] = ok
+
+    return r
+
+def compute_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """原主循环：按行序逐行计算，MA20_1 取同一代码上一个非空 MA20"""
+    out_rows, prev_ma20 = [], {}
+    for _, row in df.iterrows():
+        code = str(row.get(C["code"]))
+        new_row = compute_row(row, prev_ma20.get(code))
+        cur_ma20 = _to_num(new_row.get(C["ma20"]))
+        if not np.isnan(cur_ma20):
+            prev_ma20[code] = cur_ma20
+        out_rows.append(new_row)
+    return pd.DataFrame(out_rows)
+
+# ------------------ 合成输入 ------------------
+def make_input(n_per: int = 20, seed: int = 0, holes: float = 0.08) -> pd.DataFrame:
+    """4 只股票 × n_per 个交易日，行序打乱；holes 比例的字段替换为 NaN / "" / "x" / 0"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for c in ("002028.SZ", "002335.SZ", "002979.SZ", "600000.SH"):
+        for d in pd.bdate_range("2025-01-01", periods=n_per):
+            p = rng.uniform(10, 20)
+            ma20 = p * rng.uniform(.9, 1.05)
+            # 实时价分别落在突破 / 低吸带 / MA20 回踩带附近，三种信号都覆盖到
+            pnow = rng.choice([p * rng.uniform(.9, 1.1), p * 0.9 + p * 0.03 * rng.uniform(.2, .9),
+                               ma20 - p * 0.03 * rng.uniform(-.05, .25)])
+            r = {C["date"]: d.strftime("%Y-%m-%d"), C["dow"]: d.weekday() + 1, C["code"]: c, C["name"]: "N" + c[:6],
+                 C["pres"]: p * 1.05, C["psup"]: p * 0.9,
+                 C["ma5"]: p * rng.uniform(.95, 1.05), C["ma10"]: p * rng.uniform(.95, 1.05),
+                 C["ma20"]: ma20, C["ma60"]: p * rng.uniform(.85, 1.05),
+                 C["cost"]: rng.choice([0, np.nan, p]), C["max_entry"]: rng.choice([0, np.nan, p * 1.1]),
+                 C["close"]: p, C["pnow"]: pnow, C["atr"]: p * 0.03,
+                 C["vol10"]: rng.uniform(5, 20), C["vol"]: rng.uniform(0, 40),
+                 C["m_elapsed"]: rng.choice([np.nan, 0, 89, 240, 300]), C["rs10"]: rng.choice([np.nan, -1, 1]),
+                 C["atr_med"]: np.nan}
+            for k in list(r)[4:]:
+                if rng.random() < holes:
+                    r[k] = rng.choice([np.nan, "", "x", 0])
+            rows.append(r)
+    return pd.DataFrame(rows).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+@pytest.mark.parametrize("threshold", [70, 30])   # 调低阈值让低吸/MA20回踩分支也出信号
+@pytest.mark.parametrize("seed,holes", [(0, 0.0), (1, 0.08), (2, 0.3)])
+def test_compute_frame_matches_compute_row(monkeypatch, seed, holes, threshold):
+    monkeypatch.setitem(CFG, "signal_threshold", threshold)
+    df = make_input(seed=seed, holes=holes)
+    want = compute_rows(df)
+    got = compute_frame(df)
+    derived = [c for c in got.columns if c not in df.columns]
+    assert sorted(derived) == sorted(c for c in want.columns if c not in df.columns)
+    for col in derived:
+        a, b = want[col], got[col]
+        if not (pd.api.types.is_numeric_dtype(b) or pd.api.types.is_bool_dtype(b)):
+            assert a.tolist() == b.tolist(), col
+        else:
+            np.testing.assert_array_equal(a.astype(np.float64).to_numpy(), b.astype(np.float64).to_numpy(),
+                                          err_msg=col)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""symbol_master：号段规则（最长前缀优先）、显式交易所优先、主表按 TTL 只补拉缺失/过期条目"""
+from types import SimpleNamespace
+
+import pytest
+
+import symbol_master as S
+
+@pytest.mark.parametrize("code,ex,board", [
+    ("688001", "sh", "科创板"), ("689009", "sh", "科创板"),
+    ("600000", "sh", "主板"), ("601318", "sh", "主板"), ("900901", "sh", "B股"),
+    ("510300", "sh", "基金"), ("588000", "sh", "基金"), ("501018", "sh", "基金"),
+    ("000001", "sz", "主板"), ("002028", "sz", "主板"), ("003816", "sz", "主板"),
+    ("300750", "sz", "创业板"), ("301001", "sz", "创业板"),
+    ("159915", "sz", "基金"), ("161725", "sz", "基金"), ("184801", "sz", "基金"), ("200002", "sz", "B股"),
+    ("830799", "bj", "北交所"), ("872925", "bj", "北交所"), ("430047", "bj", "北交所"), ("920002", "bj", "北交所"),
+])
+def test_prefix_rules(code, ex, board):
+    assert S.classify(code) == (ex, board)
+    assert S.classify(f"{ex}{code}") == (ex, board)
+
+@pytest.mark.parametrize("code,ex", [("990001", "sh"), ("700001", "sz"), ("100001", "sz")])
+def test_unmatched_falls_back_by_first_digit(code, ex):
+    assert S.classify(code) == (ex, "")
+
+def test_invalid_code():
+    with pytest.raises(ValueError):
+        S.classify("60000")
+
+@pytest.mark.parametrize("code,ex", [
+    ("000001.SH", "sh"), ("sh000001", "sh"), ("399001.sz", "sz"), ("BJ830799", "bj"),
+    ("000001", None), ("sh00001", None), ("600000.SS", None),
+])
+def test_explicit_exchange(code, ex):
+    assert S.explicit_exchange(code) == ex
+
+class Names:
+    """假名称源：记录每次请求的 symbol 列表"""
+    def __init__(self, known):
+        self.known, self.calls = known, []
+
+    def __call__(self, syms, sess=None):
+        self.calls.append(list(syms))
+        return {s[2:]: (s[:2], self.known[s[2:]]) for s in syms if s[2:] in self.known}
+
+def test_master_refresh_ttl(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(S, "_time", SimpleNamespace(time=lambda: now[0]))
+    names = Names({"600000": "浦发银行", "830799": "艾融软件"})
+    m = S.SymbolMaster(tmp_path / "symbols.json", names, lambda syms, sess=None: {"600000": "1999-11-10"})
+    assert m.names(["600000", "830799", "999999"]) == {"600000": "浦发银行", "830799": "艾融软件"}
+    assert names.calls == [["sh600000", "bj830799", "sh999999"]]
+    assert m.get("600000")["list_date"] == "1999-11-10" and m.get("830799")["board"] == "北交所"
+
+    # 落盘后新实例直接读本地；未入表的代码（无行情）下次仍会再试
+    m2 = S.SymbolMaster(tmp_path / "symbols.json", names, None)
+    assert m2.names(["600000", "830799"]) == {"600000": "浦发银行", "830799": "艾融软件"}
+    assert len(names.calls) == 1
+    m2.names(["600000", "999999"])
+    assert names.calls[-1] == ["sh999999"]
+
+    now[0] += S.TTL_DAYS * 86400
+    names.known["600000"] = "浦发银行X"
+    assert m2.names(["600000"]) == {"600000": "浦发银行X"}
+    assert m2.get("600000")["list_date"] == "1999-11-10"     # 上市日期沿用旧条目
+
+def test_master_fetch_failure_keeps_rows(tmp_path):
+    m = S.SymbolMaster(tmp_path / "symbols.json", Names({"600000": "浦发银行"}), None)
+    m.names(["600000"])
+
+    def boom(syms, sess=None):
+        raise OSError("network down")
+    m.fetch_names = boom
+    assert m.refresh(["600000", "000001"], force=True) == {"600000": m.get("600000")}
+
+def test_exchange_prefers_explicit_then_table(tmp_path):
+    m = S.SymbolMaster(tmp_path / "symbols.json", Names({}), None)
+    m.rows["000001"] = {"name": "平安银行", "exchange": "sz", "board": "主板", "list_date": "", "updated": 0}
+    assert m.exchange("000001") == "sz"
+    assert m.exchange("000001.SH") == "sh"          # 上证指数与平安银行同号
+    assert m.exchange("688981") == "sh"             # 不在表内按号段
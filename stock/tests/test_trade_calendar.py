@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""trade_calendar：分钟表（盘前/午休/盘后）、节假日连休前后的交易日、基准K线选取、K线定型日"""
+import numpy as np
+import pytest
+
+import trade_calendar as T
+from conftest import cn_time
+from kline_store import dates_to_days
+
+def _d(text: str) -> int:
+    return int(dates_to_days([text])[0])
+
+@pytest.mark.parametrize("hm,want", [
+    ((0, 0), 0.0), ((9, 29), 0.0), ((9, 30), 0.0), ((10, 0), 30.0), ((11, 29), 119.0),
+    ((11, 30), 120.0), ((12, 15), 120.0), ((12, 59), 120.0),          # 午休停在上午收盘
+    ((13, 0), 120.0), ((14, 0), 180.0), ((14, 59), 239.0),
+    ((15, 0), 240.0), ((15, 30), 240.0), ((23, 59), 240.0),           # 盘后
+])
+def test_session_minute(hm, want):
+    assert T.session_minute(*hm) == want
+
+def test_session_minute_seconds_only_inside_sessions():
+    assert T.session_minute(10, 0, 30) == 30.5
+    assert T.session_minute(12, 0, 30) == 120.0
+    assert T.session_minute(9, 0, 30) == 0.0
+    assert T.TOTAL_MINUTES == 240
+
+def test_progress(clock):
+    clock("2025-03-10 12:00")
+    assert T.progress_now() == 0.5
+    clock("2025-10-03 10:00")                  # 国庆休市：停在上一交易日收盘
+    assert T.progress_now() == 1.0
+
+def test_holiday_run():
+    """2025 国庆 10-01..10-08 连休（含周末）：前后交易日跨过整段"""
+    assert T.previous_trading_day("2025-10-09") == "2025-09-30"
+    assert T.next_trading_day("2025-09-30") == "2025-10-09"
+    assert T.previous_trading_day("2025-10-05") == "2025-09-30"
+    assert T.bars_between("2025-09-30", "2025-10-09") == 1
+    assert T.bars_between("2025-10-09", "2025-09-30") == -1
+    assert not any(T.is_trading_day(f"2025-10-0{i}") for i in range(1, 9))
+    assert T.is_trading_day("2025-09-30") and T.is_trading_day("2025-10-09")
+
+def test_previous_trading_day_over_weekend():
+    assert T.previous_trading_day("2025-03-10") == "2025-03-07"
+    assert T.next_trading_day("2025-03-07") == "2025-03-10"
+
+def test_settled_days_override_weekday_rule():
+    """指数日K覆盖区间内以其为准（临时休市的工作日不算交易日）"""
+    days = dates_to_days(["2025-03-03", "2025-03-04", "2025-03-06", "2025-03-07"])
+    cal = T.TradeCalendar(days, end_day=_d("2025-12-31"))
+    assert not cal.is_trading_day(_d("2025-03-05"))
+    assert cal.previous_trading_day(_d("2025-03-06")) == _d("2025-03-04")
+    assert cal.next_trading_day(_d("2025-03-07")) == _d("2025-03-10")     # 覆盖区间之后按工作日推算
+
+def _bars(*dates):
+    return np.asarray(dates)
+
+@pytest.mark.parametrize("now,base_day,want", [
+    ("2025-03-10 10:00", "today", "2025-03-10"),
+    ("2025-03-10 10:00", "yesterday", "2025-03-07"),      # 周一的“昨天”是上周五
+    ("2025-03-10 08:00", "yesterday", "2025-03-07"),      # 盘前：今天的K线尚未出现
+    ("2025-03-08 12:00", "today", "2025-03-07"),          # 周六：行情停在周五
+    ("2025-03-08 12:00", "yesterday", "2025-03-06"),
+    ("2025-10-09 10:00", "yesterday", "2025-09-30"),      # 长假后首个交易日
+    ("2025-10-03 10:00", "today", "2025-09-30"),          # 长假中
+    ("2025-10-03 10:00", "yesterday", "2025-09-29"),
+])
+def test_base_day_target(clock, now, base_day, want):
+    clock(now)
+    assert T.get_calendar().base_day_target(base_day, cn_time(now)) == _d(want)
+
+def test_base_index_picks_last_bar_not_after_target(clock):
+    clock("2025-03-10 10:00")
+    bars = _bars("2025-03-05", "2025-03-06", "2025-03-07", "2025-03-10")
+    assert T.base_index(bars, "yesterday") == 2
+    assert T.base_index(bars, "today") == 3
+    assert T.base_index(bars[:3], "today") == 2            # 盘前今天的K线还没有：取最后一根
+    assert T.base_index(dates_to_days(bars), "yesterday") == 2
+    assert T.base_index(bars[3:], "yesterday") == -1
+
+    clock("2025-10-09 10:00")
+    bars = _bars("2025-09-26", "2025-09-29", "2025-09-30", "2025-10-09")
+    assert T.base_index(bars, "yesterday") == 2
+    assert T.base_index(bars[:3], "yesterday") == 2       # 假期后当天K线缺失：仍对齐到节前
+
+@pytest.mark.parametrize("now,want", [
+    ("2025-03-10 15:04", "2025-03-07"),
+    ("2025-03-10 15:05", "2025-03-10"),
+    ("2025-03-10 09:00", "2025-03-07"),
+    ("2025-03-08 12:00", "2025-03-07"),
+    ("2025-10-09 15:00", "2025-09-30"),
+    ("2025-10-09 16:00", "2025-10-09"),
+])
+def test_settled_day(clock, now, want):
+    clock(now)
+    assert T.get_calendar().settled_day(cn_time(now)) == _d(want)
+    close = T.last_session_close(cn_time(now))
+    assert close.strftime("%Y-%m-%d %H:%M") == f"{want} {T.CLOSE_READY[0]:02d}:{T.CLOSE_READY[1]:02d}"
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+A股交易日历 + 交易时段分钟表
+- 交易日：已收盘的日期以上证指数日K为准（本地缓存，每天最多刷新一次）；之后的日期按工作日减 HOLIDAYS 推算
+- 日历按自然日展开成稠密数组：rank[d] = 截至 d（含）的交易日个数，
+  previous_trading_day / next_trading_day / bars_between / is_trading_day 都是 O(1) 下标运算
+- 分钟表：一天 1440 个槽位预先算好“已过交易分钟”，session_minute / progress 查表 O(1)
+- session_day：当前行情所属交易日（非交易日取上一个交易日）；base_day_target：'today' / 'yesterday' 对应的目标日，
+  基准K线 = 日期不晚于目标日的最后一根（不再按根数猜“倒数第二根”）
+- A股无半日市；SESSIONS 按 (开始分钟, 结束分钟) 配置，改动后分钟表自动重算
+"""
+import os
+import time as _time
+from datetime import date, datetime
+from pathlib import Path
+import numpy as np
+
+from kline_store import CLOSE_READY, dates_to_days, days_to_dates, now_cn
+
+# ======================
+# 顶部配置（仅改这里）
+# ======================
+SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))   # 交易时段（距 0 点分钟）
+INDEX_CODE = "000001.SH"          # 取交易日用的指数（上证综指）
+INDEX_LIMIT = 800                 # 指数日K根数（约 3 年）
+FETCH_TIMEOUT = 5                 # 拉指数日K的超时（秒）；经 stock_core 直连，不依赖任何脚本的配置
+CACHE_FILE = os.path.join("~", ".cache", "stock_kline", "calendar.npz")
+YEARS_AHEAD = 1                   # 推算到明年年底
+# 休市的工作日（以交易所公告为准；已收盘的日期以指数日K为准，这里只影响尚未到来的日期与无网络时的回退）
+HOLIDAYS = (
+    "2025-01-01", "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-03", "2025-02-04",
+    "2025-04-04", "2025-05-01", "2025-05-02", "2025-05-05", "2025-06-02",
+    "2025-10-01", "2025-10-02", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08",
+    "2026-01-01", "2026-01-02", "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20",
+    "2026-02-23", "2026-04-06", "2026-05-01", "2026-05-04", "2026-05-05", "2026-06-19", "2026-09-25",
+    "2026-10-01", "2026-10-02", "2026-10-05", "2026-10-06", "2026-10-07",
+)
+
+TOTAL_MINUTES = sum(b - a for a, b in SESSIONS)
+
+# ------------------ 分钟表 ------------------
+def _minute_table() -> tuple:
+    """(已过交易分钟[1440], 是否在交易时段内[1440])；时段之间取上一时段收盘时的累计分钟"""
+    elapsed = np.zeros(1440, dtype=np.float64)
+    inside = np.zeros(1440, dtype=bool)
+    done = 0
+    for a, b in SESSIONS:
+        elapsed[a:b] = done + np.arange(b - a)
+        inside[a:b] = True
+        done += b - a
+        elapsed[b:] = done
+    return elapsed, inside
+
+_ELAPSED, _INSIDE = _minute_table()
+
+def session_minute(hour: int, minute: int, second: float = 0.0) -> float:
+    """时刻 -> 已过交易分钟（盘前 0，午休停在上午收盘，盘后 TOTAL_MINUTES）"""
+    i = hour * 60 + minute
+    return float(_ELAPSED[i] + (second / 60.0 if _INSIDE[i] else 0.0))
+
+# ------------------ 交易日 ------------------
+def _weekday_days(lo: int, hi: int) -> np.ndarray:
+    """[lo, hi] 内的工作日减 HOLIDAYS（int32 天数）"""
+    d = np.arange(lo, hi + 1, dtype=np.int32)
+    d = d[(d + 3) % 7 < 5]                      # 1970-01-01 为周四
+    return np.setdiff1d(d, dates_to_days(list(HOLIDAYS)), assume_unique=True)
+
+class TradeCalendar:
+    def __init__(self, settled_days: np.ndarray = None, end_day: int = None):
+        """
+        settled_days：指数日K的日期（int32，升序），其覆盖区间内以它为准；区间外按工作日减 HOLIDAYS
+        end_day：推算到哪一天（默认明年年底）
+        """
+        settled = np.asarray(settled_days if settled_days is not None else [], dtype=np.int32)
+        today = int(dates_to_days([now_cn().strftime("%Y-%m-%d")])[0])
+        if end_day is None:
+            end_day = int(dates_to_days([f"{now_cn().year + YEARS_AHEAD}-12-31"])[0])
+        lo = int(settled[0]) if len(settled) else today - 3 * 366
+        hi = max(end_day, today)
+        if len(settled):
+            days = np.concatenate([settled, _weekday_days(int(settled[-1]) + 1, hi)])
+        else:
+            days = _weekday_days(lo, hi)
+        self.days = days
+        self.lo, self.hi = lo, hi
+        flag = np.zeros(hi - lo + 1, dtype=np.int32)
+        flag[days - lo] = 1
+        self.rank = np.cumsum(flag)              # rank[d-lo] = 截至 d（含）的交易日个数
+
+    def _rank(self, day: int) -> int:
+        if day < self.lo:
+            return 0
+        return int(self.rank[min(day, self.hi) - self.lo])
+
+    def is_trading_day(self, day: int) -> bool:
+        if not self.lo <= day <= self.hi:
+            return (day + 3) % 7 < 5
+        return self._rank(day) - self._rank(day - 1) == 1
+
+    def previous_trading_day(self, day: int) -> int:
+        """严格早于 day 的最近交易日"""
+        k = self._rank(day - 1)
+        if k == 0:
+            raise ValueError(f"日历范围之外: {days_to_dates([day])[0]}")
+        return int(self.days[k - 1])
+
+    def next_trading_day(self, day: int) -> int:
+        """严格晚于 day 的最近交易日"""
+        k = self._rank(day)
+        if k >= len(self.days):
+            raise ValueError(f"日历范围之外: {days_to_dates([day])[0]}")
+        return int(self.days[k])
+
+    def bars_between(self, a: int, b: int) -> int:
+        """(a, b] 内的交易日个数（即从 a 的K线到 b 的K线相隔几根）；b < a 时为负"""
+        return self._rank(b) - self._rank(a)
+
+    def session_day(self, now: datetime) -> int:
+        """当前行情所属交易日：今天是交易日即今天，否则上一个交易日"""
+        day = int(dates_to_days([now.strftime("%Y-%m-%d")])[0])
+        return day if self.is_trading_day(day) else self.previous_trading_day(day)
+
+    def settled_day(self, now: datetime) -> int:
+        """K线已定型的最近交易日（当日收盘 CLOSE_READY 之后才算今天）"""
+        day = self.session_day(now)
+        today = int(dates_to_days([now.strftime("%Y-%m-%d")])[0])
+        if day == today and (now.hour, now.minute) < CLOSE_READY:
+            return self.previous_trading_day(day)
+        return day
+
+    def progress(self, now: datetime) -> float:
+        """盘中进度 ∈ [0,1]；非交易日为 1.0（行情停在上一交易日收盘）"""
+        if not self.is_trading_day(int(dates_to_days([now.strftime("%Y-%m-%d")])[0])):
+            return 1.0
+        return session_minute(now.hour, now.minute, now.second) / TOTAL_MINUTES
+
+    def base_day_target(self, base_day: str, now: datetime) -> int:
+        """'today' -> 当前行情所属交易日；'yesterday' -> 它的上一个交易日"""
+        day = self.session_day(now)
+        return self.previous_trading_day(day) if base_day == "yesterday" else day
+
+    def base_index(self, bar_days: np.ndarray, base_day: str, now: datetime) -> int:
+        """日期不晚于目标日的最后一根K线的下标（bar_days 为升序 int32 天数）；没有则 -1"""
+        return int(np.searchsorted(bar_days, self.base_day_target(base_day, now), side="right")) - 1
+
+# ------------------ 缓存 / 默认日历 ------------------
+_CAL = None
+_CAL_DAY = None
+
+def _load_settled(refresh: bool) -> np.ndarray:
+    """指数日K日期：缓存当天有效；过期时拉一次，失败时沿用旧缓存（可能为空）"""
+    path = Path(os.path.expandvars(CACHE_FILE)).expanduser()
+    cached, fetched_at = None, 0.0
+    if path.exists():
+        try:
+            with np.load(path) as z:
+                cached, fetched_at = z["days"], float(z["fetched_at"])
+        except Exception:
+            cached = None
+    today_start = now_cn().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    if cached is not None and not refresh and fetched_at >= today_start:
+        return cached
+    try:
+        import stock_core
+        days = stock_core.fetch_kline(INDEX_CODE, use_qfq=False, limit=INDEX_LIMIT, timeout=FETCH_TIMEOUT).date
+        if cached is not None and len(cached):
+            days = np.union1d(cached, days).astype(np.int32)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, days=days, fetched_at=np.float64(_time.time()))
+        os.replace(tmp, path)
+        return days
+    except Exception as e:
+        print(f"[WARN] 交易日历刷新失败，按工作日推算: {e}", flush=True)
+        return cached if cached is not None else np.zeros(0, dtype=np.int32)
+
+def get_calendar(refresh: bool = False) -> TradeCalendar:
+    """进程内共享日历，跨自然日自动重建"""
+    global _CAL, _CAL_DAY
+    day = now_cn().date()
+    if _CAL is None or refresh or _CAL_DAY != day:
+        _CAL = TradeCalendar(_load_settled(refresh))
+        _CAL_DAY = day
+    return _CAL
+
+def _day(d) -> int:
+    if isinstance(d, (int, np.integer)):
+        return int(d)
+    if isinstance(d, (datetime, date)):
+        d = d.strftime("%Y-%m-%d")
+    return int(dates_to_days([str(d)[:10]])[0])
+
+def is_trading_day(d) -> bool:
+    return get_calendar().is_trading_day(_day(d))
+
+def previous_trading_day(d) -> str:
+    """'YYYY-MM-DD'（或天数 / date）-> 上一个交易日 'YYYY-MM-DD'"""
+    return str(days_to_dates([get_calendar().previous_trading_day(_day(d))])[0])
+
+def next_trading_day(d) -> str:
+    return str(days_to_dates([get_calendar().next_trading_day(_day(d))])[0])
+
+def bars_between(a, b) -> int:
+    """(a, b] 内的交易日个数"""
+    return get_calendar().bars_between(_day(a), _day(b))
+
+def progress_now() -> float:
+    return get_calendar().progress(now_cn())
+
+def base_index(bar_dates, base_day: str, now: datetime = None) -> int:
+    """bar_dates：'YYYY-MM-DD' 序列或 int32 天数（升序）-> 基准K线下标（-1=没有）"""
+    arr = np.asarray(bar_dates)
+    days = arr.astype(np.int32) if np.issubdtype(arr.dtype, np.integer) else dates_to_days([str(x)[:10] for x in arr])
+    return get_calendar().base_index(days, base_day, now or now_cn())
+
+def last_session_close(now: datetime) -> datetime:
+    """最近一个已收盘交易日的定型时刻（CLOSE_READY）"""
+    d = days_to_dates([get_calendar().settled_day(now)])[0]
+    y, m, dd = (int(x) for x in str(d).split("-"))
+    return now.replace(year=y, month=m, day=dd, hour=CLOSE_READY[0], minute=CLOSE_READY[1], second=0, microsecond=0)